@@ -0,0 +1,171 @@
+# admission.py
+"""
+Admission control for the expensive AQI routes.
+
+Each gated route has an AdmissionGate: at most `limit` requests run at once,
+up to `queue_size` more wait, and a waiter that is not admitted within
+`queue_timeout` gives up. Requests come in two priorities. HIGH (answerable
+from cache) may use every slot, while LOW (needs upstream or heavy compute)
+cannot take the `reserved` slots and is woken only after HIGH waiters. A
+request that is not admitted does not pile up latency: the route's fallback
+serves the last known data marked stale, or the client gets a 503 with
+Retry-After. AdmissionMiddleware applies this before FastAPI does any work.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Match
+
+from metrics import admission_queue_time, admission_rejections
+
+HIGH = 0
+LOW = 1
+
+class Overloaded(Exception):
+    """Not admitted: the queue was full or the wait exceeded the queue deadline"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class AdmissionGate:
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float, reserved: int = 0):
+        if not 0 <= reserved < limit:
+            raise ValueError(f"reserved ({reserved}) must be below limit ({limit}) for {name}")
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout  # Seconds a request may wait for a slot
+        self.reserved = reserved  # Slots only HIGH priority requests may use
+        self.active = 0
+        self._waiters = (deque(), deque())  # Futures per priority, FIFO
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters[HIGH]) + len(self._waiters[LOW])
+
+    def _has_room(self, priority: int) -> bool:
+        return self.active < (self.limit if priority == HIGH else self.limit - self.reserved)
+
+    async def acquire(self, priority: int = LOW):
+        # Never overtake waiters of the same or higher priority
+        if not self._waiters[HIGH] and (priority == HIGH or not self._waiters[LOW]) and self._has_room(priority):
+            self.active += 1
+            return
+        if self.queued >= self.queue_size:
+            raise Overloaded("queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                self.release()  # Admitted just as we gave up: hand the slot on
+            else:
+                future.cancel()
+                try:
+                    self._waiters[priority].remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded("queue_timeout") from None
+            raise
+        finally:
+            admission_queue_time.observe(time.perf_counter() - started, self.name)
+
+    def release(self):
+        self.active -= 1
+        for priority in (HIGH, LOW):
+            waiters = self._waiters[priority]
+            while waiters and self._has_room(priority):
+                future = waiters.popleft()
+                if not future.done():
+                    self.active += 1
+                    future.set_result(None)
+
+class RoutePolicy:
+    """Gate plus how to prioritise a request and what to serve when it is not admitted"""
+
+    def __init__(self, gate: AdmissionGate,
+                 priority: Optional[Callable[[Dict[str, Any], Request], int]] = None,
+                 fallback: Optional[Callable[[Dict[str, Any], Request, str], Optional[Response]]] = None):
+        self.gate = gate
+        self.priority = priority  # (path params, request) -> HIGH or LOW; LOW if not set
+        self.fallback = fallback  # (path params, request, reason) -> degraded response or None
+
+def degraded(response: Response, reason: str, fetched_at: Optional[float]) -> Response:
+    """Mark a response as served from older data instead of the normal path"""
+    response.headers["X-AQI-Degraded"] = reason
+    if fetched_at is not None:
+        response.headers["X-AQI-Data-Age"] = str(max(0, round(time.time() - fetched_at)))
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+def overloaded_response(retry_after: int = 1) -> Response:
+    return JSONResponse(
+        {"detail": "Server is busy, retry shortly"},
+        status_code=503,
+        headers={"Retry-After": str(retry_after), "Cache-Control": "no-store"},
+    )
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; routes without a policy pass straight through"""
+
+    def __init__(self, app, router_app=None, policies: Optional[Dict[str, RoutePolicy]] = None, max_cached_paths: int = 4096):
+        self.app = app
+        self.router_app = router_app
+        self.policies = policies or {}
+        self.max_cached_paths = max_cached_paths
+        self._routes: Dict[Tuple[str, str], Tuple[Optional[str], Dict[str, Any]]] = {}
+
+    def _resolve(self, scope) -> Tuple[Optional[str], Dict[str, Any]]:
+        key = (scope["method"], scope["path"])
+        resolved = self._routes.get(key)
+        if resolved is None:
+            resolved = (None, {})
+            for route in self.router_app.router.routes:
+                if getattr(route, "path", None) not in self.policies:
+                    continue
+                match, child = route.matches(scope)
+                if match == Match.FULL:
+                    resolved = (route.path, child.get("path_params", {}))
+                    break
+            if len(self._routes) >= self.max_cached_paths:
+                self._routes.clear()
+            self._routes[key] = resolved
+        return resolved
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.policies:
+            await self.app(scope, receive, send)
+            return
+        route, params = self._resolve(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policies[route]
+        request = Request(scope)
+        priority = policy.priority(params, request) if policy.priority is not None else LOW
+        try:
+            await policy.gate.acquire(priority)
+        except Overloaded as e:
+            admission_rejections.inc(route, e.reason)
+            response = None
+            if policy.fallback is not None:
+                try:
+                    response = policy.fallback(params, request, e.reason)
+                except Exception:
+                    logging.exception(f"Admission fallback for {route} failed")
+            await (response or overloaded_response())(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            policy.gate.release()
@@ -3,14 +3,26 @@ import httpx
 import os
 import logging
 import asyncio
+import time
+import json
+from pathlib import Path
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from aqi_cache import AQICache, observation_time
+from aqi_history import HistoryStore
+from aqi_store import HistoryRow, ObservationStore
+from metrics import airnow_fetches, airnow_latency, cache_lookups
+from observations import ZipObservation
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RateLimitedError, TokenBucket, hedged
 
-# Load .env file
-load_dotenv()
+DEFAULT_ZIP_CODES_PATH = Path(__file__).with_name("boston_zip_codes.json")
 
+def load_zip_codes(path: Path) -> Dict[str, str]:
+    """Neighborhood -> zip code mapping from a JSON object"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# Shape of one upstream row; responses are parsed into observations.ZipObservation
 class AirNowResponse(BaseModel):
     DateObserved: str
     HourObserved: int
@@ -26,116 +38,336 @@ class AirNowResponse(BaseModel):
 class AirNowService:
     def __init__(self):
         self.api_key = os.getenv("AIRNOW_API_KEY")
-        if not self.api_key:
-            raise ValueError("AIRNOW_API_KEY environment variable is required")
-        self.base_url = "https://www.airnowapi.org/aq/observation/zipCode/current/"
-        self.cache = {}  # Simple in-memory cache
-        self.cache_duration = timedelta(minutes=30)  # Cache for 30 minutes
+        # Overridable so benchmarks and tests can point at a local stand-in
+        self.base_url = os.getenv("AIRNOW_BASE_URL", "https://www.airnowapi.org/aq/observation/zipCode/current/")
+        # Stale-while-revalidate cache keyed by zip code, expiring with AirNow's hourly cycle
+        self.cache = AQICache(
+            max_entries=int(os.getenv("AQI_CACHE_MAX_ENTRIES", "1024")),
+            publish_lag=float(os.getenv("AIRNOW_PUBLISH_LAG_MINUTES", "25")) * 60,
+            max_stale=float(os.getenv("AQI_CACHE_MAX_STALE_MINUTES", "180")) * 60,
+            cache_failures=os.getenv("AQI_CACHE_FAILURES", "true").lower() in ("1", "true", "yes"),
+            failure_ttl=float(os.getenv("AQI_CACHE_FAILURE_TTL_SECONDS", "120")),
+        )
+        retention_days = float(os.getenv("AQI_HISTORY_RETENTION_DAYS", "400"))
+        self.history = HistoryStore(retention_days=retention_days)  # Every observation ever fetched
+        # Optional on-disk copy of the cache and the history so restarts start warm
+        db_path = os.getenv("AQI_CACHE_DB", "")
+        self.store: Optional[ObservationStore] = ObservationStore(
+            db_path, history_retention=self.history.retention
+        ) if db_path else None
+        self.client: Optional[httpx.AsyncClient] = None  # Shared pooled client, see start()
+        # Off in shared-snapshot followers: another worker fetches and shares observations
+        self.upstream_enabled = True
+        # Hourly-file ingestion (hourly_ingest.HourlyIngestor) replacing per-zip queries when set
+        self.bulk = None
+
+        # Upstream protection: time budgets, hedging, circuit breaker and the hourly quota
+        self.request_deadline = float(os.getenv("AIRNOW_REQUEST_DEADLINE_SECONDS", "5"))
+        self.fanout_deadline = float(os.getenv("AIRNOW_FANOUT_DEADLINE_SECONDS", "6"))
+        self.hedge_delay = float(os.getenv("AIRNOW_HEDGE_DELAY_SECONDS", "1.0"))  # Until enough latency samples
+        self.max_attempts = int(os.getenv("AIRNOW_MAX_ATTEMPTS", "2"))
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("AIRNOW_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("AIRNOW_BREAKER_RESET_SECONDS", "30")),
+        )
+        self.rate_limiter = TokenBucket(
+            rate_per_hour=float(os.getenv("AIRNOW_HOURLY_QUOTA", "500")),
+            burst=int(os.getenv("AIRNOW_QUOTA_BURST", "50")),
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}  # zip -> in-flight upstream fetch
+        self._history_loading: Optional[asyncio.Task] = None  # Stored history being read back, see load_store()
         
-        # Boston zip codes mapped to neighborhoods
-        self.boston_zip_codes = {
-            'Allston': '02134',
-            'Back Bay': '02116', 
-            'Bay Village': '02116',
-            'Beacon Hill': '02108',
-            'Brighton': '02135',
-            'Charlestown': '02129',
-            'Chinatown': '02111',
-            'Dorchester': '02122',
-            'East Boston': '02128',
-            'Fenway': '02215',
-            'Hyde Park': '02136',
-            'Jamaica Plain': '02130',
-            'Longwood': '02115',
-            'Mattapan': '02126',
-            'Mission Hill': '02120',
-            'North End': '02113',
-            'Roslindale': '02131',
-            'Roxbury': '02119',
-            'South End': '02118',
-            'South Boston': '02127',
-            'West Roxbury': '02132'
-        }
+        # Neighborhood -> zip code, from a data file so areas can change without a code change
+        self.boston_zip_codes = load_zip_codes(Path(os.getenv("AIRNOW_ZIP_CODES_PATH", str(DEFAULT_ZIP_CODES_PATH))))
     
-    async def get_aqi_by_zip(self, zip_code: str) -> Optional[AirNowResponse]:
-        """Get AQI data for a specific zip code"""
+    def _build_client(self) -> httpx.AsyncClient:
+        """Build the pooled upstream client from AIRNOW_* environment settings"""
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("AIRNOW_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("AIRNOW_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("AIRNOW_KEEPALIVE_EXPIRY", "60")),
+        )
+        timeout = httpx.Timeout(
+            connect=float(os.getenv("AIRNOW_CONNECT_TIMEOUT", "3")),
+            read=float(os.getenv("AIRNOW_READ_TIMEOUT", "10")),
+            write=float(os.getenv("AIRNOW_WRITE_TIMEOUT", "5")),
+            pool=float(os.getenv("AIRNOW_POOL_TIMEOUT", "5")),
+        )
+        http2 = os.getenv("AIRNOW_HTTP2", "false").lower() in ("1", "true", "yes")
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning("AIRNOW_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+    async def start(self):
+        """Open the shared upstream client (called from the app lifespan)"""
+        if not self.api_key and self.bulk is None:
+            raise ValueError("AIRNOW_API_KEY environment variable is required")
+        if self.client is None or self.client.is_closed:
+            self.client = self._build_client()
+
+    async def load_store(self):
+        """Open the on-disk store and warm the cache with observations still servable"""
+        if self.store is None:
+            return
+        try:
+            rows = await self.store.open()
+        except Exception:
+            logging.exception(f"Could not open AQI cache database {self.store.path}")
+            self.store = None
+            return
+        for zip_code, payload, fetched_at, fresh_until, stale_until in rows:
+            try:
+                value = ZipObservation.from_json(payload)
+            except Exception as e:
+                logging.warning(f"Skipping unreadable cached observation for zip {zip_code}: {e}")
+                continue
+            self.cache.restore(zip_code, value, fetched_at, fresh_until, stale_until)
+        logging.info(f"Restored {len(rows)} cached AQI observations from {self.store.path}")
+        # Months of history take about a second to read back, so it loads behind startup
+        self._history_loading = asyncio.create_task(self._load_history())
+
+    async def _load_history(self):
+        try:
+            series = await self.store.load_history()
+        except Exception:
+            logging.exception(f"Could not load AQI history from {self.store.path}")
+            return
+        for zip_code, parameter, times, values in series:
+            self.history.load(zip_code, parameter, times, values)
+        logging.info(f"Restored {sum(len(times) for _, _, times, _ in series)} AQI history points from {self.store.path}")
+
+    async def history_ready(self):
+        """Wait until the stored history has been loaded (no-op without a store)"""
+        if self._history_loading is not None:
+            await asyncio.shield(self._history_loading)
+
+    async def close(self):
+        """Close the shared upstream client and its pooled connections"""
+        if self._history_loading is not None and not self._history_loading.done():
+            self._history_loading.cancel()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.bulk is not None:
+            await self.bulk.close()
+        if self.store is not None:
+            await self.store.close()
+
+    async def _request(self, params: Dict[str, Any]) -> httpx.Response:
+        """One upstream attempt; raises on errors worth retrying (transport, 429, 5xx)"""
+        started = time.monotonic()
         try:
-            async with httpx.AsyncClient() as client:
-                params = {
-                    'zipCode': zip_code,
-                    'format': 'application/json',
-                    'API_KEY': self.api_key,
-                    'distance': 25  # 25 mile radius
-                }
-                
-                response = await client.get(self.base_url, params=params)
+            response = await self.client.get(self.base_url, params=params)
+            if response.status_code == 429 or response.status_code >= 500:
                 response.raise_for_status()
-                
-                data = response.json()
-                if data and len(data) > 0:
-                    # Return the first result (most recent)
-                    return AirNowResponse(**data[0])
-                return None
-                
+        except BaseException:
+            # Includes attempts cancelled by hedging or the deadline
+            airnow_latency.observe(time.monotonic() - started, "error")
+            raise
+        elapsed = time.monotonic() - started
+        self.latency.record(elapsed)
+        airnow_latency.observe(elapsed, "ok")
+        return response
+
+    async def get_aqi_by_zip(self, zip_code: str) -> Optional[ZipObservation]:
+        """Get AQI data for a specific zip code"""
+        probe = False
+        try:
+            # Scripts that never ran the lifespan still get a pooled client
+            if self.client is None or self.client.is_closed:
+                await self.start()
+            # Quota first: a half-open breaker must not hand out its probe to a call that then can't run
+            if not self.rate_limiter.try_acquire():
+                raise RateLimitedError("AirNow hourly quota exhausted")
+            if not self.breaker.allow():
+                self.rate_limiter.refund()
+                raise CircuitOpenError("AirNow circuit breaker is open")
+            probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+
+            params = {
+                'zipCode': zip_code,
+                'format': 'application/json',
+                'API_KEY': self.api_key,
+                'distance': 25  # 25 mile radius
+            }
+
+            # Back up a slow attempt at roughly the p95 of recent latencies
+            response = await asyncio.wait_for(
+                hedged(
+                    lambda: self._request(params),
+                    hedge_delay=self.latency.quantile(0.95, default=self.hedge_delay),
+                    max_attempts=self.max_attempts,
+                    allow_extra=self.rate_limiter.try_acquire,
+                ),
+                timeout=self.request_deadline,
+            )
+            response.raise_for_status()
+            self.breaker.record_success()
+            airnow_fetches.inc("ok")
+            
+            # One row per pollutant; keep all of them
+            return ZipObservation.from_airnow(response.json())
+
+        except (CircuitOpenError, RateLimitedError) as e:
+            airnow_fetches.inc("circuit_open" if isinstance(e, CircuitOpenError) else "rate_limited")
+            logging.warning(f"Skipping AirNow fetch for zip {zip_code}: {e}")
+            return None
         except Exception as e:
-            logging.error(f"Error fetching AQI for zip {zip_code}: {e}")
+            airnow_fetches.inc("timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+            self.breaker.record_failure()
+            logging.error(f"Error fetching AQI for zip {zip_code}: {e!r}")
             return None
+        finally:
+            if probe:
+                # No-op once an outcome was recorded; otherwise (e.g. cancelled) frees the probe
+                self.breaker.release_probe()
     
-    async def get_aqi_by_neighborhood(self, neighborhood: str) -> Optional[AirNowResponse]:
+    def _fetch_shared(self, zip_code: str) -> asyncio.Future:
+        """Return the in-flight fetch for a zip, starting one if none is running"""
+        future = self._inflight.get(zip_code)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_cache(zip_code))
+            self._inflight[zip_code] = future
+
+            def _release(done: asyncio.Future):
+                if self._inflight.get(zip_code) is done:
+                    del self._inflight[zip_code]
+
+            future.add_done_callback(_release)
+        return future
+
+    def _record_history(self, zip_code: str, aqi_data: ZipObservation) -> List[HistoryRow]:
+        observed = observation_time(aqi_data)
+        if observed is None:
+            return []
+        rows = [(zip_code, reading.parameter, int(observed), reading.aqi) for reading in aqi_data.readings]
+        for row in rows:
+            self.history.record(*row)
+        return rows
+
+    def store_observation(self, zip_code: str, aqi_data: ZipObservation):
+        """Cache, record and persist a newly fetched observation"""
+        history = self._record_history(zip_code, aqi_data)
+        entry = self.cache.set(zip_code, aqi_data)
+        if self.store is not None:
+            self.store.put(zip_code, aqi_data.to_json(), entry.fetched_at, entry.fresh_until, entry.stale_until)
+            self.store.put_history(history)
+
+    def apply_shared(self, zip_code: str, aqi_data: ZipObservation, fetched_at: float, fresh_until: float, stale_until: float):
+        """Adopt an observation another worker fetched (shared snapshot mode)"""
+        self._record_history(zip_code, aqi_data)
+        self.cache.restore(zip_code, aqi_data, fetched_at, fresh_until, stale_until)
+
+    async def _fetch_and_cache(self, zip_code: str) -> Optional[ZipObservation]:
+        if not self.upstream_enabled:
+            # The elected worker refreshes upstream; serve whatever it last shared
+            entry = self.cache.get(zip_code)
+            return entry.value if entry is not None else None
+        if self.bulk is not None:
+            # One hourly file fills every zip; this zip's entry is whatever it last provided
+            await self.bulk.refresh()
+            entry = self.cache.get(zip_code)
+            return entry.value if entry is not None else None
+
+        aqi_data = await self.get_aqi_by_zip(zip_code)
+        if aqi_data:
+            self.store_observation(zip_code, aqi_data)
+        else:
+            self.cache.set_failure(zip_code)
+            entry = self.cache.get(zip_code)
+            if entry is not None and entry.value is not None:
+                return entry.value
+        return aqi_data
+
+    async def get_aqi_for_zip(self, zip_code: str) -> Optional[ZipObservation]:
+        """Get AQI data for a zip code, coalescing concurrent cache misses into one fetch"""
+        entry = self.cache.get(zip_code)
+        if entry is not None:
+            if not entry.is_fresh(time.time()):
+                # Serve stale immediately; the refresh runs in the background
+                cache_lookups.inc(zip_code, "stale")
+                self._fetch_shared(zip_code)
+            else:
+                cache_lookups.inc(zip_code, "hit" if entry.value is not None else "negative")
+            return entry.value
+
+        cache_lookups.inc(zip_code, "miss")
+        # Shield so one cancelled caller does not cancel the fetch for everyone else
+        return await asyncio.shield(self._fetch_shared(zip_code))
+
+    async def get_aqi_by_neighborhood(self, neighborhood: str) -> Optional[ZipObservation]:
         """Get AQI data for a neighborhood by mapping to zip code"""
         zip_code = self.boston_zip_codes.get(neighborhood)
         if not zip_code:
             logging.warning(f"No zip code found for neighborhood: {neighborhood}")
             return None
-            
-        # Check cache first
-        cache_key = f"{neighborhood}_{zip_code}"
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if datetime.now() - timestamp < self.cache_duration:
-                return cached_data
-        
-        # Fetch from API
-        aqi_data = await self.get_aqi_by_zip(zip_code)
-        
-        # Cache the result
-        if aqi_data:
-            self.cache[cache_key] = (aqi_data, datetime.now())
-        
-        return aqi_data
+
+        return await self.get_aqi_for_zip(zip_code)
     
-    async def get_all_boston_aqi(self) -> Dict[str, AirNowResponse]:
+    def _missing_reason(self, zip_code: str, timed_out: bool) -> str:
+        """Why a zip has no observation this round, for the fan-out's error log"""
+        reason = f"no response within {self.fanout_deadline}s" if timed_out else "no observation returned"
+        entry = self.cache.get(zip_code)
+        if entry is not None and entry.value is None:
+            retry_in = max(0.0, entry.fresh_until - time.time())
+            reason += f"; last fetch failed and is negatively cached for another {retry_in:.0f}s"
+        return reason
+
+    async def get_all_boston_aqi(self) -> Dict[str, ZipObservation]:
         """Get AQI data for all Boston neighborhoods"""
         results = {}
         
-        # Process all neighborhoods concurrently
-        tasks = []
-        for neighborhood in self.boston_zip_codes.keys():
-            tasks.append(self.get_aqi_by_neighborhood(neighborhood))
-        
-        # Wait for all requests to complete
-        aqi_results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Neighborhoods can share a zip (Back Bay / Bay Village), so fetch each zip once
+        unique_zips = list(dict.fromkeys(self.boston_zip_codes.values()))
+        tasks = {zip_code: asyncio.ensure_future(self.get_aqi_for_zip(zip_code)) for zip_code in unique_zips}
+        # Overall budget: zips still waiting on upstream fall back to whatever is cached
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.fanout_deadline)
+        for task in pending:
+            task.cancel()  # The shielded upstream fetch keeps running and fills the cache
+
+        by_zip = {}
+        for zip_code, task in tasks.items():
+            if task in done:
+                by_zip[zip_code] = task.exception() or task.result() or self._missing_reason(zip_code, timed_out=False)
+            else:
+                entry = self.cache.get(zip_code)
+                by_zip[zip_code] = entry.value if entry is not None and entry.value is not None else self._missing_reason(
+                    zip_code, timed_out=True
+                )
         
-        for i, neighborhood in enumerate(self.boston_zip_codes.keys()):
-            result = aqi_results[i]
-            if isinstance(result, AirNowResponse):
+        for neighborhood, zip_code in self.boston_zip_codes.items():
+            result = by_zip[zip_code]
+            if isinstance(result, ZipObservation):
                 results[neighborhood] = result
             else:
-                logging.error(f"Failed to get AQI for {neighborhood}: {result}")
+                logging.error(f"Failed to get AQI for {neighborhood} (zip {zip_code}): {result}")
         
         return results
 
-# Global instance
-airnow_service = AirNowService()
+_service: Optional[AirNowService] = None
+
+def get_airnow_service() -> AirNowService:
+    """The process-wide service, built on first use instead of at import"""
+    global _service
+    if _service is None:
+        _service = AirNowService()
+    return _service
 
 # Add this at the end of the file:
 if __name__ == "__main__":
     import asyncio
+    from dotenv import load_dotenv
     
     async def test_service():
-        # Set your API key here (or set it as an environment variable)
-        api_key = "D14B043E-2B25-4F5D-96B9-7E6A8B978F22"  # Replace with your actual API key
-        os.environ["AIRNOW_API_KEY"] = api_key
+        # AIRNOW_API_KEY comes from the environment or backend/api/.env, as for the API
+        load_dotenv(dotenv_path=os.getenv("DOTENV_PATH") or Path(__file__).with_name(".env"))
+        airnow_service = get_airnow_service()
+        await airnow_service.start()
         
         print("Testing AirNow Service...")
         print("=" * 50)
@@ -145,6 +377,7 @@ if __name__ == "__main__":
         result = await airnow_service.get_aqi_by_neighborhood("Back Bay")
         if result:
             print(f"✅ Back Bay AQI: {result.AQI} ({result.ParameterName})")
+            print(f"   Pollutants: {result.pollutants()}")
             print(f"   Category: {result.Category}")
             print(f"   Observed: {result.DateObserved} at {result.HourObserved}:00")
         else:
@@ -162,6 +395,7 @@ if __name__ == "__main__":
         
         print("\n" + "=" * 50)
         print("Test completed!")
+        await airnow_service.close()
     
     # Run the test
     asyncio.run(test_service())
\ No newline at end of file
@@ -0,0 +1,133 @@
+# aqi_cache.py
+"""
+Bounded stale-while-revalidate cache for AirNow observations.
+
+Freshness follows AirNow's hourly cycle: an observation for hour H is
+superseded once hour H+1 has been published, which happens roughly an
+hour plus a publishing lag after H ends. Entries past that point are
+still served (stale) while the caller refreshes them in the background.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Hashable, Optional
+
+# AirNow reports LocalTimeZone as an abbreviation
+TIMEZONE_OFFSETS = {
+    "UTC": 0, "GMT": 0,
+    "AST": -4, "ADT": -3,
+    "EST": -5, "EDT": -4,
+    "CST": -6, "CDT": -5,
+    "MST": -7, "MDT": -6,
+    "PST": -8, "PDT": -7,
+    "AKST": -9, "AKDT": -8,
+    "HST": -10,
+}
+
+def observation_time(observation: Any) -> Optional[float]:
+    """Epoch seconds at the start of an observation's hour, or None if unparseable"""
+    try:
+        offset = TIMEZONE_OFFSETS[observation.LocalTimeZone.strip().upper()]
+        day = datetime.strptime(observation.DateObserved.strip(), "%Y-%m-%d")
+    except (AttributeError, KeyError, ValueError):
+        return None
+    local = day.replace(hour=observation.HourObserved, tzinfo=timezone(timedelta(hours=offset)))
+    return local.timestamp()
+
+class CacheEntry:
+    __slots__ = ("value", "fetched_at", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fetched_at: float, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+    def is_servable(self, now: float) -> bool:
+        return now < self.stale_until
+
+class AQICache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        publish_lag: float = 25 * 60,
+        fallback_ttl: float = 30 * 60,
+        min_ttl: float = 5 * 60,
+        max_stale: float = 3 * 3600,
+        cache_failures: bool = True,
+        failure_ttl: float = 120,
+    ):
+        self.max_entries = max_entries
+        self.publish_lag = publish_lag
+        self.fallback_ttl = fallback_ttl
+        self.min_ttl = min_ttl
+        self.max_stale = max_stale
+        self.cache_failures = cache_failures
+        self.failure_ttl = failure_ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def expiry_for(self, value: Any, now: float) -> float:
+        """When the next observation after `value` should be available upstream"""
+        observed = observation_time(value)
+        if observed is None:
+            return now + self.fallback_ttl
+        next_published = observed + 2 * 3600 + self.publish_lag
+        # Upstream running late (or clock skew): retry soon, but not in a tight loop
+        return min(max(next_published, now + self.min_ttl), now + 2 * 3600)
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[CacheEntry]:
+        """Return the entry for key if it can still be served, fresh or stale"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time() if now is None else now
+        if not entry.is_servable(now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any, now: Optional[float] = None) -> CacheEntry:
+        now = time.time() if now is None else now
+        fresh_until = self.expiry_for(value, now)
+        entry = CacheEntry(value, now, fresh_until, fresh_until + self.max_stale)
+        self._store(key, entry)
+        return entry
+
+    def restore(self, key: Hashable, value: Any, fetched_at: float, fresh_until: float, stale_until: float):
+        """Re-insert an entry with its original timings (e.g. loaded from disk)"""
+        self._store(key, CacheEntry(value, fetched_at, fresh_until, stale_until))
+
+    def set_failure(self, key: Hashable, now: Optional[float] = None):
+        """Record a failed fetch so callers back off for failure_ttl (if enabled)"""
+        if not self.cache_failures:
+            return
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is not None and entry.value is not None and entry.is_servable(now):
+            # Keep serving the last good value, just hold off the next refresh
+            entry.fresh_until = min(now + self.failure_ttl, entry.stale_until)
+            return
+        self._store(key, CacheEntry(None, now, now + self.failure_ttl, now + self.failure_ttl))
+
+    def _store(self, key: Hashable, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def items(self):
+        """(key, entry) pairs without touching LRU order, e.g. for metrics"""
+        return list(self._entries.items())
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,119 @@
+# aqi_history.py
+"""
+Append-only AQI history, queried in memory.
+
+Each (zip code, parameter) series is two parallel NumPy columns, observation
+times and AQI values, grown by doubling. Range queries are a pair of binary
+searches and bucketed min/mean/max is done with ufunc reduceat, so no
+per-observation Python objects are ever created. With AQI_CACHE_DB set the
+points are also appended to the SQLite store (aqi_store) and loaded back
+into these columns at startup.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+class Series:
+    __slots__ = ("times", "values", "size")
+
+    def __init__(self, capacity: int = 64):
+        self.times = np.empty(capacity, dtype=np.int64)  # Epoch seconds, ascending
+        self.values = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    @classmethod
+    def from_arrays(cls, times: np.ndarray, values: np.ndarray) -> "Series":
+        """Series over sorted, de-duplicated points, with room to grow"""
+        series = cls(max(64, 1 << int(len(times)).bit_length()))
+        series.times[:len(times)] = times
+        series.values[:len(values)] = values
+        series.size = len(times)
+        return series
+
+    def append(self, timestamp: int, value: float, retention: Optional[int] = None):
+        if self.size:
+            last = self.times[self.size - 1]
+            if timestamp == last:
+                # Same observation hour fetched again: keep the latest value
+                self.values[self.size - 1] = value
+                return
+            if timestamp < last:
+                return
+        if self.size == len(self.times):
+            self._make_room(timestamp, retention)
+        self.times[self.size] = timestamp
+        self.values[self.size] = value
+        self.size += 1
+
+    def _make_room(self, now: int, retention: Optional[int]):
+        # Drop points older than the retention window before deciding to grow
+        keep_from = 0
+        if retention is not None:
+            keep_from = int(np.searchsorted(self.times[:self.size], now - retention, side="left"))
+        kept = self.size - keep_from
+        capacity = len(self.times) if kept < len(self.times) // 2 else len(self.times) * 2
+        times = np.empty(capacity, dtype=np.int64)
+        values = np.empty(capacity, dtype=np.float32)
+        times[:kept] = self.times[keep_from:self.size]
+        values[:kept] = self.values[keep_from:self.size]
+        self.times, self.values, self.size = times, values, kept
+
+    def window(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Views of the points with start <= time < end"""
+        times = self.times[:self.size]
+        lo = int(np.searchsorted(times, start, side="left"))
+        hi = int(np.searchsorted(times, end, side="left"))
+        return times[lo:hi], self.values[lo:hi]
+
+def aggregate(times: np.ndarray, values: np.ndarray, start: int, bucket: int) -> Dict[str, List]:
+    """Bucketed min/mean/max/count over sorted points, as column lists"""
+    if len(times) == 0:
+        return {"time": [], "min": [], "mean": [], "max": [], "count": []}
+    # Align buckets to multiples of the bucket size so repeated queries line up
+    origin = start - start % bucket
+    buckets = (times - origin) // bucket
+    starts = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate(([0], starts))
+    counts = np.diff(np.append(starts, len(values)))
+    sums = np.add.reduceat(values.astype(np.float64), starts)
+    return {
+        "time": (origin + buckets[starts] * bucket).tolist(),
+        "min": np.minimum.reduceat(values, starts).tolist(),
+        "mean": np.round(sums / counts, 2).tolist(),
+        "max": np.maximum.reduceat(values, starts).tolist(),
+        "count": counts.tolist(),
+    }
+
+class HistoryStore:
+    def __init__(self, retention_days: Optional[float] = None):
+        self.retention = int(retention_days * 86400) if retention_days else None
+        self._series: Dict[Tuple[str, str], Series] = {}
+
+    def record(self, zip_code: str, parameter: str, timestamp: float, value: float):
+        key = (zip_code, parameter)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = Series()
+        series.append(int(timestamp), value, self.retention)
+
+    def load(self, zip_code: str, parameter: str, times: np.ndarray, values: np.ndarray):
+        """Merge sorted stored points into a series; points already in memory win on the same hour"""
+        series = self._series.get((zip_code, parameter))
+        if series is not None and series.size:
+            times = np.concatenate((times, series.times[:series.size]))
+            values = np.concatenate((values, series.values[:series.size]))
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[order]
+            last = np.append(times[1:] != times[:-1], True)  # Last of each run of equal times
+            times, values = times[last], values[last]
+        self._series[(zip_code, parameter)] = Series.from_arrays(times, values)
+
+    def parameters(self, zip_code: str) -> List[str]:
+        return sorted(parameter for zip_, parameter in self._series if zip_ == zip_code)
+
+    def query(self, zip_code: str, parameter: str, start: int, end: int, bucket: int) -> Dict[str, List]:
+        series = self._series.get((zip_code, parameter))
+        if series is None:
+            return aggregate(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), start, bucket)
+        times, values = series.window(start, end)
+        return aggregate(times, values, start, bucket)
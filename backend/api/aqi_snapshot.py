@@ -0,0 +1,345 @@
+# aqi_snapshot.py
+"""
+Precomputed, pre-serialized response bodies for the city-wide AQI endpoints.
+
+A background task polls every zip on a schedule, builds each endpoint's
+JSON body once as bytes (plus gzip/brotli variants) and swaps the new set
+in atomically. Handlers then only copy bytes out, and clients revalidate
+with a strong ETag.
+
+Every refresh that changes a neighborhood's observation or score (or
+drops one) bumps the store's version and rebuilds every body with it; a
+refresh that changes nothing keeps the bodies, version and ETags and does
+not wake the listeners. Each neighborhood remembers the version it last
+changed at, so a poller that already holds version N can ask for only what
+changed since N plus the neighborhoods that were removed. Like the stream's
+event ids, versions belong to one process: they start from the store's
+creation time in seconds, so a version from before a restart (or one this
+process never issued) is answered with the full snapshot instead.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, TypedDict
+
+from fastapi import Request, Response
+
+from responses import CompressedBody, compressed_response, dumps
+from scoring import NeighborhoodScores, ScoreWeights
+
+BOSTON = "boston"
+NEIGHBORHOODS_WITH_AQI = "neighborhoods_with_aqi"
+MAX_DELTA_BODIES = 64  # Delta bodies kept per version, keyed by the client's `since`
+
+class Category(TypedDict):
+    Number: int
+    Name: str
+
+class Coordinates(TypedDict):
+    latitude: float
+    longitude: float
+
+class PollutantAQI(TypedDict):
+    aqi: int
+    category: Category
+
+class ObservationPayload(TypedDict):
+    aqi: int
+    parameter: str
+    category: Category
+    dominant_pollutant: str
+    pollutants: Dict[str, PollutantAQI]
+    date_observed: str
+    hour_observed: int
+    reporting_area: str
+    coordinates: Coordinates
+
+class BostonPayload(TypedDict):
+    timestamp: str
+    version: int
+    neighborhoods: Dict[str, ObservationPayload]
+    total_neighborhoods: int
+
+class BostonDeltaPayload(TypedDict):
+    timestamp: str
+    version: int
+    since: int
+    neighborhoods: Dict[str, ObservationPayload]  # Only those that changed after `since`
+    removed: List[str]
+    total_neighborhoods: int
+
+class NeighborhoodsPayload(TypedDict):
+    neighborhoods: List[Dict[str, Any]]
+    count: int
+    timestamp: str
+    version: int
+
+# Mock fields of /neighborhoods/with-aqi; shared by every neighborhood and never mutated
+MOCK_CONCENTRATIONS = {
+    "pm25": 15.0,  # Mock concentrations; AirNow reports per-pollutant AQI only
+    "pm10": 25.0,
+    "o3": 0.05,
+    "no2": 0.02,
+    "so2": 0.01,
+    "co": 1.0,
+}
+MOCK_WATER_QUALITY = {
+    "ph": 7.2,
+    "turbidity": 0.5,
+    "dissolved_oxygen": 8.5,
+    "bacteria_count": 10,
+    "lead_level": 0.001,
+    "chlorine_residual": 0.5,
+    "last_updated": "2024-01-01T00:00:00Z"
+}
+MOCK_ENVIRONMENTAL_HAZARDS = {
+    "noise_level": 65,
+    "traffic_density": 7,
+    "industrial_proximity": 3,
+    "green_space_percentage": 25,
+    "flood_risk": 4,
+    "heat_island_effect": 6,
+    "last_updated": "2024-01-01T00:00:00Z"
+}
+
+def format_observation(data) -> ObservationPayload:
+    """Per-neighborhood AQI fields shared by the AQI endpoints"""
+    return {
+        "aqi": data.AQI,
+        "parameter": data.ParameterName,
+        "category": data.Category,
+        "dominant_pollutant": data.ParameterName,
+        "pollutants": data.pollutants(),
+        "date_observed": data.DateObserved,
+        "hour_observed": data.HourObserved,
+        "reporting_area": data.ReportingArea,
+        "coordinates": {
+            "latitude": data.Latitude,
+            "longitude": data.Longitude
+        }
+    }
+
+def build_boston_payload(aqi_data: Dict[str, Any], timestamp: str) -> BostonPayload:
+    formatted_data = {neighborhood: format_observation(data) for neighborhood, data in aqi_data.items()}
+    return {
+        "timestamp": timestamp,
+        "neighborhoods": formatted_data,
+        "total_neighborhoods": len(formatted_data)
+    }
+
+def overall_score(score: Optional[float]) -> Optional[int]:
+    """overall_score is a whole number in the API; the ranking keeps one decimal"""
+    return None if score is None else int(round(score))
+
+def build_neighborhoods_payload(aqi_data: Dict[str, Any], timestamp: str, scores: Optional[Mapping[str, float]] = None) -> NeighborhoodsPayload:
+    if scores is None:
+        engine = NeighborhoodScores(water=MOCK_WATER_QUALITY, hazards=MOCK_ENVIRONMENTAL_HAZARDS)
+        engine.update({name: data.AQI for name, data in aqi_data.items()})
+        scores = engine.current()
+    neighborhoods = []
+    for neighborhood_name, aqi_info in aqi_data.items():
+        neighborhood = {
+            "id": neighborhood_name.lower().replace(" ", "-"),
+            "name": neighborhood_name,
+            "environmental_data": {
+                "air_quality": {
+                    **MOCK_CONCENTRATIONS,
+                    "aqi": aqi_info.AQI,
+                    "pollutant_aqi": {r.parameter: r.aqi for r in aqi_info.readings},
+                    "dominant_pollutant": aqi_info.ParameterName,
+                    "last_updated": aqi_info.DateObserved
+                },
+                "water_quality": MOCK_WATER_QUALITY,
+                "environmental_hazards": MOCK_ENVIRONMENTAL_HAZARDS,
+                "overall_score": overall_score(scores.get(neighborhood_name)),
+                "last_updated": aqi_info.DateObserved
+            },
+            "metadata": {
+                "migrated_at": "2024-01-01T00:00:00Z",
+                "data_source": "airnow_api",
+                "neighborhood_id": neighborhood_name.lower().replace(" ", "-")
+            }
+        }
+        neighborhoods.append(neighborhood)
+
+    return {
+        "neighborhoods": neighborhoods,
+        "count": len(neighborhoods),
+        "timestamp": timestamp
+    }
+
+BUILDERS = {
+    BOSTON: build_boston_payload,
+    NEIGHBORHOODS_WITH_AQI: build_neighborhoods_payload,
+}
+
+class SnapshotBody(CompressedBody):
+    __slots__ = ()
+
+    def __init__(self, body: bytes):
+        # Recompressed on the event loop whenever the data changes, so favour speed over ratio
+        super().__init__(body, gzip_level=6, brotli_quality=5)
+
+def snapshot_response(request: Request, snapshot: SnapshotBody) -> Response:
+    """Serve a snapshot body, or 304 Not Modified if the client already has it"""
+    return compressed_response(request, snapshot, "no-cache")
+
+class AQISnapshotStore:
+    def __init__(self, service, interval: float = 60.0, weights: ScoreWeights = ScoreWeights()):
+        self.service = service
+        self.interval = interval  # Seconds between polls; 0 disables the poller
+        # Environmental scores and ranking, rescored for changed neighborhoods on every refresh
+        self.scores = NeighborhoodScores(weights, water=MOCK_WATER_QUALITY, hazards=MOCK_ENVIRONMENTAL_HAZARDS)
+        self._bodies: Dict[str, SnapshotBody] = {}
+        self.refreshed_at: Optional[float] = None  # Epoch seconds of the last successful refresh
+        self._task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Future] = None  # On-demand refresh that concurrent readers share
+        self.first_version = int(time.time())
+        self.version = self.first_version  # Bumped by every refresh that changes a neighborhood
+        self._observations: Dict[str, ObservationPayload] = {}
+        self._scored: Dict[str, Optional[float]] = {}  # Score each neighborhood had at its last change
+        self._changed_at: Dict[str, int] = {}  # neighborhood -> version its observation or score last changed at
+        self._removed_at: Dict[str, int] = {}  # neighborhood -> version it disappeared at
+        self._changed_timestamp = datetime.now().isoformat()  # When the current version was set
+        self._deltas: Dict[int, SnapshotBody] = {}
+        self._listeners: List[Tuple[Callable[[Dict[str, Any]], None], bool]] = []
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None], changes_only: bool = True):
+        """Call listener(aqi_data) after every refresh that bumps the version, e.g. to rebuild derived data
+
+        changes_only=False calls it after every refresh, for listeners that
+        also track freshness rather than just the data.
+        """
+        self._listeners.append((listener, changes_only))
+
+    @property
+    def polling(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def refresh(self) -> Dict[str, SnapshotBody]:
+        """Poll all zips and atomically swap in freshly built bodies"""
+        aqi_data = await self.service.get_all_boston_aqi()
+        timestamp = datetime.now().isoformat()
+        self.scores.update({name: data.AQI for name, data in aqi_data.items()})
+        scores = self.scores.current()
+
+        # Nothing changed: keep the old bodies so their version and ETags stay valid
+        changed = self._track_changes(aqi_data, scores, timestamp)
+        if changed or len(self._bodies) < len(BUILDERS):
+            payloads = {
+                BOSTON: build_boston_payload(aqi_data, self._changed_timestamp),
+                NEIGHBORHOODS_WITH_AQI: build_neighborhoods_payload(aqi_data, self._changed_timestamp, scores),
+            }
+            bodies = {}
+            for name, payload in payloads.items():
+                payload["version"] = self.version
+                bodies[name] = SnapshotBody(dumps(payload))
+            self._bodies = bodies
+        self.refreshed_at = time.time()
+        for listener, changes_only in self._listeners:
+            if changes_only and not changed:
+                continue
+            try:
+                listener(aqi_data)
+            except Exception:
+                logging.exception(f"AQI snapshot listener {listener!r} failed")
+        return self._bodies
+
+    def _track_changes(self, aqi_data: Dict[str, Any], scores: Mapping[str, float], timestamp: str) -> bool:
+        """Stamp changed and removed neighborhoods with a new version; False if there are none
+
+        This one change set decides both the version and whether every body
+        is rebuilt, so full bodies and ?since= deltas always agree.
+        """
+        observations = {name: format_observation(data) for name, data in aqi_data.items()}
+        changed = [
+            name for name, value in observations.items()
+            if self._observations.get(name) != value or self._scored.get(name) != scores.get(name)
+        ]
+        removed = [name for name in self._observations if name not in observations]
+        self._observations = observations
+        self._scored = {name: scores.get(name) for name in observations}
+        if not changed and not removed:
+            return False
+        self.version += 1
+        self._changed_timestamp = timestamp
+        for name in changed:
+            self._changed_at[name] = self.version
+            self._removed_at.pop(name, None)
+        for name in removed:
+            self._removed_at[name] = self.version
+            del self._changed_at[name]
+        self._deltas = {}
+        return True
+
+    def last(self, name: str) -> Optional[SnapshotBody]:
+        """The most recently built body without refreshing, e.g. to degrade to"""
+        return self._bodies.get(name)
+
+    def clear(self):
+        """Drop the built bodies so the next read rebuilds them"""
+        self._bodies = {}
+
+    def _refresh_shared(self) -> asyncio.Future:
+        """Return the running on-demand refresh, starting one if none is running"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self.refresh())
+        return self._refreshing
+
+    async def current(self, name: str) -> SnapshotBody:
+        """Latest body for an endpoint; built on demand when the poller is off"""
+        snapshot = self._bodies.get(name)
+        if snapshot is None or not self.polling:
+            # Shield so one cancelled reader does not cancel the refresh for everyone else
+            snapshot = (await asyncio.shield(self._refresh_shared()))[name]
+        return snapshot
+
+    async def delta(self, since: int) -> SnapshotBody:
+        """/aqi/boston body with only what changed after version `since`
+
+        Falls back to the full body when `since` is not a version this
+        process issued. Bodies are built once per (version, since) pair, so a
+        poller that is already current gets the same tiny body every time.
+        """
+        snapshot = await self.current(BOSTON)
+        if not self.first_version <= since <= self.version:
+            return snapshot
+        body = self._deltas.get(since)
+        if body is None:
+            payload: BostonDeltaPayload = {
+                "timestamp": self._changed_timestamp,
+                "version": self.version,
+                "since": since,
+                "neighborhoods": {
+                    name: self._observations[name] for name, version in self._changed_at.items() if version > since
+                },
+                "removed": [name for name, version in self._removed_at.items() if version > since],
+                "total_neighborhoods": len(self._observations),
+            }
+            body = SnapshotBody(dumps(payload))
+            if len(self._deltas) >= MAX_DELTA_BODIES:
+                self._deltas.clear()
+            self._deltas[since] = body
+        return body
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logging.exception("AQI snapshot refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and not self.polling:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,194 @@
+# aqi_store.py
+"""
+SQLite persistence for the AQI cache so restarts begin warm.
+
+Cache writes are queued and flushed to disk by a background task, so the
+request path never waits on SQLite. On startup every row that can still
+be served is loaded back into the cache; rows past their stale window are
+compacted away.
+
+The same database keeps an append-only history table (one row per zip,
+parameter and observation hour) so the in-memory history survives
+restarts and deploys. It is read back one series at a time as NumPy
+columns and trimmed to the history retention window on compaction.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    cache_key   TEXT PRIMARY KEY,
+    payload     TEXT NOT NULL,
+    fetched_at  REAL NOT NULL,
+    fresh_until REAL NOT NULL,
+    stale_until REAL NOT NULL
+)
+"""
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    zip_code    TEXT NOT NULL,
+    parameter   TEXT NOT NULL,
+    observed_at INTEGER NOT NULL,
+    aqi         REAL,
+    PRIMARY KEY (zip_code, parameter, observed_at)
+) WITHOUT ROWID
+"""
+
+Row = Tuple[str, str, float, float, float]
+HistoryRow = Tuple[str, str, int, float]  # zip, parameter, observation hour (epoch seconds), AQI
+
+class ObservationStore:
+    def __init__(self, path: str, flush_interval: float = 1.0, compact_interval: float = 3600.0,
+                 history_retention: Optional[float] = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.history_retention = history_retention  # Seconds of history kept on disk; None keeps everything
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._queue: "asyncio.Queue[Row]" = asyncio.Queue()
+        self._history_queue: "asyncio.Queue[HistoryRow]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._last_compact = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA)
+        conn.execute(HISTORY_SCHEMA)
+        conn.commit()
+        self._conn = conn
+
+    def _load(self, now: float) -> List[Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT cache_key, payload, fetched_at, fresh_until, stale_until "
+                "FROM observations WHERE stale_until > ?",
+                (now,),
+            ).fetchall()
+
+    def _write(self, rows: List[Row]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO observations (cache_key, payload, fetched_at, fresh_until, stale_until) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(cache_key) DO UPDATE SET payload=excluded.payload, "
+                "fetched_at=excluded.fetched_at, fresh_until=excluded.fresh_until, "
+                "stale_until=excluded.stale_until",
+                rows,
+            )
+            self._conn.commit()
+
+    def _load_history(self, since: float) -> List[Tuple[str, str, np.ndarray, np.ndarray]]:
+        """(zip, parameter, times, values) per stored series, points at or after `since` in time order"""
+        series = []
+        with self._lock:
+            keys = self._conn.execute("SELECT DISTINCT zip_code, parameter FROM history").fetchall()
+            for zip_code, parameter in keys:
+                points = np.array(self._conn.execute(
+                    "SELECT observed_at, aqi FROM history "
+                    "WHERE zip_code = ? AND parameter = ? AND observed_at >= ? ORDER BY observed_at",
+                    (zip_code, parameter, int(since)),
+                ).fetchall(), dtype=np.float64).reshape(-1, 2)
+                if len(points):
+                    series.append((zip_code, parameter, points[:, 0].astype(np.int64), points[:, 1].astype(np.float32)))
+        return series
+
+    def _append_history(self, rows: List[HistoryRow]):
+        with self._lock:
+            # Same observation hour fetched again: keep the latest value, like the in-memory series
+            self._conn.executemany(
+                "INSERT INTO history (zip_code, parameter, observed_at, aqi) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(zip_code, parameter, observed_at) DO UPDATE SET aqi=excluded.aqi",
+                rows,
+            )
+            self._conn.commit()
+
+    def _compact(self, now: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM observations WHERE stale_until <= ?", (now,)).rowcount
+            if self.history_retention is not None:
+                self._conn.execute("DELETE FROM history WHERE observed_at < ?", (int(now - self.history_retention),))
+            self._conn.commit()
+            if deleted:
+                self._conn.execute("VACUUM")
+            return deleted
+
+    async def open(self) -> List[Row]:
+        """Open the database, compact expired rows and return the rows still servable"""
+        now = time.time()
+        await asyncio.to_thread(self._open)
+        await asyncio.to_thread(self._compact, now)
+        self._last_compact = now
+        rows = await asyncio.to_thread(self._load, now)
+        self._task = asyncio.create_task(self._run())
+        return rows
+
+    async def load_history(self) -> List[Tuple[str, str, np.ndarray, np.ndarray]]:
+        """Stored history inside the retention window, one (zip, parameter, times, values) per series"""
+        since = time.time() - self.history_retention if self.history_retention is not None else 0
+        return await asyncio.to_thread(self._load_history, since)
+
+    def put(self, key: str, payload: str, fetched_at: float, fresh_until: float, stale_until: float):
+        """Queue a write-through; never blocks the caller"""
+        if self._conn is not None:
+            self._queue.put_nowait((key, payload, fetched_at, fresh_until, stale_until))
+
+    def put_history(self, rows: Iterable[HistoryRow]):
+        """Queue history points for appending; never blocks the caller"""
+        if self._conn is not None:
+            for row in rows:
+                self._history_queue.put_nowait(row)
+
+    async def _flush(self):
+        # Later writes for the same key win, so collapse the batch before hitting disk
+        pending = {}
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            pending[row[0]] = row
+        if pending:
+            await asyncio.to_thread(self._write, list(pending.values()))
+        history = {}
+        while not self._history_queue.empty():
+            row = self._history_queue.get_nowait()
+            history[row[:3]] = row
+        if history:
+            await asyncio.to_thread(self._append_history, list(history.values()))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+                now = time.time()
+                if now - self._last_compact >= self.compact_interval:
+                    self._last_compact = now
+                    await asyncio.to_thread(self._compact, now)
+            except Exception:
+                logging.exception(f"Failed to persist AQI cache to {self.path}")
+
+    async def close(self):
+        """Stop the writer, flush anything still queued and close the database"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            try:
+                await self._flush()
+            except Exception:
+                logging.exception(f"Failed to flush AQI cache to {self.path}")
+            with self._lock:
+                self._conn.close()
+            self._conn = None
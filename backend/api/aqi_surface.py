@@ -0,0 +1,117 @@
+# aqi_surface.py
+"""
+Interpolated AQI surface over the city.
+
+Station values (the reporting-area coordinates AirNow returns with each
+observation) are spread over a regular lon/lat grid with inverse-distance
+weighting, computed as one cells x stations NumPy operation. Each grid
+cell is labelled once with the neighborhood containing its center, so
+per-neighborhood zonal averages are a single bincount. Surfaces are cached
+per observation hour and station set.
+"""
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from geo_index import NeighborhoodIndex
+from responses import make_etag
+
+NODATA = np.iinfo(np.uint16).max
+
+class Surface:
+    __slots__ = ("key", "grid", "zonal", "body", "etag")
+
+    def __init__(self, key: Tuple, grid: np.ndarray, zonal: Dict[str, float]):
+        self.key = key
+        self.grid = grid  # float32, shape (rows, cols), row 0 = southernmost
+        self.zonal = zonal
+        # Little-endian uint16, NODATA outside every neighborhood
+        raster = np.where(np.isnan(grid), NODATA, np.clip(np.rint(grid), 0, NODATA - 1))
+        self.body = raster.astype("<u2").tobytes()
+        self.etag = make_etag(self.body)
+
+class SurfaceBuilder:
+    def __init__(self, index: NeighborhoodIndex, resolution: float = 0.0025, power: float = 2.0):
+        self.index = index
+        self.resolution = resolution  # Cell size in degrees
+        self.power = power
+        self._lock = threading.Lock()
+        self._cells: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._labels: Optional[np.ndarray] = None
+        self._surfaces: Dict[Optional[str], Surface] = {}
+
+    def prepare(self):
+        """Cell centers and their neighborhood labels, computed once"""
+        with self._lock:
+            self._prepare()
+
+    def _prepare(self):
+        if self._cells is not None:
+            return
+        self.index.load()
+        minx, miny, maxx, maxy = self.index.extent
+        self.cols = max(1, int(np.ceil((maxx - minx) / self.resolution)))
+        self.rows = max(1, int(np.ceil((maxy - miny) / self.resolution)))
+        self.bbox = (minx, miny, minx + self.cols * self.resolution, miny + self.rows * self.resolution)
+        lons = minx + (np.arange(self.cols) + 0.5) * self.resolution
+        lats = miny + (np.arange(self.rows) + 0.5) * self.resolution
+        grid_lons, grid_lats = np.meshgrid(lons, lats)
+        self._cells = (grid_lons.ravel(), grid_lats.ravel())
+        self._labels = self.index.locate_many(*self._cells)
+        self._names = self.index.names()
+        # Degrees of longitude are shorter than degrees of latitude this far north
+        self._lon_scale = float(np.cos(np.radians((miny + maxy) / 2)))
+
+    def interpolate(self, lons: np.ndarray, lats: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Inverse-distance-weighted value at every cell center"""
+        cell_lons, cell_lats = self._cells
+        dx = (cell_lons[:, None] - lons[None, :]) * self._lon_scale
+        dy = cell_lats[:, None] - lats[None, :]
+        d2 = dx * dx + dy * dy
+        exact = d2 == 0
+        with np.errstate(divide="ignore"):
+            weights = d2 ** (-self.power / 2)
+        # A cell sitting exactly on a station takes that station's value
+        on_station = exact.any(axis=1)
+        weights[on_station] = exact[on_station]
+        surface = (weights @ values) / weights.sum(axis=1)
+        surface[self._labels < 0] = np.nan
+        return surface.reshape(self.rows, self.cols).astype(np.float32)
+
+    def zonal_means(self, grid: np.ndarray) -> Dict[str, float]:
+        labels = self._labels
+        inside = labels >= 0
+        counts = np.bincount(labels[inside], minlength=len(self._names))
+        sums = np.bincount(labels[inside], weights=grid.ravel()[inside].astype(np.float64), minlength=len(self._names))
+        return {
+            name: round(float(sums[i] / counts[i]), 1)
+            for i, name in enumerate(self._names)
+            if counts[i]
+        }
+
+    def build(self, observations: Iterable, parameter: Optional[str] = None) -> Optional[Surface]:
+        """Surface for the given observations, reusing the cached one for the same hour"""
+        stations = {}
+        hours = set()
+        for observation in observations:
+            reading = observation.dominant if parameter is None else observation.reading(parameter)
+            if reading is None:
+                continue
+            stations[(observation.Longitude, observation.Latitude)] = reading.aqi
+            hours.add((observation.DateObserved.strip(), observation.HourObserved))
+        if not stations:
+            return None
+
+        key = (tuple(sorted(hours)), tuple(sorted(stations.items())))
+        with self._lock:
+            cached = self._surfaces.get(parameter)
+            if cached is not None and cached.key == key:
+                return cached
+            self._prepare()
+            coords = np.array(list(stations.keys()), dtype=np.float64)
+            values = np.array(list(stations.values()), dtype=np.float64)
+            grid = self.interpolate(coords[:, 0], coords[:, 1], values)
+            surface = Surface(key, grid, self.zonal_means(grid))
+            self._surfaces[parameter] = surface
+            return surface
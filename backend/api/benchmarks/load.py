@@ -0,0 +1,210 @@
+# backend/api/benchmarks/load.py
+"""
+Load and latency scenarios for the AQI API against a local AirNow stand-in
+
+The app runs in-process through its real lifespan (httpx ASGI transport);
+only upstream AirNow is replaced, by stub_airnow on a loopback port. Each
+scenario resets the caches, drives a mix of /aqi/boston,
+/aqi/neighborhood/{name} and /neighborhoods/with-aqi requests at a fixed
+concurrency and records p50/p95/p99 latency, throughput, status codes and
+upstream calls. Results are written as JSON for comparison between runs.
+
+Run from backend/api:
+    python benchmarks/load.py [--scenarios cold_cache,warm_cache] [--scale 0.5]
+                              [--fixtures fixtures.json] [--output out.json] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from stub_airnow import StubAirNow, StubConfig, StubServer, load_fixtures
+
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+
+# requests, concurrency, whether caches are primed first, and stub settings
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "cold_cache": {"requests": 400, "concurrency": 8, "warm": False, "stub": {}},
+    "warm_cache": {"requests": 3000, "concurrency": 16, "warm": True, "stub": {}},
+    "burst": {"requests": 500, "concurrency": 500, "warm": False, "stub": {}},
+    "slow_upstream": {
+        "requests": 400, "concurrency": 16, "warm": False,
+        "stub": {"latency": 0.8, "jitter": 0.4, "error_rate": 0.1, "slow_zips": {"02116": 8.0, "02215": 8.0}},
+    },
+}
+
+# Relative weight of each endpoint in the request mix
+MIX = (("/aqi/boston", 4), ("/aqi/neighborhood/{name}", 4), ("/neighborhoods/with-aqi", 2))
+
+def configure_environment(stub_url: str):
+    """Point the app at the stub before it is imported"""
+    os.environ.update({
+        "AIRNOW_API_KEY": "benchmark",
+        "AIRNOW_BASE_URL": stub_url,
+        "AQI_SNAPSHOT_INTERVAL_SECONDS": "3600",  # One refresh at startup; scenarios control the rest
+        "AIRNOW_HOURLY_QUOTA": "1000000000",
+        "AIRNOW_QUOTA_BURST": "1000000",
+    })
+    os.environ.pop("AQI_CACHE_DB", None)
+
+def request_plan(count: int, names: List[str]) -> List[tuple]:
+    """Deterministic interleaving of (endpoint, path) following MIX"""
+    cycle = [endpoint for endpoint, weight in MIX for _ in range(weight)]
+    plan = []
+    for i in range(count):
+        endpoint = cycle[i % len(cycle)]
+        path = endpoint.format(name=names[i % len(names)]) if "{name}" in endpoint else endpoint
+        plan.append((endpoint, path))
+    return plan
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+async def reset(main):
+    main.airnow_service.cache.clear()
+    main.airnow_service.breaker.record_success()
+    main.snapshot_store.clear()
+
+async def run_scenario(main, client, stub: StubAirNow, name: str, settings: Dict[str, Any], scale: float, fixtures) -> Dict[str, Any]:
+    names = list(main.airnow_service.boston_zip_codes)
+    count = max(1, int(settings["requests"] * scale))
+    concurrency = settings["concurrency"]
+
+    stub.config = StubConfig(fixtures=fixtures, **settings["stub"])
+    await reset(main)
+    if settings["warm"]:
+        await client.get("/aqi/boston")
+        await client.get("/neighborhoods/with-aqi")
+    stub.reset_counters()
+
+    plan = request_plan(count, names)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(endpoint: str, path: str):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies[endpoint].append(time.perf_counter() - started)
+            statuses[str(response.status_code)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(endpoint, path) for endpoint, path in plan))
+    duration = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        "settings": settings,
+        "requests": count,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(count / duration, 1),
+        "latency_ms": summarize(everything),
+        "endpoints": {endpoint: summarize(values) for endpoint, values in latencies.items()},
+        "status": dict(statuses),
+        "upstream_calls": stub.total_calls,
+        "upstream_errors": stub.errors,
+    }
+
+async def run(scenarios: List[str], scale: float, fixtures) -> Dict[str, Any]:
+    import httpx
+
+    stub = StubAirNow()
+    server = StubServer(stub).start()
+    configure_environment(server.url)
+    import main
+    from responses import orjson
+
+    results = {}
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=60) as client:
+                for name in scenarios:
+                    results[name] = await run_scenario(main, client, stub, name, SCENARIOS[name], scale, fixtures)
+                    summary = results[name]
+                    print(
+                        f"{name:<14} {summary['throughput_rps']:>9.1f} req/s  "
+                        f"p50 {summary['latency_ms']['p50']:>8.2f}  p95 {summary['latency_ms']['p95']:>8.2f}  "
+                        f"p99 {summary['latency_ms']['p99']:>8.2f} ms  upstream {summary['upstream_calls']:>4}  "
+                        f"status {summary['status']}"
+                    )
+    finally:
+        server.stop()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "encoder": "orjson" if orjson else "json",
+        "scale": scale,
+        "fixtures": bool(fixtures),
+        "scenarios": results,
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCHMARKS_DIR).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(current: Dict[str, Any], previous_path: str):
+    """Print the p95/throughput change against an earlier results file"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nAgainst {previous_path} ({previous.get('git_commit') or 'unknown commit'}):")
+    for name, summary in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        p95, old_p95 = summary["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        rps, old_rps = summary["throughput_rps"], before["throughput_rps"]
+        print(f"{name:<14} p95 {old_p95:.2f} -> {p95:.2f} ms ({(p95 - old_p95) / old_p95:+.0%})  "
+              f"throughput {old_rps:.1f} -> {rps:.1f} req/s ({(rps - old_rps) / old_rps:+.0%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AQI API load benchmark against a local AirNow stand-in")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every scenario's request count")
+    parser.add_argument("--fixtures", help="Replay recorded AirNow responses instead of synthetic ones")
+    parser.add_argument("--output", help="Results path (default benchmarks/results/load-<utc time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = asyncio.run(run(selected, args.scale, load_fixtures(args.fixtures) if args.fixtures else None))
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+    if args.compare:
+        compare(results, args.compare)
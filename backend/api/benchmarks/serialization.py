@@ -0,0 +1,89 @@
+# backend/api/benchmarks/serialization.py
+"""
+Per-request serialization cost of the AQI responses
+
+Compares, for the single-neighborhood and city-wide payloads:
+  baseline  build dicts, jsonable_encoder + json.dumps (FastAPI's default path)
+  direct    build dicts, FastJSONResponse returned directly (dumps, no encoder)
+  snapshot  bytes built once per refresh, served with compressed_response
+
+Run from backend/api:  python benchmarks/serialization.py [iterations]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+
+from aqi_snapshot import BUILDERS, NEIGHBORHOODS_WITH_AQI, BOSTON, SnapshotBody, format_observation, snapshot_response
+from airnow_service import AirNowService
+from observations import Reading, ZipObservation
+from responses import FastJSONResponse, dumps, orjson
+
+def observations():
+    """One multi-pollutant observation per Boston neighborhood"""
+    data = {}
+    for i, name in enumerate(AirNowService().boston_zip_codes):
+        data[name] = ZipObservation(
+            "2024-01-01 ", 9, "EST", "Boston", "MA", 42.35, -71.05,
+            [Reading("O3", 30 + i, 1, "Good"), Reading("PM2.5", 40 + i, 1, "Good"), Reading("PM10", 12, 1, "Good")],
+        )
+    return data
+
+def request(accept_encoding: str = "gzip, br") -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+def baseline_render(payload) -> bytes:
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def measure(fn, iterations: int) -> float:
+    """Microseconds per call, best of three runs"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+def main(iterations: int = 2000):
+    aqi_data = observations()
+    one = aqi_data["Back Bay"]
+    req = request()
+
+    cases = {
+        "/aqi/neighborhood": {
+            "baseline": lambda: baseline_render({"neighborhood": "Back Bay", **format_observation(one)}),
+            "direct": lambda: FastJSONResponse({"neighborhood": "Back Bay", **format_observation(one)}).body,
+        },
+    }
+    for name, path in ((BOSTON, "/aqi/boston"), (NEIGHBORHOODS_WITH_AQI, "/neighborhoods/with-aqi")):
+        builder = BUILDERS[name]
+        payload = builder(aqi_data, "2024-01-01T09:00:00")
+        snapshot = SnapshotBody(dumps(payload))
+        cases[path] = {
+            "baseline": lambda builder=builder: baseline_render(builder(aqi_data, "2024-01-01T09:00:00")),
+            "direct": lambda builder=builder: FastJSONResponse(builder(aqi_data, "2024-01-01T09:00:00")).body,
+            "snapshot": lambda snapshot=snapshot: snapshot_response(req, snapshot),
+        }
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (stdlib)'}, {iterations} iterations")
+    print(f"{'endpoint':<26}{'path':<10}{'us/request':>12}{'speedup':>10}")
+    for path, variants in cases.items():
+        baseline = None
+        for variant, fn in variants.items():
+            cost = measure(fn, iterations)
+            baseline = baseline or cost
+            print(f"{path:<26}{variant:<10}{cost:>12.1f}{baseline / cost:>9.1f}x")
+
+    for name in (BOSTON, NEIGHBORHOODS_WITH_AQI):
+        snapshot = SnapshotBody(dumps(BUILDERS[name](aqi_data, "2024-01-01T09:00:00")))
+        sizes = ", ".join(f"{label} {len(body)}" for label, body in (("raw", snapshot.body), ("gzip", snapshot.gzip), ("br", snapshot.brotli)) if body)
+        print(f"{name} bytes: {sizes}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,105 @@
+# backend/api/benchmarks/startup.py
+"""
+Import and startup time of the API, checked against a budget
+
+Each run is a fresh interpreter, so module caches and imports are cold:
+  import    `import main` in an otherwise empty environment with .env loading
+            pointed at an empty file, so no AIRNOW_API_KEY or Firebase settings;
+            fails outright if any module still needs credentials or network at import
+  startup   lifespan entry until the app can answer requests
+  first     the first /health response after startup
+  warm      until the background warm-up (indexes, topology, surface) is done
+Upstream AirNow is the local stand-in from stub_airnow. Exits non-zero when
+the median import or startup time is over budget; tests/test_startup.py
+checks the same budgets.
+
+Run from backend/api:
+    python benchmarks/startup.py [--runs 5] [--import-budget 1.5] [--startup-budget 0.25]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+API_DIR = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from stub_airnow import StubAirNow, StubServer
+
+IMPORT_BUDGET = 1.5  # Seconds for `import main` (median)
+STARTUP_BUDGET = 0.25  # Seconds from lifespan start to ready (median)
+
+# Runs in the child interpreter; prints one JSON line of timings in seconds
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+assert not main.airnow_service.api_key, "AIRNOW_API_KEY reached the import"
+main.airnow_service.api_key = "benchmark"  # Only the stub is called
+import httpx
+
+async def run():
+    timings = {"import": imported - started}
+    entered = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        timings["startup"] = time.perf_counter() - entered
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://startup") as client:
+            await client.get("/health")
+        timings["first"] = time.perf_counter() - entered
+        if main.app.state.warmup is not None:
+            await main.app.state.warmup
+        timings["warm"] = time.perf_counter() - entered
+    print(json.dumps(timings))
+
+asyncio.run(run())
+"""
+
+def child_environment(stub_url: str) -> dict:
+    """Nothing inherited, and backend/api/.env replaced by an empty file"""
+    return {
+        "AIRNOW_BASE_URL": stub_url,
+        "AQI_SNAPSHOT_INTERVAL_SECONDS": "3600",
+        "DOTENV_PATH": os.devnull,
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+
+def measure(runs: int) -> dict:
+    stub = StubAirNow()
+    server = StubServer(stub).start()
+    samples = []
+    try:
+        env = child_environment(server.url)
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, "-c", CHILD], cwd=API_DIR, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                sys.exit(f"Startup run failed:\n{result.stderr}")
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    finally:
+        server.stop()
+    return {phase: statistics.median(sample[phase] for sample in samples) for phase in samples[0]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API import/startup time against a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="Seconds allowed for `import main` (median)")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET, help="Seconds allowed from lifespan start to ready (median)")
+    args = parser.parse_args()
+
+    medians = measure(args.runs)
+    budgets = {"import": args.import_budget, "startup": args.startup_budget}
+    over = []
+    for phase, seconds in medians.items():
+        budget = budgets.get(phase)
+        verdict = ""
+        if budget is not None:
+            verdict = f"  budget {budget:.2f}s  {'OK' if seconds <= budget else 'OVER'}"
+            if seconds > budget:
+                over.append(phase)
+        print(f"{phase:<8} {seconds:>7.3f}s{verdict}")
+    if over:
+        sys.exit(f"Over budget: {', '.join(over)}")
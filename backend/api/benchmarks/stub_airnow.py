@@ -0,0 +1,173 @@
+# backend/api/benchmarks/stub_airnow.py
+"""
+Local stand-in for the AirNow observation/zipCode/current API
+
+Serves deterministic synthetic observations (or replays recorded fixtures)
+with configurable latency, jitter, per-zip slowdowns and error rate, and
+counts every call so benchmarks can report upstream load. Point the
+backend at it with AIRNOW_BASE_URL=http://127.0.0.1:<port>/aq/observation/zipCode/current/
+
+    python benchmarks/stub_airnow.py serve --port 8900 [--latency 0.05] [--fixtures f.json]
+    python benchmarks/stub_airnow.py record fixtures.json   # needs AIRNOW_API_KEY
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+OBSERVATION_PATH = "/aq/observation/zipCode/current/"
+AIRNOW_URL = "https://www.airnowapi.org" + OBSERVATION_PATH
+PARAMETERS = (("O3", 30), ("PM2.5", 45), ("PM10", 15))
+CATEGORIES = ((50, 1, "Good"), (100, 2, "Moderate"), (150, 3, "Unhealthy for Sensitive Groups"), (200, 4, "Unhealthy"))
+
+def category(aqi: int) -> Dict[str, Any]:
+    for upper, number, name in CATEGORIES:
+        if aqi <= upper:
+            return {"Number": number, "Name": name}
+    return {"Number": 5, "Name": "Very Unhealthy"}
+
+def synthetic_rows(zip_code: str, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Observation rows for the current hour, stable per zip code and hour"""
+    local = (now or datetime.now(timezone.utc)) - timedelta(hours=5)
+    rng = random.Random(f"{zip_code}:{local:%Y%m%d%H}")
+    digest = int(hashlib.md5(zip_code.encode()).hexdigest(), 16)
+    rows = []
+    for parameter, base in PARAMETERS:
+        aqi = base + rng.randint(-10, 10)
+        rows.append({
+            "DateObserved": f"{local:%Y-%m-%d} ",
+            "HourObserved": local.hour,
+            "LocalTimeZone": "EST",
+            "ReportingArea": "Boston",
+            "StateCode": "MA",
+            "Latitude": 42.35 + (digest % 100) / 1000,
+            "Longitude": -71.05 - (digest // 100 % 100) / 1000,
+            "ParameterName": parameter,
+            "AQI": aqi,
+            "Category": category(aqi),
+        })
+    return rows
+
+class StubConfig:
+    def __init__(self, latency: float = 0.02, jitter: float = 0.01, error_rate: float = 0.0,
+                 slow_zips: Optional[Dict[str, float]] = None, fixtures: Optional[Dict[str, list]] = None, seed: int = 0):
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Uniform extra delay in [0, jitter)
+        self.error_rate = error_rate  # Fraction of calls answered with a 500
+        self.slow_zips = slow_zips or {}  # zip -> latency override
+        self.fixtures = fixtures  # zip -> recorded rows; synthetic rows when None
+        self.random = random.Random(seed)
+
+class StubAirNow:
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self.calls: Counter = Counter()
+        self.errors = 0
+        self.app = FastAPI()
+        self.app.get(OBSERVATION_PATH)(self.observation)
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.errors = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def observation(self, zipCode: str = Query(...), format: str = Query("application/json"),
+                          API_KEY: str = Query(""), distance: int = Query(25)):
+        config = self.config
+        self.calls[zipCode] += 1
+        delay = config.slow_zips.get(zipCode, config.latency) + config.random.uniform(0, config.jitter)
+        await asyncio.sleep(delay)
+        if config.random.random() < config.error_rate:
+            self.errors += 1
+            return JSONResponse({"error": "stub failure"}, status_code=500)
+        if config.fixtures is not None:
+            return config.fixtures.get(zipCode, [])
+        return synthetic_rows(zipCode)
+
+class StubServer:
+    """Runs a StubAirNow under uvicorn on a background thread"""
+
+    def __init__(self, stub: StubAirNow, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+        self.stub = stub
+        self.server = uvicorn.Server(uvicorn.Config(stub.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}{OBSERVATION_PATH}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+def load_fixtures(path: str) -> Dict[str, list]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def record(path: str, api_key: str, zip_codes: List[str]):
+    """Fetch live responses for every zip once and save them as replay fixtures"""
+    import httpx
+    fixtures = {}
+    with httpx.Client(timeout=15) as client:
+        for zip_code in zip_codes:
+            response = client.get(AIRNOW_URL, params={"format": "application/json", "zipCode": zip_code, "API_KEY": api_key, "distance": 25})
+            response.raise_for_status()
+            fixtures[zip_code] = response.json()
+            print(f"Recorded {zip_code}: {len(fixtures[zip_code])} rows")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, indent=2)
+
+def boston_zip_codes() -> List[str]:
+    from airnow_service import AirNowService
+    return sorted(set(AirNowService().boston_zip_codes.values()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8900)
+    serve.add_argument("--latency", type=float, default=0.02)
+    serve.add_argument("--jitter", type=float, default=0.01)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--fixtures")
+    rec = commands.add_parser("record")
+    rec.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        api_key = os.getenv("AIRNOW_API_KEY")
+        if not api_key:
+            sys.exit("AIRNOW_API_KEY is required to record fixtures")
+        record(args.path, api_key, boston_zip_codes())
+    else:
+        import uvicorn
+        config = StubConfig(args.latency, args.jitter, args.error_rate,
+                            fixtures=load_fixtures(args.fixtures) if args.fixtures else None)
+        print(f"Stub AirNow on http://{args.host}:{args.port}{OBSERVATION_PATH}")
+        uvicorn.run(StubAirNow(config).app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,172 @@
+# backend/api/firebase/geometry_codec.py
+"""
+Compact binary encoding for neighborhood geometry stored in Firestore
+
+Coordinates are quantized to a fixed number of decimal places, delta
+encoded point to point and packed as zigzag varints, so a ring of nearby
+points costs a couple of bytes per coordinate instead of ~20 characters of
+JSON. Layout:
+
+    byte 0      format version
+    byte 1      geometry type (1 = Polygon, 2 = MultiPolygon)
+    byte 2      decimal places kept
+    varints     polygon count, rings per polygon, points per ring,
+                then dx, dy for every point (deltas run across rings)
+
+The bounding box and centroid are stored as separate small fields by
+encode_document(), so most reads never need to decode the geometry at all.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+VERSION = 1
+ENCODING = "qdv1"  # Value of the geometry_encoding field
+POLYGON, MULTIPOLYGON = 1, 2
+TYPE_CODES = {"Polygon": POLYGON, "MultiPolygon": MULTIPOLYGON}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+DEFAULT_PRECISION = 6  # ~0.1 m at Boston's latitude
+
+def pack_varints(values: np.ndarray) -> bytes:
+    """Zigzag + LEB128 varint encoding of a signed integer array"""
+    values = np.asarray(values, dtype=np.int64)
+    zigzag = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    lengths = np.ones(len(zigzag), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += zigzag >= np.uint64(1 << shift)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max(initial=0))):
+        selected = lengths > k
+        group = (zigzag[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (lengths[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[selected] + k] = (group | more).astype(np.uint8)
+    return out.tobytes()
+
+def unpack_varints(data: bytes) -> np.ndarray:
+    """Inverse of pack_varints, decoding every value at once"""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(raw < 0x80)
+    if not len(ends) or ends[-1] != len(raw) - 1:
+        raise ValueError("Truncated varint stream")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    groups = (raw & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    zigzag = np.bitwise_or.reduceat(groups, starts)
+    return ((zigzag >> np.uint64(1)).astype(np.int64)) ^ -((zigzag & np.uint64(1)).astype(np.int64))
+
+def polygons_of(geometry_type: str, coordinates: List) -> List:
+    if geometry_type == "Polygon":
+        return [coordinates]
+    if geometry_type == "MultiPolygon":
+        return coordinates
+    raise ValueError(f"Unsupported geometry type: {geometry_type}")
+
+def encode(geometry_type: str, coordinates: List, precision: int = DEFAULT_PRECISION) -> bytes:
+    """Pack GeoJSON Polygon/MultiPolygon coordinates into bytes"""
+    polygons = polygons_of(geometry_type, coordinates)
+    counts = [len(polygons)]
+    counts += [len(polygon) for polygon in polygons]
+    rings = [ring for polygon in polygons for ring in polygon]
+    counts += [len(ring) for ring in rings]
+
+    points = np.array([point[:2] for ring in rings for point in ring], dtype=np.float64).reshape(-1, 2)
+    quantized = np.rint(points * 10 ** precision).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+    header = bytes((VERSION, TYPE_CODES[geometry_type], precision))
+    return header + pack_varints(np.concatenate((np.asarray(counts, dtype=np.int64), deltas.ravel())))
+
+def decode_points(data: bytes) -> Tuple[str, List[int], List[int], np.ndarray]:
+    """Type, rings per polygon, points per ring and an (n, 2) float array of all points"""
+    version, type_code, precision = data[0], data[1], data[2]
+    if version != VERSION:
+        raise ValueError(f"Unsupported geometry encoding version {version}")
+    values = unpack_varints(data[3:])
+    polygon_count = int(values[0])
+    ring_counts = values[1:1 + polygon_count].tolist()
+    ring_total = sum(ring_counts)
+    point_counts = values[1 + polygon_count:1 + polygon_count + ring_total].tolist()
+    deltas = values[1 + polygon_count + ring_total:].reshape(-1, 2)
+    points = np.cumsum(deltas, axis=0) / 10 ** precision
+    return TYPE_NAMES[type_code], ring_counts, point_counts, points
+
+def decode(data: bytes) -> Dict[str, Any]:
+    """GeoJSON geometry dict for encoded bytes"""
+    geometry_type, ring_counts, point_counts, points = decode_points(data)
+    coordinates = points.tolist()
+    polygons, start, ring_index = [], 0, 0
+    for ring_count in ring_counts:
+        polygon = []
+        for count in point_counts[ring_index:ring_index + ring_count]:
+            polygon.append(coordinates[start:start + count])
+            start += count
+        ring_index += ring_count
+        polygons.append(polygon)
+    return {"type": geometry_type, "coordinates": polygons[0] if geometry_type == "Polygon" else polygons}
+
+def bbox_and_centroid(points: np.ndarray, point_counts: List[int]) -> Tuple[List[float], List[float]]:
+    """[minx, miny, maxx, maxy] and the area-weighted [lon, lat] centroid"""
+    bbox = [*points.min(axis=0).tolist(), *points.max(axis=0).tolist()]
+    # Shoelace over every ring; holes wound the other way subtract naturally
+    ends = np.cumsum(point_counts)
+    nxt = np.arange(1, len(points) + 1)
+    nxt[ends - 1] = ends - np.asarray(point_counts)  # Close each ring back to its first point
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = x0[nxt], y0[nxt]
+    cross = x0 * y1 - x1 * y0
+    area = cross.sum() / 2
+    if area:
+        centroid = [float(((x0 + x1) * cross).sum() / (6 * area)), float(((y0 + y1) * cross).sum() / (6 * area))]
+    else:
+        centroid = points.mean(axis=0).tolist()
+    return bbox, centroid
+
+def encode_document(geometry: Dict[str, Any], precision: int = DEFAULT_PRECISION) -> Dict[str, Any]:
+    """Firestore fields for a GeoJSON geometry"""
+    encoded = encode(geometry["type"], geometry["coordinates"], precision)
+    _, _, point_counts, points = decode_points(encoded)
+    bbox, centroid = bbox_and_centroid(points, point_counts)
+    return {
+        "geometry_type": geometry["type"],
+        "geometry": encoded,
+        "geometry_encoding": ENCODING,
+        "bbox": bbox,
+        "centroid": {"longitude": centroid[0], "latitude": centroid[1]},
+    }
+
+class LazyGeometry:
+    """Geometry of a stored document, decoded only when coordinates are used"""
+
+    __slots__ = ("data", "_geometry")
+
+    def __init__(self, data: bytes = b"", geometry: Optional[Dict[str, Any]] = None):
+        self.data = data
+        self._geometry = geometry
+
+    @property
+    def geometry(self) -> Dict[str, Any]:
+        if self._geometry is None:
+            self._geometry = decode(self.data)
+        return self._geometry
+
+    @property
+    def type(self) -> str:
+        if self._geometry is not None:
+            return self._geometry["type"]
+        return TYPE_NAMES[self.data[1]]
+
+    @property
+    def coordinates(self) -> List:
+        return self.geometry["coordinates"]
+
+def document_geometry(data: Dict[str, Any]) -> Optional[LazyGeometry]:
+    """Geometry of a neighborhood document in either the encoded or the legacy JSON form"""
+    if data.get("geometry_encoding") == ENCODING:
+        return LazyGeometry(bytes(data["geometry"]))
+    if data.get("geometry_coordinates"):
+        return LazyGeometry(geometry={"type": data.get("geometry_type"), "coordinates": json.loads(data["geometry_coordinates"])})
+    return None
@@ -3,16 +3,121 @@
 Migration script to create neighborhoods collection in Firestore
 Combines geographic data with environmental quality information
 """
+import hashlib
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from dotenv import load_dotenv
-from firebase_config import db
+from geometry_codec import encode_document
 import random
 from datetime import datetime, timezone
 
-# Load environment variables
-load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
+GEOJSON_PATH = Path(__file__).parent.parent.parent.parent / "frontend" / "public" / "neighborhoods.json"
+BATCH_LIMIT = 500  # Firestore's maximum writes per batch
+
+def get_db():
+    """Default Firestore client, imported lazily so a stand-in can be passed instead"""
+    from firebase_config import get_db
+    return get_db()
+
+def iter_features(path, chunk_size=1 << 16):
+    """Yield the features of a GeoJSON FeatureCollection one at a time
+
+    The file is read in chunks and walked member by member at the top level
+    only, so a nested "features" key (in a foreign member or a property) is
+    never mistaken for the collection's array. Each feature is decoded as
+    soon as it is complete, so memory stays bounded by the largest single
+    feature or skipped member.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        eof = False
+
+        def fill():
+            # Grow reads geometrically so one large value is not re-parsed many times
+            nonlocal buffer, eof
+            chunk = f.read(max(chunk_size, len(buffer)))
+            eof = not chunk
+            buffer += chunk
+
+        def peek():
+            """First non-whitespace character, reading more as needed ("" at end of file)"""
+            nonlocal buffer
+            while True:
+                buffer = buffer.lstrip()
+                if buffer or eof:
+                    return buffer[:1]
+                fill()
+
+        def take(expected):
+            nonlocal buffer
+            if peek() != expected:
+                raise ValueError(f"{path}: expected {expected!r} in the top-level object")
+            buffer = buffer[1:]
+
+        def value():
+            nonlocal buffer
+            peek()
+            while True:
+                try:
+                    result, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                if end == len(buffer) and not eof:
+                    fill()  # A number could continue in the next chunk
+                    continue
+                buffer = buffer[end:]
+                return result
+
+        take('{')
+        while True:
+            if peek() in ('}', ''):
+                raise ValueError(f"{path} has no features array")
+            key = value()
+            take(':')
+            if key == "features":
+                take('[')
+                break
+            value()  # Some other top-level member (type, bbox, crs, ...)
+            if peek() == ',':
+                take(',')
+
+        while True:
+            char = peek()
+            if char == ']':
+                return
+            if char == ',':
+                take(',')
+                continue
+            if not char:
+                raise ValueError(f"{path} ends inside the features array")
+            yield value()
+
+def content_hash(feature):
+    """Hash of the source data a document is built from"""
+    source = json.dumps(
+        [feature['properties']['name'], feature['geometry']['type'], feature['geometry']['coordinates']],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+def document_id(name):
+    """Use neighborhood name as document ID (sanitized)"""
+    return name.lower().replace(" ", "_").replace("-", "_")
+
+def existing_hashes(neighborhoods_ref):
+    """Stored content hashes by document ID, reading only that one field"""
+    hashes = {}
+    for doc in neighborhoods_ref.select(["metadata.content_hash"]).stream():
+        metadata = (doc.to_dict() or {}).get("metadata") or {}
+        if metadata.get("content_hash"):
+            hashes[doc.id] = metadata["content_hash"]
+    return hashes
 
 def generate_environmental_data():
     """Generate realistic environmental quality data for neighborhoods"""
@@ -49,70 +154,92 @@ def generate_environmental_data():
         "last_updated": datetime.now(timezone.utc).isoformat()
     }
 
-def migrate_neighborhoods():
-    """Migrate neighborhoods from GeoJSON to Firestore"""
+def migrate_neighborhoods(db=None, geojson_path=GEOJSON_PATH, batch_size=None, workers=None, force=False):
+    """Migrate neighborhoods from GeoJSON to Firestore
+
+    Features are streamed from the file, documents whose source data is
+    unchanged since the last run are skipped, and the rest are written in
+    batches of at most 500 that are committed concurrently.
+    """
     print("Starting neighborhoods migration to Firebase...")
+    db = db or get_db()
+    batch_size = min(BATCH_LIMIT, batch_size or int(os.getenv("MIGRATION_BATCH_SIZE", str(BATCH_LIMIT))))
+    workers = workers or int(os.getenv("MIGRATION_WORKERS", "8"))
     
     try:
-        # Load the GeoJSON file
-        geojson_path = Path(__file__).parent.parent.parent / "frontend" / "public" / "neighborhoods.json"
-        
+        geojson_path = Path(geojson_path)
         if not geojson_path.exists():
             print(f"Error: {geojson_path} not found")
             return False
         
-        with open(geojson_path, 'r', encoding='utf-8') as f:
-            geojson_data = json.load(f)
-        
-        print(f"Found {len(geojson_data['features'])} neighborhoods to migrate")
-        
-        # Migrate to Firestore
-        batch = db.batch()
         neighborhoods_ref = db.collection('neighborhoods')
+        stored = {} if force else existing_hashes(neighborhoods_ref)
         
-        for i, feature in enumerate(geojson_data['features']):
-            neighborhood_name = feature['properties']['name']
+        written = skipped = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            batch, pending = db.batch(), 0
             
-            # Generate environmental data
-            env_data = generate_environmental_data()
+            def submit(batch):
+                # Bound the number of uncommitted batches held in memory
+                nonlocal in_flight
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(batch.commit))
             
-            # Create neighborhood document
-            neighborhood_data = {
-                "name": neighborhood_name,
-                "geometry_type": feature['geometry']['type'],
-                "geometry_coordinates": json.dumps(feature['geometry']['coordinates']),
-                "environmental_data": env_data,
-                "metadata": {
-                    "migrated_at": datetime.now(timezone.utc).isoformat(),
-                    "data_source": "geojson_migration",
-                    "neighborhood_id": f"neighborhood_{i+1:03d}"
+            for i, feature in enumerate(iter_features(geojson_path)):
+                neighborhood_name = feature['properties']['name']
+                doc_id = document_id(neighborhood_name)
+                digest = content_hash(feature)
+                if stored.get(doc_id) == digest:
+                    skipped += 1
+                    continue
+                
+                # Create neighborhood document
+                neighborhood_data = {
+                    "name": neighborhood_name,
+                    **encode_document(feature['geometry']),
+                    "environmental_data": generate_environmental_data(),
+                    "metadata": {
+                        "migrated_at": datetime.now(timezone.utc).isoformat(),
+                        "data_source": "geojson_migration",
+                        "neighborhood_id": f"neighborhood_{i+1:03d}",
+                        "content_hash": digest
+                    }
                 }
-            }
-            
-            # Use neighborhood name as document ID (sanitized)
-            doc_id = neighborhood_name.lower().replace(" ", "_").replace("-", "_")
-            doc_ref = neighborhoods_ref.document(doc_id)
-            batch.set(doc_ref, neighborhood_data)
+                batch.set(neighborhoods_ref.document(doc_id), neighborhood_data)
+                pending += 1
+                written += 1
+                
+                if pending == batch_size:
+                    submit(batch)
+                    batch, pending = db.batch(), 0
             
-            print(f"Prepared {neighborhood_name} for migration...")
+            if pending:
+                submit(batch)
+            for future in in_flight:
+                future.result()
         
-        # Commit the batch
-        batch.commit()
-        print(f"Successfully migrated {len(geojson_data['features'])} neighborhoods to Firebase!")
+        print(f"Successfully migrated {written} neighborhoods to Firebase ({skipped} unchanged, skipped)!")
         return True
         
     except Exception as e:
         print(f"Migration failed: {e}")
         return False
 
-def create_neighborhoods_collection_structure():
+def create_neighborhoods_collection_structure(db=None):
     """Create a sample neighborhood to show the data structure"""
     print("Creating sample neighborhood structure...")
+    db = db or get_db()
     
     sample_data = {
         "name": "Sample Neighborhood",
-        "geometry_type": "Polygon",
-        "geometry_coordinates": json.dumps([[[-71.0, 42.0], [-71.1, 42.0], [-71.1, 42.1], [-71.0, 42.1], [-71.0, 42.0]]]),
+        **encode_document({
+            "type": "Polygon",
+            "coordinates": [[[-71.0, 42.0], [-71.1, 42.0], [-71.1, 42.1], [-71.0, 42.1], [-71.0, 42.0]]]
+        }),
         "environmental_data": generate_environmental_data(),
         "metadata": {
             "migrated_at": datetime.now(timezone.utc).isoformat(),
@@ -131,6 +258,7 @@ def create_neighborhoods_collection_structure():
         return False
 
 if __name__ == "__main__":
+    load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
     print("EnvTrack Neighborhoods Migration Tool")
     print("====================================")
     
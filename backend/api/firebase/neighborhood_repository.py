@@ -0,0 +1,129 @@
+# backend/api/firebase/neighborhood_repository.py
+"""
+Read access to the neighborhoods collection
+
+Queries push ordering and limits down to Firestore (overall_score has an
+automatic single-field index, so top-N costs N document reads) and project
+away the large geometry_coordinates string. watch() keeps an in-process copy
+of the collection fresh with an on_snapshot listener; once it has synced,
+reads are served locally and cost no document reads at all. After the first
+sync only the changed documents are re-ranked.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from scoring import Ranking
+
+COLLECTION = "neighborhoods"
+SCORE_FIELD = "environmental_data.overall_score"
+# Everything except the geometry itself; bbox and centroid are small precomputed fields
+SUMMARY_FIELDS = ["name", "environmental_data", "metadata", "bbox", "centroid"]
+GEOMETRY_FIELDS = ("geometry_type", "geometry_coordinates", "geometry", "geometry_encoding")
+
+def summarize(doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {key: value for key, value in data.items() if key not in GEOMETRY_FIELDS}
+    summary["doc_id"] = doc_id
+    return summary
+
+def score_of(neighborhood: Dict[str, Any]) -> float:
+    return (neighborhood.get("environmental_data") or {}).get("overall_score") or 0
+
+def document_ids(name: str) -> List[str]:
+    """Document IDs a neighborhood may have been stored under"""
+    ids = [
+        name.lower().replace(" ", "_").replace("-", "_"),
+        name.lower().replace(" ", "-"),
+        name.lower()
+    ]
+    return list(dict.fromkeys(ids))
+
+class NeighborhoodRepository:
+    def __init__(self, db=None, collection: str = COLLECTION):
+        self._db = db
+        self.collection = collection
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._ranking = Ranking()  # doc_id by overall_score
+        self._synced = threading.Event()
+        self._watch = None
+
+    @property
+    def db(self):
+        """The Firestore client; the default one is created on first query"""
+        if self._db is None:
+            from firebase_config import get_db
+            self._db = get_db()
+        return self._db
+
+    @property
+    def _ref(self):
+        return self.db.collection(self.collection)
+
+    @property
+    def cached(self) -> bool:
+        """Whether reads are currently served from the listener-backed cache"""
+        return self._synced.is_set()
+
+    def watch(self, timeout: Optional[float] = 10.0) -> bool:
+        """Start the on_snapshot listener and wait (up to timeout) for the first sync"""
+        if self._watch is None:
+            # Listen on the full documents: the initial sync reads each once, after that only changes are sent
+            self._watch = self._ref.on_snapshot(self._on_snapshot)
+        return self._synced.wait(timeout)
+
+    def unwatch(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._synced.clear()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            if not self._synced.is_set():
+                self._cache = {doc.id: summarize(doc.id, doc.to_dict() or {}) for doc in docs}
+                self._ranking.rebuild({doc_id: score_of(data) for doc_id, data in self._cache.items()})
+            else:
+                for change in changes:
+                    doc = change.document
+                    if change.type.name == "REMOVED":
+                        self._cache.pop(doc.id, None)
+                        self._ranking.remove(doc.id)
+                    else:
+                        self._cache[doc.id] = summarize(doc.id, doc.to_dict() or {})
+                        self._ranking.set(doc.id, score_of(self._cache[doc.id]))
+        self._synced.set()
+
+    def top_by_score(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """Highest overall_score first"""
+        if self.cached:
+            with self._lock:
+                return [self._cache[doc_id] for doc_id, _ in self._ranking.top(limit)]
+        query = (
+            self._ref.select(SUMMARY_FIELDS)
+            .order_by(SCORE_FIELD, direction="DESCENDING")
+            .limit(limit)
+        )
+        return [summarize(doc.id, doc.to_dict() or {}) for doc in query.stream()]
+
+    def list_summaries(self) -> List[Dict[str, Any]]:
+        """Every neighborhood without its geometry"""
+        if self.cached:
+            with self._lock:
+                return list(self._cache.values())
+        return [summarize(doc.id, doc.to_dict() or {}) for doc in self._ref.select(SUMMARY_FIELDS).stream()]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """One neighborhood without its geometry, or None"""
+        if self.cached:
+            with self._lock:
+                return self._cache.get(doc_id)
+        doc = self._ref.document(doc_id).get(field_paths=SUMMARY_FIELDS)
+        return summarize(doc.id, doc.to_dict() or {}) if doc.exists else None
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """Look a neighborhood up by display name, trying the document ID spellings in use"""
+        for doc_id in document_ids(name):
+            neighborhood = self.get(doc_id)
+            if neighborhood is not None:
+                return neighborhood
+        return None
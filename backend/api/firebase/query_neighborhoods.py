@@ -2,24 +2,23 @@
 """
 Script to query and display neighborhoods data from Firestore
 """
-from firebase_config import db
-from datetime import datetime
+from neighborhood_repository import NeighborhoodRepository
+
+repository = NeighborhoodRepository()
 
 def list_all_neighborhoods():
     """List all neighborhoods in the collection"""
     try:
-        neighborhoods_ref = db.collection('neighborhoods')
-        docs = neighborhoods_ref.get()
+        neighborhoods = repository.list_summaries()
         
-        print(f"Found {len(docs)} neighborhoods:")
+        print(f"Found {len(neighborhoods)} neighborhoods:")
         print("=" * 50)
         
-        for doc in docs:
-            data = doc.to_dict()
+        for data in neighborhoods:
             env_data = data.get('environmental_data', {})
             
             print(f"Name: {data.get('name', 'Unknown')}")
-            print(f"Document ID: {doc.id}")
+            print(f"Document ID: {data['doc_id']}")
             print(f"Overall Score: {env_data.get('overall_score', 'N/A')}")
             
             air_quality = env_data.get('air_quality', {})
@@ -39,45 +38,34 @@ def list_all_neighborhoods():
 def get_neighborhood_by_name(name):
     """Get a specific neighborhood by name"""
     try:
-        # Try different possible document IDs
-        possible_ids = [
-            name.lower().replace(" ", "_").replace("-", "_"),
-            name.lower().replace(" ", "-"),
-            name.lower()
-        ]
-        
-        neighborhoods_ref = db.collection('neighborhoods')
-        
-        for doc_id in possible_ids:
-            doc = neighborhoods_ref.document(doc_id).get()
-            if doc.exists:
-                data = doc.to_dict()
-                print(f"Found neighborhood: {data.get('name')}")
-                print(f"Document ID: {doc.id}")
-                
-                env_data = data.get('environmental_data', {})
-                print(f"Overall Score: {env_data.get('overall_score')}")
-                
-                air_quality = env_data.get('air_quality', {})
-                water_quality = env_data.get('water_quality', {})
-                hazards = env_data.get('environmental_hazards', {})
-                
-                print("\nAir Quality:")
-                for key, value in air_quality.items():
-                    if key != 'last_updated':
-                        print(f"  {key}: {value}")
-                
-                print("\nWater Quality:")
-                for key, value in water_quality.items():
-                    if key != 'last_updated':
-                        print(f"  {key}: {value}")
-                
-                print("\nEnvironmental Hazards:")
-                for key, value in hazards.items():
-                    if key != 'last_updated':
-                        print(f"  {key}: {value}")
-                
-                return True
+        data = repository.find(name)
+        if data is not None:
+            print(f"Found neighborhood: {data.get('name')}")
+            print(f"Document ID: {data['doc_id']}")
+            
+            env_data = data.get('environmental_data', {})
+            print(f"Overall Score: {env_data.get('overall_score')}")
+            
+            air_quality = env_data.get('air_quality', {})
+            water_quality = env_data.get('water_quality', {})
+            hazards = env_data.get('environmental_hazards', {})
+            
+            print("\nAir Quality:")
+            for key, value in air_quality.items():
+                if key != 'last_updated':
+                    print(f"  {key}: {value}")
+            
+            print("\nWater Quality:")
+            for key, value in water_quality.items():
+                if key != 'last_updated':
+                    print(f"  {key}: {value}")
+            
+            print("\nEnvironmental Hazards:")
+            for key, value in hazards.items():
+                if key != 'last_updated':
+                    print(f"  {key}: {value}")
+            
+            return True
         
         print(f"Neighborhood '{name}' not found")
         return False
@@ -89,28 +77,20 @@ def get_neighborhood_by_name(name):
 def get_top_neighborhoods(limit=5):
     """Get top neighborhoods by overall score"""
     try:
-        neighborhoods_ref = db.collection('neighborhoods')
-        docs = neighborhoods_ref.get()
-        
-        # Sort by overall score
-        neighborhoods = []
-        for doc in docs:
-            data = doc.to_dict()
-            env_data = data.get('environmental_data', {})
-            score = env_data.get('overall_score', 0)
-            neighborhoods.append({
+        # Sorted and limited by Firestore: only `limit` documents are read
+        neighborhoods = [
+            {
                 'name': data.get('name'),
-                'score': score,
-                'doc_id': doc.id
-            })
-        
-        # Sort by score (descending)
-        neighborhoods.sort(key=lambda x: x['score'], reverse=True)
+                'score': data.get('environmental_data', {}).get('overall_score', 0),
+                'doc_id': data['doc_id']
+            }
+            for data in repository.top_by_score(limit)
+        ]
         
         print(f"Top {min(limit, len(neighborhoods))} neighborhoods by environmental score:")
         print("=" * 60)
         
-        for i, neighborhood in enumerate(neighborhoods[:limit]):
+        for i, neighborhood in enumerate(neighborhoods):
             print(f"{i+1}. {neighborhood['name']} - Score: {neighborhood['score']}")
         
         return True
@@ -123,6 +103,10 @@ if __name__ == "__main__":
     print("EnvTrack Neighborhoods Query Tool")
     print("================================")
     
+    # Keep a local copy in sync so repeated queries below cost no document reads
+    if not repository.watch():
+        print("Live cache not ready yet; querying Firestore directly")
+    
     while True:
         print("\nOptions:")
         print("1. List all neighborhoods")
@@ -142,6 +126,7 @@ if __name__ == "__main__":
             limit = int(limit) if limit.isdigit() else 5
             get_top_neighborhoods(limit)
         elif choice == "4":
+            repository.unwatch()
             print("Goodbye!")
             break
         else:
@@ -0,0 +1,69 @@
+# backend/api/firebase/reencode_geometry.py
+"""
+Re-encode stored neighborhood geometry from JSON strings to the binary codec
+
+Documents still carrying geometry_coordinates get the compact geometry
+bytes plus bbox/centroid fields, and the JSON string is deleted. Only the
+geometry fields are read and only those fields are updated, so the rest of
+each document is left untouched. Safe to rerun: the query only matches
+documents that still have geometry_coordinates, so converted ones are
+neither read nor billed again.
+"""
+import json
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from geometry_codec import DEFAULT_PRECISION, encode_document
+
+BATCH_LIMIT = 500  # Firestore's maximum writes per batch
+
+def reencode_geometry(db=None, precision=DEFAULT_PRECISION, batch_size=BATCH_LIMIT, dry_run=False):
+    """Convert every legacy geometry_coordinates document; returns (converted, bytes before, bytes after)"""
+    if not dry_run:
+        from firebase_admin import firestore
+    if db is None:
+        from firebase_config import get_db
+        db = get_db()
+
+    neighborhoods_ref = db.collection('neighborhoods')
+    # An inequality filter skips documents without the field, i.e. already converted ones
+    query = neighborhoods_ref.where("geometry_coordinates", ">", "").select(["geometry_type", "geometry_coordinates"])
+
+    converted = before = after = 0
+    batch, pending = db.batch(), 0
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        if not data.get("geometry_coordinates"):
+            continue
+        geometry = {"type": data["geometry_type"], "coordinates": json.loads(data["geometry_coordinates"])}
+        fields = encode_document(geometry, precision)
+        before += len(data["geometry_coordinates"])
+        after += len(fields["geometry"])
+        converted += 1
+        if dry_run:
+            continue
+
+        fields["geometry_coordinates"] = firestore.DELETE_FIELD
+        batch.update(neighborhoods_ref.document(doc.id), fields)
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            batch, pending = db.batch(), 0
+
+    if pending:
+        batch.commit()
+    return converted, before, after
+
+if __name__ == "__main__":
+    load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
+    print("EnvTrack Geometry Re-encoding Tool")
+    print("==================================")
+
+    dry_run = os.getenv("DRY_RUN", "").lower() in ("1", "true", "yes")
+    try:
+        converted, before, after = reencode_geometry(dry_run=dry_run)
+        ratio = f" ({before / after:.1f}x smaller)" if after else ""
+        action = "Would re-encode" if dry_run else "Re-encoded"
+        print(f"{action} {converted} neighborhoods: {before:,} -> {after:,} bytes of geometry{ratio}")
+    except Exception as e:
+        print(f"Re-encoding failed: {e}")
@@ -1,16 +1,18 @@
 # backend/api/firebase_config.py
-import firebase_admin
-from firebase_admin import credentials, firestore
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
-# Load .env from same folder as this file
-load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
+_db = None
 
 # Initialize Firebase Admin SDK
 def initialize_firebase():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     if not firebase_admin._apps:
+        # Load .env from same folder as this file or DOTENV_PATH (no-op for variables already set)
+        load_dotenv(dotenv_path=os.getenv("DOTENV_PATH") or Path(__file__).with_name(".env"))
         # Option 1: Use service account key file
         service_account_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH")
         if service_account_path and os.path.exists(service_account_path):
@@ -29,10 +31,20 @@ def initialize_firebase():
                 "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
                 "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{os.getenv('FIREBASE_CLIENT_EMAIL')}"
             })
-        
+
         firebase_admin.initialize_app(cred)
-    
+
     return firestore.client()
 
-# Get Firestore client
-db = initialize_firebase()
+# Get Firestore client, created on first use rather than at import
+def get_db():
+    global _db
+    if _db is None:
+        _db = initialize_firebase()
+    return _db
+
+def __getattr__(name):
+    # Keeps `from firebase_config import db` working, still lazily
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
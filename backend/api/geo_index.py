@@ -0,0 +1,157 @@
+# geo_index.py
+"""
+Spatial index over the Boston neighborhood polygons.
+
+Every ring edge of a neighborhood is packed into flat NumPy arrays, and a
+uniform grid over the city maps each cell to the neighborhoods whose
+bounding box overlaps it. A lookup only runs the even-odd crossing test
+against the few candidates in its cell, and batches are tested per
+neighborhood with array math rather than per point.
+"""
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_GEOJSON_PATH = Path(__file__).parent.parent.parent / "frontend" / "public" / "neighborhoods.json"
+
+def polygon_rings(geometry: Dict) -> List[List[List[float]]]:
+    """All rings (outer and holes) of a Polygon or MultiPolygon"""
+    if geometry["type"] == "Polygon":
+        return list(geometry["coordinates"])
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    return []
+
+class Shape:
+    __slots__ = ("name", "bbox", "x0", "y0", "x1", "y1", "slope", "edge_lo", "edge_hi", "centroid")
+
+    def __init__(self, name: str, rings: List[List[List[float]]]):
+        self.name = name
+        starts, ends = [], []
+        for ring in rings:
+            points = np.asarray(ring, dtype=np.float64)
+            starts.append(points[:-1])
+            ends.append(points[1:])
+        start = np.concatenate(starts)
+        end = np.concatenate(ends)
+        self.x0, self.y0 = start[:, 0].copy(), start[:, 1].copy()
+        self.x1, self.y1 = end[:, 0].copy(), end[:, 1].copy()
+        self.bbox = (start[:, 0].min(), start[:, 1].min(), start[:, 0].max(), start[:, 1].max())
+        dy = self.y1 - self.y0
+        dy[dy == 0] = np.inf  # Horizontal edges never straddle a scanline
+        self.slope = (self.x1 - self.x0) / dy
+        self.edge_lo = np.minimum(self.y0, self.y1)
+        self.edge_hi = np.maximum(self.y0, self.y1)
+        # Area-weighted centroid via the shoelace formula (holes subtract naturally)
+        cross = self.x0 * self.y1 - self.x1 * self.y0
+        area = cross.sum() / 2
+        if area:
+            self.centroid = (
+                float(((self.x0 + self.x1) * cross).sum() / (6 * area)),
+                float(((self.y0 + self.y1) * cross).sum() / (6 * area)),
+            )
+        else:
+            self.centroid = (float(start[:, 0].mean()), float(start[:, 1].mean()))
+
+    def contains(self, lons: np.ndarray, lats: np.ndarray, chunk: int = 256) -> np.ndarray:
+        """Even-odd point-in-polygon test for many points at once"""
+        inside = np.zeros(len(lons), dtype=bool)
+        # Walk the points in latitude order so each chunk only meets edges in its band
+        order = np.argsort(lats, kind="stable")
+        for lo in range(0, len(order), chunk):
+            ids = order[lo:lo + chunk]
+            y = lats[ids]
+            band = np.flatnonzero((self.edge_hi >= y[0]) & (self.edge_lo <= y[-1]))
+            y0, y1 = self.y0[band], self.y1[band]
+            x = lons[ids, None]
+            y = y[:, None]
+            crosses = ((y0 > y) != (y1 > y)) & (x < self.x0[band] + (y - y0) * self.slope[band])
+            inside[ids] = (np.count_nonzero(crosses, axis=1) & 1).astype(bool)
+        return inside
+
+class NeighborhoodIndex:
+    def __init__(self, path: Path = DEFAULT_GEOJSON_PATH, grid_size: int = 32):
+        self.path = Path(path)
+        self.grid_size = grid_size
+        self.shapes: List[Shape] = []
+        self._cells: List[List[int]] = []
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self):
+        """Read the GeoJSON and build the grid (safe to call more than once)"""
+        with self._lock:
+            if self.loaded:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                features = json.load(f)["features"]
+            self.shapes = [
+                Shape(feature["properties"]["name"], polygon_rings(feature["geometry"]))
+                for feature in features
+                if polygon_rings(feature["geometry"])
+            ]
+            self._build_grid()
+            self.loaded = True
+            logging.info(f"Indexed {len(self.shapes)} neighborhood polygons from {self.path}")
+
+    def _build_grid(self):
+        boxes = np.array([shape.bbox for shape in self.shapes])
+        self.extent = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+        n = self.grid_size
+        self._cell_w = (self.extent[2] - self.extent[0]) / n
+        self._cell_h = (self.extent[3] - self.extent[1]) / n
+        self._cells = [[] for _ in range(n * n)]
+        for i, (minx, miny, maxx, maxy) in enumerate(boxes):
+            c0, r0 = self._cell(minx, miny)
+            c1, r1 = self._cell(maxx, maxy)
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    self._cells[row * n + col].append(i)
+
+    def _cell(self, lon: float, lat: float):
+        n = self.grid_size
+        col = min(max(int((lon - self.extent[0]) / self._cell_w), 0), n - 1)
+        row = min(max(int((lat - self.extent[1]) / self._cell_h), 0), n - 1)
+        return col, row
+
+    def _in_extent(self, lon: float, lat: float) -> bool:
+        minx, miny, maxx, maxy = self.extent
+        return minx <= lon <= maxx and miny <= lat <= maxy
+
+    def locate(self, lon: float, lat: float) -> Optional[str]:
+        """Name of the neighborhood containing the point, or None"""
+        self.load()
+        if not self._in_extent(lon, lat):
+            return None
+        col, row = self._cell(lon, lat)
+        point_x, point_y = np.array([lon]), np.array([lat])
+        for i in self._cells[row * self.grid_size + col]:
+            shape = self.shapes[i]
+            minx, miny, maxx, maxy = shape.bbox
+            if minx <= lon <= maxx and miny <= lat <= maxy and shape.contains(point_x, point_y)[0]:
+                return shape.name
+        return None
+
+    def locate_many(self, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+        """Index into self.shapes for every point (-1 where no neighborhood matches)"""
+        self.load()
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(lons), -1, dtype=np.int64)
+        for i, shape in enumerate(self.shapes):
+            minx, miny, maxx, maxy = shape.bbox
+            candidates = np.flatnonzero(
+                (result < 0) & (lons >= minx) & (lons <= maxx) & (lats >= miny) & (lats <= maxy)
+            )
+            if len(candidates):
+                hits = shape.contains(lons[candidates], lats[candidates])
+                result[candidates[hits]] = i
+        return result
+
+    def names(self) -> List[str]:
+        self.load()
+        return [shape.name for shape in self.shapes]
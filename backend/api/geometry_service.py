@@ -0,0 +1,226 @@
+# geometry_service.py
+"""
+Compact, zoom-aware neighborhood geometry served as TopoJSON.
+
+The GeoJSON polygons are quantized onto an integer grid and split into
+arcs at the points where neighboring rings meet, so each shared border is
+stored once. Every arc point gets a Douglas-Peucker weight up front;
+simplifying for a zoom level is then just a threshold on those weights,
+and because neighbors reference the same arc their borders stay identical.
+Encoded, delta-packed and gzip/brotli-compressed bodies are cached per
+zoom (and per set of AQI values when merged into the properties).
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo_index import DEFAULT_GEOJSON_PATH
+from responses import CompressedBody, dumps
+
+MIN_ZOOM = 8
+MAX_ZOOM = 18
+QUANTIZATION = 1 << 20  # Grid steps across the extent (~0.03 m per step for Boston)
+
+def douglas_peucker_weights(points: np.ndarray) -> np.ndarray:
+    """Per-point tolerance at which Douglas-Peucker would still keep the point
+
+    Endpoints get +inf. A child's weight is capped by its parent's, so the
+    points kept at any tolerance are exactly those with weight >= tolerance.
+    """
+    n = len(points)
+    weights = np.zeros(n)
+    weights[0] = weights[-1] = np.inf
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        start = points[first].astype(np.float64)
+        end = points[last].astype(np.float64)
+        inner = points[first + 1:last].astype(np.float64)
+        seg = end - start
+        length = np.hypot(seg[0], seg[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            distances = np.abs(seg[0] * (inner[:, 1] - start[1]) - seg[1] * (inner[:, 0] - start[0])) / length
+        split = int(np.argmax(distances))
+        weight = min(float(distances[split]), cap)
+        index = first + 1 + split
+        weights[index] = weight
+        stack.append((first, index, weight))
+        stack.append((index, last, weight))
+    return weights
+
+class Topology:
+    """Quantized arcs plus per-feature ring references, built once from GeoJSON"""
+
+    def __init__(self, features: List[Dict[str, Any]]):
+        coords = [
+            np.asarray(ring, dtype=np.float64)
+            for feature in features
+            for ring in self._rings(feature["geometry"])
+        ]
+        stacked = np.concatenate(coords)
+        minx, miny = stacked.min(axis=0)
+        maxx, maxy = stacked.max(axis=0)
+        self.bbox = [float(minx), float(miny), float(maxx), float(maxy)]
+        self.scale = ((maxx - minx) / (QUANTIZATION - 1), (maxy - miny) / (QUANTIZATION - 1))
+        self.translate = (float(minx), float(miny))
+
+        self.names: List[str] = []
+        self.geometry_types: List[str] = []
+        # feature -> polygons -> rings -> list of arc references (~i for reversed)
+        self.features: List[List[List[List[int]]]] = []
+        self.arcs: List[np.ndarray] = []
+        self.weights: List[np.ndarray] = []
+        self._arc_ids: Dict[bytes, int] = {}
+
+        quantized = [[self._quantize_polygon(polygon) for polygon in self._polygons(f["geometry"])] for f in features]
+        junctions = self._junctions([ring for polygons in quantized for polygon in polygons for ring in polygon])
+
+        for feature, polygons in zip(features, quantized):
+            self.names.append(feature["properties"].get("name", ""))
+            self.geometry_types.append(feature["geometry"]["type"])
+            self.features.append([[self._ring_arcs(ring, junctions) for ring in polygon] for polygon in polygons])
+        self.weights = [douglas_peucker_weights(arc) for arc in self.arcs]
+
+    @staticmethod
+    def _polygons(geometry: Dict[str, Any]) -> List:
+        if geometry["type"] == "Polygon":
+            return [geometry["coordinates"]]
+        if geometry["type"] == "MultiPolygon":
+            return geometry["coordinates"]
+        return []
+
+    @classmethod
+    def _rings(cls, geometry: Dict[str, Any]) -> List:
+        return [ring for polygon in cls._polygons(geometry) for ring in polygon]
+
+    def _quantize_polygon(self, polygon: List) -> List[np.ndarray]:
+        rings = []
+        for ring in polygon:
+            points = np.asarray(ring, dtype=np.float64)
+            q = np.round((points - self.translate) / self.scale).astype(np.int64)
+            # Drop consecutive duplicates created by quantization
+            keep = np.ones(len(q), dtype=bool)
+            keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+            q = q[keep]
+            if len(q) >= 4:
+                rings.append(q)
+        return rings
+
+    @staticmethod
+    def _junctions(rings: List[np.ndarray]) -> set:
+        """Points where the set of neighbors differs between rings that share them"""
+        neighbors: Dict[Tuple[int, int], set] = {}
+        for ring in rings:
+            open_ring = ring[:-1]
+            prev = np.roll(open_ring, 1, axis=0)
+            nxt = np.roll(open_ring, -1, axis=0)
+            for point, a, b in zip(map(tuple, open_ring.tolist()), map(tuple, prev.tolist()), map(tuple, nxt.tolist())):
+                pair = frozenset((a, b))
+                seen = neighbors.get(point)
+                if seen is None:
+                    neighbors[point] = {pair}
+                else:
+                    seen.add(pair)
+        # A point seen with more than one distinct neighbor pair starts or ends a shared run
+        return {point for point, pairs in neighbors.items() if len(pairs) > 1}
+
+    def _ring_arcs(self, ring: np.ndarray, junctions: set) -> List[int]:
+        open_ring = ring[:-1]
+        points = list(map(tuple, open_ring.tolist()))
+        cuts = [i for i, point in enumerate(points) if point in junctions]
+        if not cuts:
+            return [self._arc_ref(np.vstack([open_ring, open_ring[:1]]))]
+        # Rotate so the ring starts on a junction, then cut at every junction
+        start = cuts[0]
+        rotated = np.vstack([open_ring[start:], open_ring[:start], open_ring[start:start + 1]])
+        cuts = [i - start for i in cuts] + [len(open_ring)]
+        return [self._arc_ref(rotated[a:b + 1]) for a, b in zip(cuts[:-1], cuts[1:])]
+
+    def _arc_ref(self, arc: np.ndarray) -> int:
+        key = arc.tobytes()
+        if key in self._arc_ids:
+            return self._arc_ids[key]
+        reverse_key = arc[::-1].tobytes()
+        if reverse_key in self._arc_ids:
+            return ~self._arc_ids[reverse_key]
+        self._arc_ids[key] = len(self.arcs)
+        self.arcs.append(np.ascontiguousarray(arc))
+        return len(self.arcs) - 1
+
+    def encode(self, zoom: int, properties: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """TopoJSON for a zoom level, with delta-encoded arcs"""
+        # Half a screen pixel at this zoom, in grid units
+        degrees_per_pixel = 360.0 / (256 * 2 ** zoom)
+        tolerance = 0.5 * degrees_per_pixel / max(self.scale)
+        arcs = []
+        for arc, weights in zip(self.arcs, self.weights):
+            kept = arc[weights >= tolerance]
+            if len(kept) < 4 and np.array_equal(arc[0], arc[-1]):
+                # Keep closed single-arc rings (islands) from collapsing
+                kept = arc[np.sort(np.argsort(-weights, kind="stable")[:4])]
+            deltas = np.diff(kept, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+            arcs.append(deltas.tolist())
+
+        geometries = []
+        for name, geometry_type, polygons in zip(self.names, self.geometry_types, self.features):
+            props = {"name": name}
+            if properties and name in properties:
+                props.update(properties[name])
+            geometries.append({
+                "type": geometry_type,
+                "arcs": polygons[0] if geometry_type == "Polygon" else polygons,
+                "properties": props,
+            })
+        return {
+            "type": "Topology",
+            "bbox": self.bbox,
+            "transform": {"scale": list(self.scale), "translate": list(self.translate)},
+            "objects": {"neighborhoods": {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": arcs,
+        }
+
+class GeometryVariant(CompressedBody):
+    __slots__ = ()
+
+class GeometryService:
+    def __init__(self, path: Path = DEFAULT_GEOJSON_PATH, max_variants: int = 32):
+        self.path = Path(path)
+        self.max_variants = max_variants
+        self._topology: Optional[Topology] = None
+        self._variants: "OrderedDict[Tuple, GeometryVariant]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self) -> Topology:
+        with self._lock:
+            if self._topology is None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    features = json.load(f)["features"]
+                self._topology = Topology(features)
+                logging.info(f"Built topology with {len(self._topology.arcs)} arcs from {self.path}")
+            return self._topology
+
+    def variant(self, zoom: int, properties: Optional[Dict[str, Dict[str, Any]]] = None) -> GeometryVariant:
+        """Encoded and precompressed TopoJSON, cached per zoom and property values"""
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        key = (zoom, json.dumps(properties, sort_keys=True) if properties else None)
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                return variant
+        topology = self.load()
+        variant = GeometryVariant(dumps(topology.encode(zoom, properties)))
+        with self._lock:
+            self._variants[key] = variant
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+        return variant
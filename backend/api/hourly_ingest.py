@@ -0,0 +1,335 @@
+# hourly_ingest.py
+"""
+Bulk ingestion from AirNow's hourly observation files.
+
+Instead of one observation/zipCode/current call per zip, AirNow publishes
+HourlyAQObs_YYYYMMDDHH.dat every hour: one CSV row per monitoring site with
+its location and the AQI of each pollutant it measures. HourlyIngestor
+fetches the newest file from a pluggable source (the AirNow file host or a
+local directory of fixtures), parses it in one streaming pass into NumPy
+arrays, and fills every zip at once from a precomputed nearest-site index.
+Each pollutant comes from the closest site that reported it within range.
+"""
+import asyncio
+import csv
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from metrics import airnow_hourly_files
+from observations import Reading, ZipObservation
+
+FILE_HOST = "https://files.airnowtech.org/airnow"
+FILE_PATTERN = "HourlyAQObs_{hour:%Y%m%d%H}.dat"
+# Column order when a file has no header row
+COLUMNS = (
+    "AQSID", "SiteName", "Status", "EPARegion", "Latitude", "Longitude", "Elevation", "GMTOffset",
+    "CountryCode", "StateName", "ValidDate", "ValidTime", "DataSource", "ReportingArea_PipeDelimited",
+    "OZONE_AQI", "PM10_AQI", "PM25_AQI", "NO2_AQI",
+)
+# File column -> ParameterName used by the per-zip API
+POLLUTANTS = (("OZONE_AQI", "O3"), ("PM25_AQI", "PM2.5"), ("PM10_AQI", "PM10"), ("NO2_AQI", "NO2"))
+CATEGORIES = ((50, 1, "Good"), (100, 2, "Moderate"), (150, 3, "Unhealthy for Sensitive Groups"),
+              (200, 4, "Unhealthy"), (300, 5, "Very Unhealthy"))
+# GMTOffset -> the abbreviation AirNow reports as LocalTimeZone (files use standard time)
+STANDARD_ZONES = {0: "GMT", -4: "AST", -5: "EST", -6: "CST", -7: "MST", -8: "PST", -9: "AKST", -10: "HST"}
+EARTH_RADIUS_KM = 6371.0
+
+def category(aqi: int) -> Tuple[int, str]:
+    for upper, number, name in CATEGORIES:
+        if aqi <= upper:
+            return number, name
+    return 6, "Hazardous"
+
+def hour_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+class HttpHourlySource:
+    """Hourly files from the AirNow file host (or a mirror with the same layout)"""
+
+    def __init__(self, base_url: str = FILE_HOST, lookback: int = 3, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.lookback = lookback  # Hours to step back when the newest file is not published yet
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def candidates(self, now: datetime) -> List[datetime]:
+        """Newest first; the file for hour H appears some time after H ends"""
+        latest = hour_start(now) - timedelta(hours=1)
+        return [latest - timedelta(hours=i) for i in range(self.lookback)]
+
+    def url(self, hour: datetime) -> str:
+        return f"{self.base_url}/{hour:%Y}/{hour:%Y%m%d}/{FILE_PATTERN.format(hour=hour)}"
+
+    async def chunks(self, hour: datetime, lines_per_chunk: int = 1024) -> AsyncIterator[List[str]]:
+        """Lines of one file in batches, as they arrive; FileNotFoundError if not published"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=self.timeout)
+        async with self.client.stream("GET", self.url(hour)) as response:
+            if response.status_code == 404:
+                raise FileNotFoundError(self.url(hour))
+            response.raise_for_status()
+            chunk = []
+            async for line in response.aiter_lines():
+                chunk.append(line)
+                if len(chunk) >= lines_per_chunk:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+class DirectoryHourlySource:
+    """Hourly files from a local directory, e.g. recorded fixtures; the newest files are used"""
+
+    def __init__(self, path: Path, lookback: int = 3):
+        self.path = Path(path)
+        self.lookback = lookback
+
+    def candidates(self, now: datetime) -> List[datetime]:
+        hours = []
+        for file in self.path.glob("HourlyAQObs_*.dat"):
+            try:
+                hours.append(datetime.strptime(file.stem.split("_")[1], "%Y%m%d%H").replace(tzinfo=timezone.utc))
+            except (IndexError, ValueError):
+                continue
+        return sorted(hours, reverse=True)[:self.lookback]
+
+    async def chunks(self, hour: datetime, lines_per_chunk: int = 1024) -> AsyncIterator[List[str]]:
+        path = self.path / FILE_PATTERN.format(hour=hour)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.readlines, lines_per_chunk * 128)  # Size hint in bytes
+                if not chunk:
+                    break
+                yield chunk
+
+    async def close(self):
+        pass
+
+def source_from_env(value: str):
+    """AIRNOW_HOURLY_SOURCE: an http(s) base URL or a local directory; the AirNow file host if empty"""
+    if not value:
+        return HttpHourlySource()
+    if value.startswith(("http://", "https://")):
+        return HttpHourlySource(value)
+    return DirectoryHourlySource(Path(value))
+
+class SiteTable:
+    """One hourly file as arrays, one row per active site with at least one AQI"""
+
+    def __init__(self, ids: List[str], names: List[str], areas: List[str], states: List[str],
+                 lons: List[float], lats: List[float], offsets: List[int], observed: List[float], aqi: List[List[int]]):
+        self.ids = ids
+        self.names = names
+        self.areas = areas
+        self.states = states
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int8)
+        self.observed = np.asarray(observed, dtype=np.float64)  # Epoch seconds at the start of the hour
+        self.aqi = np.asarray(aqi, dtype=np.int16).reshape(len(ids), len(POLLUTANTS))  # -1 where not measured
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+async def parse_sites(chunks: AsyncIterator[List[str]]) -> SiteTable:
+    """Parse an HourlyAQObs file in a single pass over its line batches"""
+    columns = {name: i for i, name in enumerate(COLUMNS)}
+    ids, names, areas, states, lons, lats, offsets, observed, aqi = ([] for _ in range(9))
+    valid_times: Dict[Tuple[str, str], Optional[float]] = {}
+    first = True
+    async for chunk in chunks:
+        for row in csv.reader(chunk):
+            if first:
+                first = False
+                if row and row[0].strip().upper() == "AQSID":
+                    columns = {name.strip(): i for i, name in enumerate(row)}
+                    continue
+            try:
+                if row[columns["Status"]].strip().lower() != "active":
+                    continue
+                values = [int(float(row[columns[column]])) if row[columns[column]].strip() else -1 for column, _ in POLLUTANTS]
+                if max(values) < 0:
+                    continue
+                lat, lon = float(row[columns["Latitude"]]), float(row[columns["Longitude"]])
+                offset = int(float(row[columns["GMTOffset"]] or 0))
+                key = (row[columns["ValidDate"]], row[columns["ValidTime"]])
+            except (IndexError, KeyError, ValueError):
+                continue
+            if key not in valid_times:
+                try:
+                    valid = datetime.strptime(f"{key[0]} {key[1]}", "%m/%d/%y %H:%M").replace(tzinfo=timezone.utc)
+                    valid_times[key] = valid.timestamp()
+                except ValueError:
+                    valid_times[key] = None
+            if valid_times[key] is None:
+                continue
+            ids.append(row[columns["AQSID"]])
+            names.append(row[columns["SiteName"]])
+            areas.append(row[columns["ReportingArea_PipeDelimited"]].split("|")[0] or row[columns["SiteName"]])
+            states.append(row[columns["StateName"]])
+            lons.append(lon)
+            lats.append(lat)
+            offsets.append(offset)
+            observed.append(valid_times[key])
+            aqi.append(values)
+    return SiteTable(ids, names, areas, states, lons, lats, offsets, observed, aqi)
+
+def haversine_km(lon1, lat1, lon2, lat2) -> np.ndarray:
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class NearestSiteIndex:
+    """The k closest sites to every area, rebuilt only when the file's site list changes"""
+
+    def __init__(self, locations: Dict[Hashable, Tuple[float, float]], max_distance_km: float = 40.0, k: int = 8):
+        self.keys = list(locations)
+        self.lons = np.array([locations[key][0] for key in self.keys], dtype=np.float64)
+        self.lats = np.array([locations[key][1] for key in self.keys], dtype=np.float64)
+        self.max_distance_km = max_distance_km
+        self.k = k
+        self._site_ids: Optional[List[str]] = None
+        self._nearest: Optional[np.ndarray] = None  # areas x k site rows, closest first; -1 pads
+        self._distances: Optional[np.ndarray] = None
+
+    def _build(self, sites: SiteTable):
+        # Only sites inside the areas' bounding box, widened by the search radius, can qualify
+        margin_lat = self.max_distance_km / 111.0
+        margin_lon = margin_lat / max(np.cos(np.radians(np.abs(self.lats).max())), 0.01)
+        nearby = np.flatnonzero(
+            (sites.lons >= self.lons.min() - margin_lon) & (sites.lons <= self.lons.max() + margin_lon)
+            & (sites.lats >= self.lats.min() - margin_lat) & (sites.lats <= self.lats.max() + margin_lat)
+        )
+        k = min(self.k, len(nearby))
+        self._nearest = np.full((len(self.keys), self.k), -1, dtype=np.int64)
+        self._distances = np.full((len(self.keys), self.k), np.inf)
+        if k:
+            distances = haversine_km(self.lons[:, None], self.lats[:, None], sites.lons[nearby][None, :], sites.lats[nearby][None, :])
+            order = np.argsort(distances, axis=1)[:, :k]
+            self._nearest[:, :k] = nearby[order]
+            self._distances[:, :k] = np.take_along_axis(distances, order, axis=1)
+        self._site_ids = sites.ids
+        logging.info(f"Indexed {len(nearby)} of {len(sites)} monitoring sites near {len(self.keys)} areas")
+
+    def assign(self, sites: SiteTable) -> Tuple[np.ndarray, np.ndarray]:
+        """Per area and pollutant: the site row supplying the value (-1 if none in range) and the AQI"""
+        if not len(sites) or not self.keys:
+            empty = np.full((len(self.keys), len(POLLUTANTS)), -1, dtype=np.int64)
+            return empty, empty
+        if self._site_ids != sites.ids:
+            self._build(sites)
+        rows = np.where(self._nearest >= 0, self._nearest, 0)
+        values = sites.aqi[rows]  # areas x k x pollutants
+        usable = (values >= 0) & (self._nearest >= 0)[:, :, None] & (self._distances <= self.max_distance_km)[:, :, None]
+        first = usable.argmax(axis=1)  # Closest usable site per area and pollutant
+        found = usable.any(axis=1)
+        chosen = np.take_along_axis(rows, first, axis=1)
+        aqi = np.take_along_axis(values, first[:, None, :], axis=1)[:, 0, :]
+        return np.where(found, chosen, -1), np.where(found, aqi, -1)
+
+def build_observation(sites: SiteTable, site_rows: np.ndarray, aqi: np.ndarray) -> Optional[ZipObservation]:
+    """ZipObservation for one area; metadata comes from the site supplying the dominant pollutant"""
+    readings = [
+        Reading(parameter, int(value), *category(int(value)))
+        for (_, parameter), value in zip(POLLUTANTS, aqi.tolist())
+        if value >= 0
+    ]
+    if not readings:
+        return None
+    dominant = int(site_rows[int(np.argmax(aqi))])
+    offset = int(sites.offsets[dominant])
+    zone = STANDARD_ZONES.get(offset)
+    if zone is None:
+        offset, zone = 0, "UTC"
+    local = datetime.fromtimestamp(sites.observed[dominant], timezone(timedelta(hours=offset)))
+    return ZipObservation(
+        f"{local:%Y-%m-%d} ", local.hour, zone, sites.areas[dominant], sites.states[dominant],
+        float(sites.lats[dominant]), float(sites.lons[dominant]), readings,
+    )
+
+class HourlyIngestor:
+    """Fills the service's cache for every zip from the newest hourly file"""
+
+    def __init__(self, service, source, locations, max_distance_km: float = 40.0, retry_interval: float = 300.0):
+        self.service = service
+        self.source = source
+        self.locations = locations  # Callable returning {zip: (lon, lat)}, resolved on first refresh
+        self.max_distance_km = max_distance_km
+        self.retry_interval = retry_interval  # Minimum seconds between file checks
+        self.hour: Optional[datetime] = None  # Newest file ingested so far
+        self.sites = 0
+        self._index: Optional[NearestSiteIndex] = None
+        self._next_check = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Ingest a newer file if one is available; concurrent callers share one attempt"""
+        if self._task is None or self._task.done():
+            if time.time() < self._next_check:
+                return
+            self._next_check = time.time() + self.retry_interval
+            self._task = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._task)
+
+    async def _refresh(self):
+        if self._index is None:
+            locations = await asyncio.to_thread(self.locations)
+            self._index = NearestSiteIndex(locations, self.max_distance_km)
+        for hour in self.source.candidates(datetime.now(timezone.utc)):
+            if self.hour is not None and hour <= self.hour:
+                break
+            started = time.perf_counter()
+            try:
+                sites = await parse_sites(self.source.chunks(hour))
+            except FileNotFoundError:
+                airnow_hourly_files.inc("missing")
+                continue
+            except Exception as e:
+                airnow_hourly_files.inc("error")
+                logging.error(f"Error reading AirNow hourly file for {hour:%Y-%m-%d %H}:00 UTC: {e!r}")
+                return
+            self.apply(sites)
+            self.hour = hour
+            airnow_hourly_files.inc("ok")
+            logging.info(f"Ingested {len(sites)} sites from the {hour:%Y-%m-%d %H}:00 UTC file in {time.perf_counter() - started:.2f}s")
+            return
+
+    def apply(self, sites: SiteTable) -> int:
+        """Store an observation for every zip covered by the file; returns how many"""
+        site_rows, aqi = self._index.assign(sites)
+        self.sites = len(sites)
+        filled = 0
+        for i, zip_code in enumerate(self._index.keys):
+            observation = build_observation(sites, site_rows[i], aqi[i])
+            if observation is not None:
+                self.service.store_observation(zip_code, observation)
+                filled += 1
+            else:
+                self.service.cache.set_failure(zip_code)
+        return filled
+
+    async def close(self):
+        await self.source.close()
+
+def zip_locations(index, zip_codes: Dict[str, str]) -> Dict[str, Tuple[float, float]]:
+    """Each zip placed at the mean centroid of the neighborhoods mapped to it"""
+    index.load()
+    centroids = {shape.name: shape.centroid for shape in index.shapes}
+    points: Dict[str, List[Tuple[float, float]]] = {}
+    for neighborhood, zip_code in zip_codes.items():
+        if neighborhood in centroids:
+            points.setdefault(zip_code, []).append(centroids[neighborhood])
+        else:
+            logging.warning(f"No polygon for neighborhood {neighborhood}; it cannot locate zip {zip_code}")
+    return {zip_code: tuple(np.mean(values, axis=0)) for zip_code, values in points.items()}
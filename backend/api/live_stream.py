@@ -0,0 +1,110 @@
+# live_stream.py
+"""
+Server-Sent Events fan-out of AQI changes.
+
+Each snapshot refresh is diffed against the last published state; if any
+neighborhood changed (or disappeared) one "update" event is encoded once
+and the same bytes are queued for every subscriber. Subscribers have small
+bounded queues: a consumer that falls behind is not allowed to hold memory
+or slow the others, it is marked and resynchronised with a full "snapshot"
+event instead. Recent events are kept in a ring buffer so reconnecting
+clients can resume from Last-Event-ID. Event ids start from the
+broadcaster's creation time in seconds, so an id issued before a restart
+is older than anything this process sent and gets a fresh snapshot rather
+than a replay of unrelated events.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Set, Tuple
+
+from aqi_snapshot import format_observation
+from responses import dumps
+
+def encode_event(event: str, event_id: int, payload: Dict[str, Any]) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: ".encode("utf-8") + dumps(payload) + b"\n\n"
+
+class Subscriber:
+    __slots__ = ("queue", "overflowed")
+
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+class AQIBroadcaster:
+    def __init__(self, history_size: int = 256, queue_size: int = 32, heartbeat: float = 15.0,
+                 formatter: Callable[[Any], Dict[str, Any]] = format_observation):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.formatter = formatter
+        self.first_id = int(time.time())  # Ids below this belong to an earlier process
+        self.last_id = self.first_id
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._history: Deque[Tuple[int, bytes]] = deque(maxlen=history_size)
+        self._subscribers: Set[Subscriber] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, aqi_data: Dict[str, Any]):
+        """Diff a new set of observations against the last one and fan out the changes"""
+        state = {name: self.formatter(data) for name, data in aqi_data.items()}
+        changed = {name: value for name, value in state.items() if self._state.get(name) != value}
+        removed = [name for name in self._state if name not in state]
+        self._state = state
+        if not changed and not removed:
+            return
+
+        self.last_id += 1
+        frame = encode_event("update", self.last_id, {"changed": changed, "removed": removed})
+        self._history.append((self.last_id, frame))
+        for subscriber in self._subscribers:
+            if subscriber.overflowed:
+                continue
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and resync it with a snapshot later
+                subscriber.overflowed = True
+
+    def snapshot_frame(self) -> bytes:
+        return encode_event("snapshot", self.last_id, {"neighborhoods": self._state})
+
+    def _replay(self, last_event_id: Optional[int]) -> Optional[list]:
+        """Frames after last_event_id, or None if the client must start from a snapshot"""
+        if last_event_id is None or not self.first_id <= last_event_id <= self.last_id:
+            return None
+        if last_event_id == self.last_id:
+            return []
+        if not self._history or self._history[0][0] > last_event_id + 1:
+            return None
+        return [frame for event_id, frame in self._history if event_id > last_event_id]
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield SSE frames for one client until it disconnects"""
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            replay = self._replay(last_event_id)
+            if replay is None:
+                yield self.snapshot_frame()
+            else:
+                for frame in replay:
+                    yield frame
+
+            while True:
+                if subscriber.overflowed:
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.overflowed = False
+                    yield self.snapshot_frame()
+                    continue
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield frame
+        finally:
+            self._subscribers.discard(subscriber)
@@ -1,162 +1,563 @@
 # backend/api/main.py
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
-import os, logging, asyncio
-from airnow_service import airnow_service, AirNowResponse
-from typing import Dict, List
-from datetime import datetime, timedelta
+import os, logging, asyncio, time
+from admission import HIGH, LOW, AdmissionGate, AdmissionMiddleware, RoutePolicy, degraded
+from airnow_service import get_airnow_service
+from aqi_cache import observation_time
+from aqi_surface import NODATA, SurfaceBuilder
+from aqi_snapshot import AQISnapshotStore, BOSTON, NEIGHBORHOODS_WITH_AQI, format_observation, snapshot_response
+from geo_index import NeighborhoodIndex
+from hourly_ingest import HourlyIngestor, source_from_env, zip_locations
+from live_stream import AQIBroadcaster
+from metrics import CONTENT_TYPE, MetricsMiddleware, profiler, registry
+from scoring import ScoreWeights
+from shared_snapshot import SharedSnapshotCoordinator
+from geometry_service import GeometryService
+from responses import CompressedBody, FastJSONResponse, compressed_response, dumps, etag_matches
+from pydantic import BaseModel
+from typing import List, Optional
+import numpy as np
+from datetime import datetime
 
-# Load .env from same folder as this file
-load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
+# Load .env from same folder as this file (or DOTENV_PATH); the only place the API reads it
+load_dotenv(dotenv_path=os.getenv("DOTENV_PATH") or Path(__file__).with_name(".env"))
 
-app = FastAPI()
+# Cheap to construct: the upstream client, on-disk store and indexes are opened in the lifespan or on first use
+airnow_service = get_airnow_service()
+
+# Pre-serialized /aqi/boston and /neighborhoods/with-aqi bodies; interval 0 builds per request
+snapshot_store = AQISnapshotStore(
+    airnow_service,
+    interval=float(os.getenv("AQI_SNAPSHOT_INTERVAL_SECONDS", "60")),
+    # overall_score weights; the default (air only) is 100 - AQI
+    weights=ScoreWeights(
+        air=float(os.getenv("SCORE_WEIGHT_AIR", "1")),
+        water=float(os.getenv("SCORE_WEIGHT_WATER", "0")),
+        hazards=float(os.getenv("SCORE_WEIGHT_HAZARDS", "0")),
+    ),
+)
+
+# Neighborhood polygons for point lookups; loaded on first use or by the startup warm-up
+neighborhoods_geojson = Path(os.getenv("NEIGHBORHOODS_GEOJSON_PATH", str(NeighborhoodIndex().path)))
+neighborhood_index = NeighborhoodIndex(neighborhoods_geojson)
+# Simplified, quantized TopoJSON for the map, cached per zoom
+geometry_service = GeometryService(neighborhoods_geojson)
+# Interpolated AQI raster, rebuilt whenever the snapshot refreshes
+surface_builder = SurfaceBuilder(
+    neighborhood_index,
+    resolution=float(os.getenv("AQI_GRID_RESOLUTION_DEG", "0.0025")),
+    power=float(os.getenv("AQI_GRID_IDW_POWER", "2")),
+)
+surface_builds: set = set()  # Running background rebuilds, referenced until they finish
+
+def surface_build_done(task: asyncio.Task):
+    surface_builds.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"AQI surface rebuild failed: {task.exception()!r}")
+
+def rebuild_surface(aqi_data):
+    """Snapshot listener: rebuild the raster in a thread; the first build also loads the index"""
+    task = asyncio.get_running_loop().create_task(asyncio.to_thread(surface_builder.build, list(aqi_data.values())))
+    surface_builds.add(task)
+    task.add_done_callback(surface_build_done)
+
+snapshot_store.add_listener(rebuild_surface)
+# AIRNOW_INGEST_MODE=hourly: one bulk hourly file per refresh instead of a query per zip
+if os.getenv("AIRNOW_INGEST_MODE", "zip").lower() == "hourly":
+    airnow_service.bulk = HourlyIngestor(
+        airnow_service,
+        source_from_env(os.getenv("AIRNOW_HOURLY_SOURCE", "")),
+        lambda: zip_locations(neighborhood_index, airnow_service.boston_zip_codes),
+        max_distance_km=float(os.getenv("AIRNOW_HOURLY_MAX_DISTANCE_KM", "40")),
+        retry_interval=float(os.getenv("AIRNOW_HOURLY_RETRY_SECONDS", "300")),
+    )
+# Pushes changed neighborhoods to /aqi/stream subscribers after each refresh
+broadcaster = AQIBroadcaster(
+    queue_size=int(os.getenv("AQI_STREAM_QUEUE_SIZE", "32")),
+    heartbeat=float(os.getenv("AQI_STREAM_HEARTBEAT_SECONDS", "15")),
+)
+snapshot_store.add_listener(broadcaster.publish)
+# Multi-worker deployments: one elected worker calls AirNow and shares observations via mmap
+shared_snapshot_path = os.getenv("AQI_SHARED_SNAPSHOT_PATH", "")
+shared_snapshot = SharedSnapshotCoordinator(
+    Path(shared_snapshot_path),
+    airnow_service,
+    snapshot_store,
+    check_interval=float(os.getenv("AQI_SHARED_SNAPSHOT_CHECK_SECONDS", "1")),
+) if shared_snapshot_path else None
+if shared_snapshot is not None:
+    # Every refresh: followers need the new freshness deadlines even when no observation changed
+    snapshot_store.add_listener(shared_snapshot.publish, changes_only=False)
+
+def cached_data_age():
+    now = time.time()
+    for zip_code, entry in airnow_service.cache.items():
+        observed = observation_time(entry.value) if entry.value is not None else None
+        if observed is not None:
+            yield (zip_code,), now - observed
+
+# Values read from live state at scrape time
+registry.gauge("aqi_data_age_seconds", "Seconds since AirNow observed the cached value (HourObserved)", ("zip",),
+               collect=cached_data_age)
+registry.gauge("aqi_cache_entries", "Entries in the AQI cache", collect=lambda: [((), len(airnow_service.cache))])
+registry.gauge("airnow_circuit_state", "1 for the AirNow circuit breaker's current state", ("state",),
+               collect=lambda: [((airnow_service.breaker.state,), 1)])
+registry.gauge("aqi_snapshot_age_seconds", "Seconds since the AQI snapshot last refreshed",
+               collect=lambda: [((), time.time() - snapshot_store.refreshed_at)] if snapshot_store.refreshed_at else [])
+registry.gauge("aqi_shared_snapshot_leader", "1 if this worker is the elected AirNow refresher",
+               collect=lambda: [((), int(shared_snapshot.is_leader))] if shared_snapshot is not None else [])
+registry.gauge("aqi_stream_subscribers", "Connected /aqi/stream clients",
+               collect=lambda: [((), broadcaster.subscriber_count)])
+
+async def warm_up():
+    """Build the geometry indexes off the request path; each also builds itself on first use"""
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(surface_builder.prepare)  # Loads neighborhood_index as well
+        await asyncio.to_thread(geometry_service.load)
+        logging.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+    except Exception:
+        logging.exception("Warm-up failed; indexes will be built on first use")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client for the lifetime of the app
+    await airnow_service.start()
+    await airnow_service.load_store()
+    # Serving starts right away; set AQI_WARMUP=false to build indexes only when first needed
+    warmup = os.getenv("AQI_WARMUP", "true").lower() in ("1", "true", "yes")
+    app.state.warmup = asyncio.create_task(warm_up()) if warmup else None
+    if shared_snapshot is not None:
+        await shared_snapshot.start()
+    snapshot_store.start()
+    try:
+        yield
+    finally:
+        if app.state.warmup is not None:
+            app.state.warmup.cancel()
+            try:
+                await app.state.warmup
+            except asyncio.CancelledError:
+                pass
+        await snapshot_store.stop()
+        await asyncio.gather(*surface_builds, return_exceptions=True)  # Threads can't be cancelled
+        if shared_snapshot is not None:
+            await shared_snapshot.stop()
+        await airnow_service.close()
+
+def cached_entry(neighborhood_name: str):
+    """Servable cache entry for a neighborhood's zip, or None"""
+    zip_code = airnow_service.boston_zip_codes.get(neighborhood_name)
+    entry = airnow_service.cache.get(zip_code) if zip_code else None
+    return entry if entry is not None and entry.value is not None else None
+
+def stale_neighborhood(neighborhood_name: str, reason: str) -> Optional[Response]:
+    """Last cached observation for a neighborhood, marked degraded"""
+    entry = cached_entry(neighborhood_name)
+    if entry is None:
+        return None
+    body = {"neighborhood": neighborhood_name, **format_observation(entry.value)}
+    return degraded(FastJSONResponse(body), reason, entry.fetched_at)
+
+def stale_snapshot(name: str, request: Request, reason: str) -> Optional[Response]:
+    """Last built snapshot body, marked degraded"""
+    snapshot = snapshot_store.last(name)
+    if snapshot is None:
+        return None
+    return degraded(snapshot_response(request, snapshot), reason, snapshot_store.refreshed_at)
+
+def located_neighborhood(request: Request, lon: float, lat: float) -> Optional[str]:
+    """Neighborhood containing the point, looked up once per request (admission and handler share it)"""
+    if not hasattr(request.state, "neighborhood"):
+        request.state.neighborhood = neighborhood_index.locate(lon, lat)
+    return request.state.neighborhood
+
+def point_neighborhood(request: Request) -> Optional[str]:
+    # Until the warm-up (or a handler, in a thread) has loaded the index, admission uses the defaults
+    # rather than parsing the GeoJSON on the event loop
+    if not neighborhood_index.loaded:
+        return None
+    try:
+        return located_neighborhood(request, float(request.query_params["lon"]), float(request.query_params["lat"]))
+    except (KeyError, ValueError):
+        return None
+
+async def load_neighborhood_index():
+    if not neighborhood_index.loaded:
+        await asyncio.to_thread(neighborhood_index.load)
+
+def admission_gate(route: str) -> AdmissionGate:
+    limit = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+    return AdmissionGate(
+        route,
+        limit=limit,
+        queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "64")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "0.5")),
+        # Slots only cache-served requests may take, so upstream misses cannot starve them
+        reserved=int(limit * float(os.getenv("ADMISSION_RESERVED_FRACTION", "0.25"))),
+    )
+
+def snapshot_priority(params, request) -> int:
+    return HIGH if snapshot_store.polling else LOW  # Without the poller every read refreshes
+
+# Per-route concurrency limits; requests that cannot be admitted degrade to cached data or get a 503
+admission_policies = {
+    "/aqi/neighborhood/{neighborhood_name}": RoutePolicy(
+        admission_gate("/aqi/neighborhood/{neighborhood_name}"),
+        priority=lambda params, request: HIGH if cached_entry(params["neighborhood_name"]) else LOW,
+        fallback=lambda params, request, reason: stale_neighborhood(params["neighborhood_name"], reason),
+    ),
+    "/aqi/point": RoutePolicy(
+        admission_gate("/aqi/point"),
+        priority=lambda params, request: HIGH if cached_entry(point_neighborhood(request)) else LOW,
+        fallback=lambda params, request, reason: stale_neighborhood(point_neighborhood(request), reason),
+    ),
+    "/aqi/boston": RoutePolicy(
+        admission_gate("/aqi/boston"),
+        priority=snapshot_priority,
+        fallback=lambda params, request, reason: stale_snapshot(BOSTON, request, reason),
+    ),
+    "/neighborhoods/with-aqi": RoutePolicy(
+        admission_gate("/neighborhoods/with-aqi"),
+        priority=snapshot_priority,
+        fallback=lambda params, request, reason: stale_snapshot(NEIGHBORHOODS_WITH_AQI, request, reason),
+    ),
+    "/aqi/points": RoutePolicy(admission_gate("/aqi/points")),
+    "/geometry/neighborhoods": RoutePolicy(admission_gate("/geometry/neighborhoods")),
+    "/aqi/grid": RoutePolicy(admission_gate("/aqi/grid")),
+    "/aqi/grid/neighborhoods": RoutePolicy(admission_gate("/aqi/grid/neighborhoods")),
+} if os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes") else {}
+
+registry.gauge("admission_requests", "Requests running or waiting per gated route", ("route", "state"),
+               collect=lambda: [((route, state), value) for route, policy in admission_policies.items()
+                                for state, value in (("active", policy.gate.active), ("queued", policy.gate.queued))])
+
+# Handlers return FastJSONResponse directly on hot paths to skip jsonable_encoder
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(AdmissionMiddleware, router_app=app, policies=admission_policies)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[o.strip() for o in os.getenv("ALLOWED_ORIGINS","").split(",") if o],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["ETag", "X-Grid-Width", "X-Grid-Height", "X-Grid-BBox", "X-Grid-Nodata", "X-Grid-Order",
+                    "X-AQI-Degraded", "X-AQI-Data-Age", "Retry-After"],
 )
+app.add_middleware(MetricsMiddleware, router_app=app)
 
 @app.get("/health")
 def health():
+    """ok when AirNow is reachable and every zip is fresh; 503 only when nothing can be served"""
     try:
-        return {"status": "ok", "airnow": "available"}
+        now = time.time()
+        entries = [entry for _, entry in airnow_service.cache.items() if entry.value is not None]
+        fresh = sum(1 for entry in entries if entry.is_fresh(now))
+        servable = sum(1 for entry in entries if entry.is_servable(now))
+        zips = len(set(airnow_service.boston_zip_codes.values()))
+        breaker = airnow_service.breaker.state
+        observed = [observation_time(entry.value) for entry in entries]
+        observed = [value for value in observed if value is not None]
+
+        if breaker == "open" and not servable:
+            status = "error"
+        elif breaker == "closed" and fresh >= zips:
+            status = "ok"
+        else:
+            status = "degraded"
+        body = {
+            "status": status,
+            "airnow": {"closed": "available", "half_open": "recovering", "open": "unavailable"}[breaker],
+            "cache": {"zips": zips, "fresh": fresh, "servable": servable},
+            "oldest_observation_age_seconds": round(now - min(observed)) if observed else None,
+            "snapshot": {
+                "polling": snapshot_store.polling,
+                "age_seconds": round(now - snapshot_store.refreshed_at, 1) if snapshot_store.refreshed_at else None,
+            },
+        }
+        return FastJSONResponse(body, status_code=503 if status == "error" else 200)
     except Exception as e:
         logging.exception("Health check error")
-        return {"status": "error", "error": str(e)}
+        return FastJSONResponse({"status": "error", "error": str(e)}, status_code=503)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the service's metrics"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+def require_profiler():
+    if os.getenv("PROFILER_ENABLED", "").lower() not in ("1", "true", "yes"):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.post("/debug/profiler/start")
+async def start_profiler(interval: float = Query(0.005, gt=0.0005, le=1.0)):
+    """Start sampling the event loop thread (requires PROFILER_ENABLED)"""
+    require_profiler()
+    # async handler, so this runs on (and samples) the event loop thread
+    profiler.start(interval)
+    return {"running": True, "interval": profiler.interval}
+
+@app.post("/debug/profiler/stop")
+async def stop_profiler():
+    """Stop sampling; the collected stacks stay available until the next start"""
+    require_profiler()
+    await asyncio.to_thread(profiler.stop)  # Joins the sampler thread, which can take up to one interval
+    return {"running": False, "samples": sum(profiler.samples.values())}
+
+@app.get("/debug/profiler")
+async def get_profile():
+    """Collapsed stacks ('frame;frame count' lines), ready for flamegraph tools"""
+    require_profiler()
+    return Response(content=profiler.collapsed(), media_type="text/plain")
 
 @app.get("/aqi/neighborhood/{neighborhood_name}")
 async def get_neighborhood_aqi(neighborhood_name: str):
     """Get real-time AQI data for a specific neighborhood"""
     try:
         aqi_data = await airnow_service.get_aqi_by_neighborhood(neighborhood_name)
-        if not aqi_data:
-            raise HTTPException(status_code=404, detail=f"No AQI data found for {neighborhood_name}")
-        
-        return {
-            "neighborhood": neighborhood_name,
-            "aqi": aqi_data.AQI,
-            "parameter": aqi_data.ParameterName,
-            "category": aqi_data.Category,
-            "date_observed": aqi_data.DateObserved,
-            "hour_observed": aqi_data.HourObserved,
-            "reporting_area": aqi_data.ReportingArea,
-            "coordinates": {
-                "latitude": aqi_data.Latitude,
-                "longitude": aqi_data.Longitude
-            }
-        }
     except Exception as e:
         logging.exception(f"Error fetching AQI for {neighborhood_name}")
+        fallback = stale_neighborhood(neighborhood_name, "error")
+        if fallback is not None:
+            return fallback
         raise HTTPException(status_code=500, detail=f"Error fetching AQI data: {str(e)}")
+    if not aqi_data:
+        raise HTTPException(status_code=404, detail=f"No AQI data found for {neighborhood_name}")
+
+    return FastJSONResponse({"neighborhood": neighborhood_name, **format_observation(aqi_data)})
 
 @app.get("/aqi/boston")
-async def get_all_boston_aqi():
+async def get_all_boston_aqi(
+    request: Request,
+    since: int = Query(None, description="Version the client already has; returns only changes and removals after it"),
+):
     """Get real-time AQI data for all Boston neighborhoods"""
     try:
-        aqi_data = await airnow_service.get_all_boston_aqi()
-        
-        # Format response
-        formatted_data = {}
-        for neighborhood, data in aqi_data.items():
-            formatted_data[neighborhood] = {
-                "aqi": data.AQI,
-                "parameter": data.ParameterName,
-                "category": data.Category,
-                "date_observed": data.DateObserved,
-                "hour_observed": data.HourObserved,
-                "reporting_area": data.ReportingArea,
-                "coordinates": {
-                    "latitude": data.Latitude,
-                    "longitude": data.Longitude
-                }
-            }
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "neighborhoods": formatted_data,
-            "total_neighborhoods": len(formatted_data)
-        }
+        snapshot = await (snapshot_store.current(BOSTON) if since is None else snapshot_store.delta(since))
+        return snapshot_response(request, snapshot)
     except Exception as e:
         logging.exception("Error fetching all Boston AQI data")
+        fallback = stale_snapshot(BOSTON, request, "error")
+        if fallback is not None:
+            return fallback
+        raise HTTPException(status_code=500, detail=f"Error fetching AQI data: {str(e)}")
+
+@app.get("/aqi/history/{neighborhood_name}")
+async def get_neighborhood_aqi_history(
+    neighborhood_name: str,
+    start: datetime = Query(None, description="Range start (ISO 8601); defaults to 7 days before end"),
+    end: datetime = Query(None, description="Range end (ISO 8601); defaults to now"),
+    bucket: int = Query(3600, ge=60, description="Bucket size in seconds"),
+    parameter: str = Query(None, description="Limit to one pollutant, e.g. O3 or PM2.5"),
+):
+    """Get downsampled AQI history (min/mean/max per bucket) for a neighborhood"""
+    zip_code = airnow_service.boston_zip_codes.get(neighborhood_name)
+    if not zip_code:
+        raise HTTPException(status_code=404, detail=f"Unknown neighborhood: {neighborhood_name}")
+
+    end_ts = int(end.timestamp()) if end else int(datetime.now().timestamp())
+    start_ts = int(start.timestamp()) if start else end_ts - 7 * 86400
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    await airnow_service.history_ready()  # Stored history is read back in the background after startup
+    parameters = [parameter] if parameter else airnow_service.history.parameters(zip_code)
+    return FastJSONResponse({
+        "neighborhood": neighborhood_name,
+        "zip_code": zip_code,
+        "start": start_ts,
+        "end": end_ts,
+        "bucket_seconds": bucket,
+        "series": {
+            name: airnow_service.history.query(zip_code, name, start_ts, end_ts, bucket)
+            for name in parameters
+        }
+    })
+
+@app.get("/aqi/point")
+async def get_point_aqi(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+):
+    """Get real-time AQI data for the neighborhood containing a point"""
+    await load_neighborhood_index()
+    neighborhood_name = located_neighborhood(request, lon, lat)
+    if not neighborhood_name:
+        raise HTTPException(status_code=404, detail=f"No neighborhood contains ({lat}, {lon})")
+    try:
+        aqi_data = await airnow_service.get_aqi_by_neighborhood(neighborhood_name)
+    except Exception as e:
+        logging.exception(f"Error fetching AQI for point ({lat}, {lon})")
+        fallback = stale_neighborhood(neighborhood_name, "error")
+        if fallback is not None:
+            return fallback
         raise HTTPException(status_code=500, detail=f"Error fetching AQI data: {str(e)}")
+    if not aqi_data:
+        raise HTTPException(status_code=404, detail=f"No AQI data found for {neighborhood_name}")
+    return FastJSONResponse({"neighborhood": neighborhood_name, **format_observation(aqi_data)})
+
+class PointBatch(BaseModel):
+    lat: List[float]
+    lon: List[float]
+
+@app.post("/aqi/points")
+async def get_points_aqi(points: PointBatch):
+    """Geotag many points at once; results are arrays aligned with the input"""
+    if len(points.lat) != len(points.lon):
+        raise HTTPException(status_code=400, detail="lat and lon must have the same length")
+
+    await load_neighborhood_index()
+    matches = neighborhood_index.locate_many(np.array(points.lon), np.array(points.lat))
+    names = neighborhood_index.names()
+    matched = sorted({names[i] for i in np.unique(matches) if i >= 0})
+
+    # One lookup per distinct neighborhood (and, underneath, per distinct zip)
+    results = await asyncio.gather(*(airnow_service.get_aqi_by_neighborhood(name) for name in matched))
+    aqi_by_name = {name: data.AQI for name, data in zip(matched, results) if data}
+
+    neighborhoods = [names[i] if i >= 0 else None for i in matches.tolist()]
+    return FastJSONResponse({
+        "neighborhoods": neighborhoods,
+        "aqi": [aqi_by_name.get(name) if name else None for name in neighborhoods],
+        "count": len(neighborhoods)
+    })
+
+@app.get("/geometry/neighborhoods")
+async def get_neighborhood_geometry(
+    request: Request,
+    zoom: int = Query(12, ge=0, le=22, description="Map zoom level the geometry is simplified for"),
+    aqi: bool = Query(False, description="Merge current AQI values into feature properties"),
+):
+    """Get simplified neighborhood boundaries as TopoJSON"""
+    try:
+        properties = None
+        if aqi:
+            aqi_data = await airnow_service.get_all_boston_aqi()
+            properties = {
+                name: {"aqi": data.AQI, "parameter": data.ParameterName}
+                for name, data in aqi_data.items()
+            }
+        variant = await asyncio.to_thread(geometry_service.variant, zoom, properties)
+        # Bare geometry never changes at runtime; AQI-merged variants must revalidate
+        cache_control = "no-cache" if aqi else "public, max-age=86400"
+        return compressed_response(request, variant, cache_control)
+    except Exception as e:
+        logging.exception("Error building neighborhood geometry")
+        raise HTTPException(status_code=500, detail=f"Error building geometry: {str(e)}")
+
+async def current_surface(parameter: str = None):
+    aqi_data = await airnow_service.get_all_boston_aqi()
+    surface = await asyncio.to_thread(surface_builder.build, list(aqi_data.values()), parameter)
+    if surface is None:
+        raise HTTPException(status_code=404, detail=f"No AQI observations available{' for ' + parameter if parameter else ''}")
+    return surface
+
+@app.get("/aqi/grid")
+async def get_aqi_grid(
+    request: Request,
+    parameter: str = Query(None, description="Pollutant to interpolate; defaults to the dominant AQI"),
+):
+    """Get the interpolated AQI surface as a raw little-endian uint16 raster"""
+    surface = await current_surface(parameter)
+    headers = {
+        "ETag": surface.etag,
+        "Cache-Control": "no-cache",
+        "X-Grid-Width": str(surface_builder.cols),
+        "X-Grid-Height": str(surface_builder.rows),
+        "X-Grid-BBox": ",".join(f"{v:.6f}" for v in surface_builder.bbox),
+        "X-Grid-Nodata": str(NODATA),
+        "X-Grid-Order": "row-major, south to north",
+    }
+    if etag_matches(request, surface.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=surface.body, media_type="application/octet-stream", headers=headers)
+
+@app.get("/aqi/grid/neighborhoods")
+async def get_aqi_grid_zonal(parameter: str = Query(None)):
+    """Get per-neighborhood averages of the interpolated AQI surface"""
+    surface = await current_surface(parameter)
+    return FastJSONResponse({
+        "parameter": parameter or "dominant",
+        "neighborhoods": surface.zonal,
+        "count": len(surface.zonal)
+    })
+
+@app.get("/aqi/stream")
+async def stream_aqi(request: Request, last_event_id: int = Query(None)):
+    """Server-Sent Events: a snapshot on connect, then only neighborhoods that changed"""
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        broadcaster.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# The neighborhood list is fixed for the process, so it is serialized once
+neighborhoods_body = None
 
 @app.get("/neighborhoods")
-async def get_neighborhoods():
+async def get_neighborhoods(request: Request):
     """Get list of available neighborhoods"""
+    global neighborhoods_body
     try:
-        # Return the list of neighborhoods from airnow_service
-        neighborhoods = list(airnow_service.boston_zip_codes.keys())
-        return {
-            "neighborhoods": neighborhoods,
-            "count": len(neighborhoods)
-        }
+        if neighborhoods_body is None:
+            # Return the list of neighborhoods from airnow_service
+            neighborhoods = list(airnow_service.boston_zip_codes.keys())
+            neighborhoods_body = CompressedBody(dumps({
+                "neighborhoods": neighborhoods,
+                "count": len(neighborhoods)
+            }))
+        return compressed_response(request, neighborhoods_body, "public, max-age=3600")
     except Exception as e:
         logging.exception("Error fetching neighborhoods list")
         raise HTTPException(status_code=500, detail=f"Error fetching neighborhoods: {str(e)}")
 
+@app.get("/neighborhoods/top")
+async def get_top_neighborhoods(k: int = Query(5, ge=1, le=500, description="Number of neighborhoods")):
+    """Get the k neighborhoods with the highest environmental score"""
+    await snapshot_store.current(NEIGHBORHOODS_WITH_AQI)  # Refreshes first when the poller is off
+    ranking = snapshot_store.scores.ranking
+    top = ranking.top(k)
+    return FastJSONResponse({
+        "neighborhoods": [{"rank": i + 1, "name": name, "score": score} for i, (name, score) in enumerate(top)],
+        "count": len(top),
+        "total": len(ranking),
+        "weights": snapshot_store.scores.weights._asdict(),
+    })
+
+@app.get("/neighborhoods/{neighborhood_name}/rank")
+async def get_neighborhood_rank(neighborhood_name: str):
+    """Get a neighborhood's environmental score and its rank among all scored neighborhoods"""
+    await snapshot_store.current(NEIGHBORHOODS_WITH_AQI)
+    ranking = snapshot_store.scores.ranking
+    rank = ranking.rank(neighborhood_name)
+    if rank is None:
+        raise HTTPException(status_code=404, detail=f"No score for {neighborhood_name}")
+    return FastJSONResponse({
+        "name": neighborhood_name,
+        "rank": rank,
+        "score": ranking.score(neighborhood_name),
+        "total": len(ranking),
+    })
+
 @app.get("/neighborhoods/with-aqi")
-async def get_neighborhoods_with_aqi():
+async def get_neighborhoods_with_aqi(request: Request):
     """Get neighborhoods with real-time AQI data (for frontend compatibility)"""
     try:
-        # Get AQI data for all neighborhoods
-        aqi_data = await airnow_service.get_all_boston_aqi()
-        
-        # Create mock neighborhood data with AQI
-        neighborhoods = []
-        for neighborhood_name, aqi_info in aqi_data.items():
-            neighborhood = {
-                "id": neighborhood_name.lower().replace(" ", "-"),
-                "name": neighborhood_name,
-                "environmental_data": {
-                    "air_quality": {
-                        "pm25": 15.0,  # Mock data
-                        "pm10": 25.0,
-                        "o3": 0.05,
-                        "no2": 0.02,
-                        "so2": 0.01,
-                        "co": 1.0,
-                        "aqi": aqi_info.AQI,
-                        "last_updated": aqi_info.DateObserved
-                    },
-                    "water_quality": {
-                        "ph": 7.2,
-                        "turbidity": 0.5,
-                        "dissolved_oxygen": 8.5,
-                        "bacteria_count": 10,
-                        "lead_level": 0.001,
-                        "chlorine_residual": 0.5,
-                        "last_updated": "2024-01-01T00:00:00Z"
-                    },
-                    "environmental_hazards": {
-                        "noise_level": 65,
-                        "traffic_density": 7,
-                        "industrial_proximity": 3,
-                        "green_space_percentage": 25,
-                        "flood_risk": 4,
-                        "heat_island_effect": 6,
-                        "last_updated": "2024-01-01T00:00:00Z"
-                    },
-                    "overall_score": max(0, 100 - aqi_info.AQI),  # Simple scoring based on AQI
-                    "last_updated": aqi_info.DateObserved
-                },
-                "metadata": {
-                    "migrated_at": "2024-01-01T00:00:00Z",
-                    "data_source": "airnow_api",
-                    "neighborhood_id": neighborhood_name.lower().replace(" ", "-")
-                }
-            }
-            neighborhoods.append(neighborhood)
-        
-        return {
-            "neighborhoods": neighborhoods,
-            "count": len(neighborhoods),
-            "timestamp": datetime.now().isoformat()
-        }
+        snapshot = await snapshot_store.current(NEIGHBORHOODS_WITH_AQI)
+        return snapshot_response(request, snapshot)
         
     except Exception as e:
         logging.exception("Error fetching neighborhoods with AQI")
+        fallback = stale_snapshot(NEIGHBORHOODS_WITH_AQI, request, "error")
+        if fallback is not None:
+            return fallback
         raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}")
 
 if __name__ == "__main__":
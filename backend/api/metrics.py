@@ -0,0 +1,260 @@
+# metrics.py
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small registry of counters, gauges and histograms (with labels) that the
+service updates on its hot paths at the cost of a dict lookup and an add.
+Gauges can also be computed at scrape time from a callback, which is how
+data freshness is reported. MetricsMiddleware times every request by route
+template, and SamplingProfiler can be switched on at runtime to collect
+stacks from the event loop thread.
+"""
+import bisect
+import math
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+LabelValues = Tuple[str, ...]
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}" for key, value in self.values.items()]
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect  # Computes (labels, value) pairs at scrape time instead
+
+    def set(self, value: float, *labels: str):
+        self.values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+    def render(self) -> List[str]:
+        values = self.collect() if self.collect is not None else self.values.items()
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}" for key, value in values]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labels)
+        self.bounds = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self.series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.bounds) + 1), 0.0]
+        series[0][bisect.bisect_left(self.bounds, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        names = self.label_names + ("le",)
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(names, key + (format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry = Registry()
+
+cache_lookups = registry.counter(
+    "aqi_cache_lookups_total", "AQI cache lookups by zip and result (hit, stale, negative, miss)", ("zip", "result"))
+airnow_latency = registry.histogram(
+    "airnow_request_duration_seconds", "Duration of single AirNow HTTP attempts", ("outcome",), LATENCY_BUCKETS)
+airnow_fetches = registry.counter(
+    "airnow_fetches_total", "AirNow zip fetches by outcome (ok, error, timeout, circuit_open, rate_limited)", ("outcome",))
+airnow_hourly_files = registry.counter(
+    "airnow_hourly_files_total", "AirNow hourly observation file reads by outcome (ok, missing, error)", ("outcome",))
+admission_rejections = registry.counter(
+    "admission_rejections_total", "Requests not admitted by route and reason (queue_full, queue_timeout)", ("route", "reason"))
+admission_queue_time = registry.histogram(
+    "admission_queue_seconds", "Time requests waited for an admission slot", ("route",), REQUEST_BUCKETS)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request duration by route template", ("method", "route", "status"), REQUEST_BUCKETS)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled by route template", ("route",))
+
+def route_template(app, scope) -> str:
+    """Path template of the route a request will hit, to keep label cardinality bounded"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched"""
+
+    def __init__(self, app, router_app=None, max_cached_paths: int = 4096):
+        self.app = app
+        self.router_app = router_app  # The FastAPI app whose routes name the requests
+        self.max_cached_paths = max_cached_paths
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            if len(self._routes) >= self.max_cached_paths:
+                self._routes.clear()
+            route = self._routes[key] = route_template(self.router_app, scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(route)
+            http_latency.observe(time.perf_counter() - started, scope["method"], route, str(status["code"]))
+
+class SamplingProfiler:
+    """Samples one thread's stack on an interval and counts collapsed stacks (flamegraph input)"""
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.samples: StackCounter = StackCounter()
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        """Start sampling thread_id (default: the calling thread, i.e. the event loop)"""
+        with self._lock:
+            if self.running:
+                return
+            # Each run gets its own event and counter, so a sampler still winding down
+            # from a previous run can neither miss its stop nor write into this one
+            self.interval = interval
+            self.samples = StackCounter()
+            self.started_at = time.time()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop, self.samples, interval, thread_id or threading.get_ident()),
+                name="sampling-profiler", daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._stop.set()
+        thread.join()
+
+    def _run(self, stop: threading.Event, samples: StackCounter, interval: float, target: int):
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """One 'frame;frame;frame count' line per distinct stack, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+profiler = SamplingProfiler()
@@ -0,0 +1,141 @@
+# observations.py
+"""
+Compact representation of everything AirNow reports for one zip code.
+
+AirNow returns one row per pollutant (O3, PM2.5, PM10, ...) that repeats the
+same reporting-area metadata. ZipObservation stores that metadata once and
+the per-pollutant values as a tuple of small named tuples, parsed straight
+from the decoded JSON without building a pydantic model per row. It keeps
+the AirNowResponse attribute names (AQI, ParameterName, Category, ...) for
+the dominant pollutant so existing callers keep working.
+"""
+import json
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+class Reading(NamedTuple):
+    parameter: str
+    aqi: int
+    category_number: int
+    category_name: str
+
+    @property
+    def category(self) -> Dict[str, Any]:
+        return {"Number": self.category_number, "Name": self.category_name}
+
+class ZipObservation:
+    __slots__ = (
+        "date_observed", "hour_observed", "local_time_zone", "reporting_area",
+        "state_code", "latitude", "longitude", "readings",
+    )
+
+    def __init__(self, date_observed: str, hour_observed: int, local_time_zone: str, reporting_area: str,
+                 state_code: str, latitude: float, longitude: float, readings: Iterable[Reading]):
+        self.date_observed = date_observed
+        self.hour_observed = hour_observed
+        self.local_time_zone = local_time_zone
+        self.reporting_area = reporting_area
+        self.state_code = state_code
+        self.latitude = latitude
+        self.longitude = longitude
+        # Highest AQI first, so readings[0] is the dominant pollutant
+        self.readings = tuple(sorted(readings, key=lambda r: r.aqi, reverse=True))
+
+    @classmethod
+    def from_airnow(cls, rows: List[Dict[str, Any]]) -> Optional["ZipObservation"]:
+        """Parse the rows of one observation/zipCode/current response"""
+        if not rows:
+            return None
+        first = rows[0]
+        readings = {}
+        for row in rows:
+            try:
+                if row["ReportingArea"] != first["ReportingArea"]:
+                    continue
+                aqi = int(row["AQI"])
+                if aqi < 0:  # AirNow uses -1 for "no value this hour"
+                    continue
+                category = row.get("Category") or {}
+                reading = Reading(str(row["ParameterName"]), aqi, int(category.get("Number", 0)), str(category.get("Name", "")))
+            except (KeyError, TypeError, ValueError):
+                continue
+            readings[reading.parameter] = reading
+        if not readings:
+            return None
+        return cls(
+            str(first["DateObserved"]), int(first["HourObserved"]), str(first["LocalTimeZone"]),
+            str(first["ReportingArea"]), str(first["StateCode"]),
+            float(first["Latitude"]), float(first["Longitude"]), readings.values(),
+        )
+
+    @property
+    def dominant(self) -> Reading:
+        return self.readings[0]
+
+    def reading(self, parameter: str) -> Optional[Reading]:
+        for reading in self.readings:
+            if reading.parameter == parameter:
+                return reading
+        return None
+
+    def pollutants(self) -> Dict[str, Dict[str, Any]]:
+        return {r.parameter: {"aqi": r.aqi, "category": r.category} for r in self.readings}
+
+    # AirNowResponse-compatible view of the dominant pollutant
+    @property
+    def DateObserved(self) -> str:
+        return self.date_observed
+
+    @property
+    def HourObserved(self) -> int:
+        return self.hour_observed
+
+    @property
+    def LocalTimeZone(self) -> str:
+        return self.local_time_zone
+
+    @property
+    def ReportingArea(self) -> str:
+        return self.reporting_area
+
+    @property
+    def StateCode(self) -> str:
+        return self.state_code
+
+    @property
+    def Latitude(self) -> float:
+        return self.latitude
+
+    @property
+    def Longitude(self) -> float:
+        return self.longitude
+
+    @property
+    def AQI(self) -> int:
+        return self.readings[0].aqi
+
+    @property
+    def ParameterName(self) -> str:
+        return self.readings[0].parameter
+
+    @property
+    def Category(self) -> Dict[str, Any]:
+        return self.readings[0].category
+
+    def to_json(self) -> str:
+        return json.dumps([
+            self.date_observed, self.hour_observed, self.local_time_zone, self.reporting_area,
+            self.state_code, self.latitude, self.longitude, [list(r) for r in self.readings],
+        ], separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "ZipObservation":
+        date, hour, tz, area, state, lat, lon, readings = json.loads(payload)
+        return cls(date, hour, tz, area, state, lat, lon, (Reading(*r) for r in readings))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ZipObservation):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"ZipObservation({self.reporting_area!r}, {self.date_observed.strip()} {self.hour_observed}:00, {list(self.readings)!r})"
@@ -0,0 +1,151 @@
+# resilience.py
+"""
+Upstream protection for AirNow calls: a token-bucket rate limiter sized to
+the hourly API quota, a circuit breaker that fails fast while upstream is
+degraded, and hedged requests that fire a backup attempt when the first
+one runs past the recent tail latency.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open"""
+
+class RateLimitedError(Exception):
+    """Raised instead of calling upstream when the quota bucket is empty"""
+
+class TokenBucket:
+    def __init__(self, rate_per_hour: float, burst: int):
+        self.rate = rate_per_hour / 3600.0  # Tokens per second
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        """Return a token that was taken but not spent on an upstream call"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, probe_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # A probe with no outcome after this long is presumed lost and another is let through
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (half-open lets one probe through)"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            if not self._probe_in_flight or now - self._probe_started >= self.probe_timeout:
+                self._probe_in_flight = True
+                self._probe_started = now
+                return True
+        return False
+
+    def release_probe(self):
+        """End a half-open probe that finished without recording an outcome (skipped or cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logging.info("AirNow circuit breaker closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logging.warning(f"AirNow circuit breaker opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+class LatencyTracker:
+    """Recent successful latencies, used to pick the hedge delay"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float, default: float) -> float:
+        if len(self.samples) < 20:
+            return default
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    hedge_delay: float,
+    max_attempts: int = 2,
+    allow_extra: Callable[[], bool] = lambda: True,
+    retry_backoff: float = 0.2,
+) -> T:
+    """Run call(), adding attempts when one is slow or fails, and return the first success
+
+    A backup attempt starts once the running ones have taken hedge_delay, or
+    right away (after a short jittered backoff) when an attempt fails. Every
+    extra attempt must be granted by allow_extra, e.g. a rate limiter.
+    """
+    pending = {asyncio.ensure_future(call())}
+    attempts = 1
+    last_error: Optional[BaseException] = None
+    try:
+        while True:
+            can_add = attempts < max_attempts
+            done = set()
+            if pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=hedge_delay if can_add else None, return_when=asyncio.FIRST_COMPLETED
+                )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+
+            if not can_add or not allow_extra():
+                if not pending:
+                    raise last_error
+                continue
+            if done:
+                # Fast failure: retry after a short jittered pause rather than immediately
+                await asyncio.sleep(retry_backoff * random.uniform(0.5, 1.5))
+            pending.add(asyncio.ensure_future(call()))
+            attempts += 1
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,90 @@
+# responses.py
+"""
+Shared serialization and response helpers.
+
+JSON is encoded with orjson when it is installed (falling back to the
+stdlib with identical output), straight to bytes. Bodies that are served
+many times are wrapped once in CompressedBody, which keeps gzip/brotli
+variants and a strong ETag next to the raw bytes, and compressed_response()
+picks the variant the client accepts.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder produces the same compact JSON, just slower
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512  # Smaller bodies aren't worth a Content-Encoding
+
+def dumps(payload: Any) -> bytes:
+    """Compact UTF-8 JSON, the way FastAPI's JSONResponse renders it"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(); return it directly to also skip jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class CompressedBody:
+    __slots__ = ("body", "gzip", "brotli", "etag")
+
+    def __init__(self, body: bytes, gzip_level: int = 9, brotli_quality: int = 11):
+        self.body = body
+        compress = len(body) >= MIN_COMPRESS_SIZE
+        self.gzip = gzip.compress(body, compresslevel=gzip_level) if compress else None
+        self.brotli = brotli.compress(body, quality=brotli_quality) if compress and brotli is not None else None
+        self.etag = make_etag(body)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for token in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = token.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.strip().lower())
+    return encodings
+
+def compressed_response(request: Request, variant: CompressedBody, cache_control: str,
+                        media_type: str = "application/json", headers: Optional[dict] = None) -> Response:
+    """Pick the best precompressed body for the client and honor If-None-Match"""
+    encodings = accepted_encodings(request)
+    if variant.brotli is not None and "br" in encodings:
+        body, encoding = variant.brotli, "br"
+    elif variant.gzip is not None and "gzip" in encodings:
+        body, encoding = variant.gzip, "gzip"
+    else:
+        body, encoding = variant.body, None
+
+    # Each representation needs its own strong validator
+    etag = variant.etag if encoding is None else f'{variant.etag[:-1]}-{encoding}"'
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
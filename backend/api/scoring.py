@@ -0,0 +1,208 @@
+# scoring.py
+"""
+Environmental scores and a maintained ranking of neighborhoods.
+
+The overall score is a weighted mean of three 0-100 sub-scores: air
+(100 - AQI), water and hazards. Each water and hazard metric is mapped
+linearly from its "good" bound (100) to its "bad" bound (0) and the metrics
+are averaged. Missing inputs drop out and the remaining weights are
+renormalized. Scores are computed as array operations over many
+neighborhoods at once; when observations change, only the affected rows
+are rescored and moved within Ranking, which keeps keys sorted so top-k is
+a slice and a rank lookup is a binary search.
+"""
+import bisect
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+PH_TARGET = 7.5
+# metric, good, bad (pH is scored by its distance from PH_TARGET)
+WATER_METRICS = (
+    ("ph", 0.0, 1.5),
+    ("turbidity", 0.1, 5.0),  # NTU
+    ("dissolved_oxygen", 10.0, 4.0),  # mg/L
+    ("bacteria_count", 0.0, 200.0),  # CFU/100mL
+    ("lead_level", 0.0, 0.015),  # mg/L, the EPA action level
+)
+HAZARD_METRICS = (
+    ("noise_level", 45.0, 85.0),  # dB
+    ("traffic_density", 1.0, 10.0),
+    ("industrial_proximity", 1.0, 10.0),
+    ("green_space_percentage", 45.0, 5.0),
+    ("flood_risk", 1.0, 10.0),
+    ("heat_island_effect", 1.0, 10.0),
+)
+
+class ScoreWeights(NamedTuple):
+    air: float = 1.0
+    water: float = 0.0
+    hazards: float = 0.0
+
+    def validate(self) -> "ScoreWeights":
+        if min(self) < 0 or sum(self) <= 0:
+            raise ValueError(f"Score weights must be non-negative with a positive sum, got {self._asdict()}")
+        return self
+
+def metric_matrix(records: Sequence[Optional[Mapping[str, float]]], metrics) -> np.ndarray:
+    """rows x metrics array of raw values, NaN where a record lacks a metric"""
+    values = np.full((len(records), len(metrics)), np.nan)
+    for i, record in enumerate(records):
+        if not record:
+            continue
+        for j, (name, _, _) in enumerate(metrics):
+            value = record.get(name)
+            if isinstance(value, (int, float)):
+                values[i, j] = abs(value - PH_TARGET) if name == "ph" else value
+    return values
+
+def metric_scores(values: np.ndarray, metrics) -> np.ndarray:
+    """0-100 per row: the mean of each metric's position between its bad and good bounds"""
+    good = np.array([metric[1] for metric in metrics])
+    bad = np.array([metric[2] for metric in metrics])
+    scaled = np.clip((values - bad) / (good - bad), 0.0, 1.0) * 100
+    valid = ~np.isnan(scaled)
+    count = valid.sum(axis=1)
+    total = np.where(valid, scaled, 0.0).sum(axis=1)
+    return np.divide(total, count, out=np.full(len(values), np.nan), where=count > 0)
+
+def air_scores(aqi: np.ndarray) -> np.ndarray:
+    return np.clip(100.0 - aqi, 0.0, 100.0)
+
+def combine(air: np.ndarray, water: np.ndarray, hazards: np.ndarray, weights: ScoreWeights) -> np.ndarray:
+    """Weighted mean of the available sub-scores per row (NaN if none), to one decimal"""
+    parts = np.stack([air, water, hazards], axis=1)
+    w = np.broadcast_to(np.asarray(weights, dtype=np.float64), parts.shape)
+    w = np.where(np.isnan(parts) | (w == 0), 0.0, w)
+    total = w.sum(axis=1)
+    weighted = (np.where(np.isnan(parts), 0.0, parts) * w).sum(axis=1)
+    return np.round(np.divide(weighted, total, out=np.full(len(parts), np.nan), where=total > 0), 1)
+
+class Ranking:
+    """Keys ordered by descending score (ties by key); top-k is O(k), rank is O(log n)"""
+
+    def __init__(self):
+        self._order: List[Tuple[float, str]] = []  # (-score, key), ascending
+        self._scores: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._scores
+
+    def score(self, key: str) -> Optional[float]:
+        return self._scores.get(key)
+
+    def set(self, key: str, score: float):
+        old = self._scores.get(key)
+        if old is not None:
+            if old == score:
+                return
+            del self._order[bisect.bisect_left(self._order, (-old, key))]
+        bisect.insort(self._order, (-score, key))
+        self._scores[key] = score
+
+    def remove(self, key: str):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, (-old, key))]
+
+    def rebuild(self, scores: Mapping[str, float]):
+        """Replace everything with one sort, e.g. on first load"""
+        self._scores = dict(scores)
+        self._order = sorted((-score, key) for key, score in self._scores.items())
+
+    def rank(self, key: str) -> Optional[int]:
+        """1-based position, or None if the key is not ranked"""
+        score = self._scores.get(key)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._order, (-score, key)) + 1
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        return [(key, -negated) for negated, key in self._order[:k]]
+
+class NeighborhoodScores:
+    """Per-neighborhood inputs and scores as arrays, with the ranking kept in step"""
+
+    def __init__(self, weights: ScoreWeights = ScoreWeights(), water: Optional[Mapping[str, float]] = None,
+                 hazards: Optional[Mapping[str, float]] = None):
+        self.weights = weights.validate()
+        self.default_water = water  # Metrics for neighborhoods without their own
+        self.default_hazards = hazards
+        self.names: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.aqi = np.empty(0)  # NaN: no current observation
+        self.water = np.empty(0)  # Sub-scores, recomputed only when metrics are set
+        self.hazards = np.empty(0)
+        self.scores = np.empty(0)
+        self.ranking = Ranking()
+
+    def _add(self, names: Iterable[str]):
+        new = [name for name in dict.fromkeys(names) if name not in self.rows]
+        if not new:
+            return
+        for name in new:
+            self.rows[name] = len(self.names)
+            self.names.append(name)
+        water = metric_scores(metric_matrix([self.default_water] * len(new), WATER_METRICS), WATER_METRICS)
+        hazards = metric_scores(metric_matrix([self.default_hazards] * len(new), HAZARD_METRICS), HAZARD_METRICS)
+        self.aqi = np.concatenate([self.aqi, np.full(len(new), np.nan)])
+        self.water = np.concatenate([self.water, water])
+        self.hazards = np.concatenate([self.hazards, hazards])
+        self.scores = np.concatenate([self.scores, np.full(len(new), np.nan)])
+
+    def _rescore(self, rows: np.ndarray):
+        if not len(rows):
+            return
+        scores = combine(air_scores(self.aqi[rows]), self.water[rows], self.hazards[rows], self.weights)
+        self.scores[rows] = scores
+        if len(rows) * 8 > len(self.names):
+            # A large share of the table changed: one sort beats that many insertions
+            self.ranking.rebuild(self.current())
+            return
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if np.isnan(score):
+                self.ranking.remove(self.names[row])
+            else:
+                self.ranking.set(self.names[row], score)
+
+    def update(self, aqi: Mapping[str, float], replace: bool = True) -> np.ndarray:
+        """Apply new AQI values and rescore only the rows whose value changed
+
+        With replace, neighborhoods missing from `aqi` lose their score and
+        leave the ranking; otherwise they keep their last value. Returns the
+        changed rows.
+        """
+        self._add(aqi)
+        new = np.full(len(self.names), np.nan) if replace else self.aqi.copy()
+        for name, value in aqi.items():
+            new[self.rows[name]] = value
+        changed = np.flatnonzero(~((new == self.aqi) | (np.isnan(new) & np.isnan(self.aqi))))
+        self.aqi[changed] = new[changed]
+        self._rescore(changed)
+        return changed
+
+    def set_metrics(self, water: Optional[Mapping[str, Mapping[str, float]]] = None,
+                    hazards: Optional[Mapping[str, Mapping[str, float]]] = None):
+        """Per-neighborhood water and hazard metrics (name -> metric -> value), rescoring those rows"""
+        water, hazards = water or {}, hazards or {}
+        self._add(list(water) + list(hazards))
+        for values, metrics, target in ((water, WATER_METRICS, self.water), (hazards, HAZARD_METRICS, self.hazards)):
+            if values:
+                rows = np.array([self.rows[name] for name in values])
+                target[rows] = metric_scores(metric_matrix(list(values.values()), metrics), metrics)
+        self._rescore(np.array(sorted({self.rows[name] for name in list(water) + list(hazards)}), dtype=np.int64))
+
+    def set_weights(self, weights: ScoreWeights):
+        """New weights change every score: one batch recompute and one sort"""
+        self.weights = weights.validate()
+        self.scores = combine(air_scores(self.aqi), self.water, self.hazards, self.weights)
+        self.ranking.rebuild({
+            name: score for name, score in zip(self.names, self.scores.tolist()) if not np.isnan(score)
+        })
+
+    def current(self) -> Dict[str, float]:
+        """name -> score for every scored neighborhood"""
+        return {name: score for name, score in zip(self.names, self.scores.tolist()) if not np.isnan(score)}
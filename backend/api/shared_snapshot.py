@@ -0,0 +1,198 @@
+# shared_snapshot.py
+"""
+AQI observations shared between worker processes through a memory-mapped file.
+
+With several uvicorn/gunicorn workers, one of them is elected refresher by
+holding an exclusive flock on a lock file next to the snapshot. Only that
+worker calls AirNow; after each refresh it writes every cached observation
+into the mapped file under a seqlock (the version is odd while a write is in
+progress). The other workers poll the version, which costs one read of
+the header, and only when it changes parse the payload straight out of the
+mapping, check the version again and load the entries into their own cache.
+Nobody takes a lock to read. The kernel drops the flock when the refresher
+exits or dies, and the next worker to try it takes over upstream fetching.
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Shared snapshots need POSIX file locks
+    fcntl = None
+
+from observations import ZipObservation
+from responses import dumps, orjson
+
+MAGIC = b"AQIS"
+LAYOUT_VERSION = 1
+# magic, layout version, seq, payload length, written at, writer pid
+HEADER = struct.Struct("<4sHxxQIdI")
+SEQ_OFFSET = 8  # Offset of seq within HEADER
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+class SharedSnapshotFile:
+    """A seqlock-protected payload in a fixed-size mapped file"""
+
+    def __init__(self, path: Path, size: int = 1 << 20):
+        self.path = Path(path)
+        self.size = size
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    def open(self):
+        if self._map is not None:
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, "r+b")
+        if os.fstat(fd).st_size < self.size:
+            self._file.truncate(self.size)
+        self._map = mmap.mmap(fd, self.size)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def _seq(self) -> int:
+        return struct.unpack_from("<Q", self._map, SEQ_OFFSET)[0]
+
+    @property
+    def version(self) -> int:
+        """Current seq; even when no write is in progress"""
+        magic = self._map[:4]
+        return self._seq() if magic == MAGIC else 0
+
+    def write(self, payload: bytes):
+        """Publish payload; only the elected refresher calls this"""
+        if HEADER.size + len(payload) > self.size:
+            raise ValueError(f"Shared snapshot payload of {len(payload)} bytes exceeds {self.size - HEADER.size}")
+        seq = self.version
+        seq += seq % 2  # Recover from a writer that died mid-write
+        struct.pack_into("<Q", self._map, SEQ_OFFSET, seq + 1)  # Odd: readers back off
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, seq + 1, len(payload), time.time(), os.getpid())
+        struct.pack_into("<Q", self._map, SEQ_OFFSET, seq + 2)
+
+    def read(self, after: int = 0, attempts: int = 20) -> Optional[Tuple[int, Any, float]]:
+        """(seq, parsed payload, written_at) if a complete payload other than version `after` exists"""
+        for _ in range(attempts):
+            magic, layout, seq, length, written_at, _ = HEADER.unpack_from(self._map, 0)
+            # Compared for inequality: a recreated file restarts from a lower seq
+            if magic != MAGIC or layout != LAYOUT_VERSION or seq == after:
+                return None
+            if seq % 2:
+                time.sleep(0.0001)  # Writes take microseconds
+                continue
+            try:
+                # Parsed straight from the mapping; a concurrent write is caught by the seq check below
+                payload = loads(memoryview(self._map)[HEADER.size:HEADER.size + length])
+            except ValueError:
+                payload = None
+            if self._seq() == seq and payload is not None:
+                return seq, payload, written_at
+        return None
+
+class SharedSnapshotCoordinator:
+    """Elects one upstream refresher among workers and syncs the others from its snapshot"""
+
+    def __init__(self, path: Path, service, snapshot_store, check_interval: float = 1.0, size: int = 1 << 20):
+        if fcntl is None:
+            raise RuntimeError("Shared AQI snapshots require fcntl (POSIX)")
+        self.file = SharedSnapshotFile(path, size)
+        self.lock_path = Path(f"{path}.lock")
+        self.service = service
+        self.snapshot_store = snapshot_store
+        self.check_interval = check_interval
+        self.is_leader = False
+        self.version = 0
+        self._lock_fd: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def try_lead(self) -> bool:
+        """Take the refresher role if no live worker holds it"""
+        if self.is_leader:
+            return True
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.is_leader = True
+        self.service.upstream_enabled = True
+        logging.info(f"Worker {os.getpid()} is the AQI refresher for {self.file.path}")
+        return True
+
+    def publish(self, aqi_data: Dict[str, Any] = None):
+        """Snapshot listener: the refresher shares its cache after every refresh"""
+        if not self.is_leader:
+            return
+        entries = {
+            zip_code: [entry.value.to_json(), entry.fetched_at, entry.fresh_until, entry.stale_until]
+            for zip_code, entry in self.service.cache.items()
+            if entry.value is not None
+        }
+        self.file.write(dumps(entries))
+        self.version = self.file.version
+
+    def sync(self) -> bool:
+        """Load a newer shared snapshot into the local cache; True if anything changed"""
+        result = self.file.read(after=self.version)
+        if result is None:
+            return False
+        self.version, entries, _ = result
+        changed = False
+        for zip_code, (payload, fetched_at, fresh_until, stale_until) in entries.items():
+            current = self.service.cache.get(zip_code)
+            if current is not None and current.fetched_at >= fetched_at:
+                continue
+            self.service.apply_shared(zip_code, ZipObservation.from_json(payload), fetched_at, fresh_until, stale_until)
+            changed = True
+        return changed
+
+    async def start(self):
+        self.file.open()
+        if not self.try_lead():
+            self.service.upstream_enabled = False
+            self.sync()  # Warm start from whatever the refresher last wrote
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                if self.is_leader:
+                    continue
+                if self.try_lead():
+                    # Failover: the previous refresher is gone, refresh now rather than at the next tick
+                    await self.snapshot_store.refresh()
+                elif self.sync():
+                    await self.snapshot_store.refresh()
+            except Exception:
+                logging.exception("Shared AQI snapshot sync failed")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # Releases the flock, letting another worker take over
+            self._lock_fd = None
+            self.is_leader = False
+        self.file.close()
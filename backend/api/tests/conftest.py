@@ -0,0 +1,8 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# The API modules are flat files in backend/api (and backend/api/firebase), imported by name
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR / "firebase"))
+sys.path.insert(0, str(API_DIR))
@@ -0,0 +1,118 @@
+# tests/firestore_stub.py
+"""
+In-memory stand-in for the parts of the Firestore client the migration
+scripts use: collections, documents, field selection, simple where filters
+and write batches. Batches enforce Firestore's 500-write limit and record
+every commit; every streamed document counts as a read.
+"""
+import copy
+import operator
+import threading
+from typing import Any, Dict, List, Optional
+
+BATCH_LIMIT = 500
+OPERATORS = {"==": operator.eq, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+def _select(data: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Copy of data holding only the given (dotted) field paths"""
+    selected: Dict[str, Any] = {}
+    for path in fields:
+        source, target = data, selected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = copy.deepcopy(source[parts[-1]])
+    return selected
+
+class DocumentSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+class DocumentReference:
+    def __init__(self, client: "FakeFirestore", collection: str, doc_id: str):
+        self._client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data: Dict[str, Any]):
+        self._client._write(self.collection, self.id, data)
+
+    def get(self) -> DocumentSnapshot:
+        return DocumentSnapshot(self.id, self._client.documents(self.collection).get(self.id))
+
+class Query:
+    def __init__(self, client: "FakeFirestore", collection: str, fields: Optional[List[str]] = None, filters=()):
+        self._client = client
+        self._collection = collection
+        self._fields = fields
+        self._filters = tuple(filters)
+
+    def select(self, fields: List[str]) -> "Query":
+        return Query(self._client, self._collection, list(fields), self._filters)
+
+    def where(self, field: str, op: str, value: Any) -> "Query":
+        return Query(self._client, self._collection, self._fields, self._filters + ((field, OPERATORS[op], value),))
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        # Like Firestore, a filter never matches a document that lacks the field
+        return all(field in data and compare(data[field], value) for field, compare, value in self._filters)
+
+    def stream(self):
+        for doc_id, data in sorted(self._client.documents(self._collection).items()):
+            if not self._matches(data):
+                continue
+            self._client.reads += 1
+            yield DocumentSnapshot(doc_id, data if self._fields is None else _select(data, self._fields))
+
+class CollectionReference(Query):
+    def document(self, doc_id: str) -> DocumentReference:
+        return DocumentReference(self._client, self._collection, doc_id)
+
+class WriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref: DocumentReference, data: Dict[str, Any]):
+        if len(self._writes) >= BATCH_LIMIT:
+            raise ValueError(f"A batch holds at most {BATCH_LIMIT} writes")
+        self._writes.append((ref, copy.deepcopy(data)))
+
+    def commit(self):
+        with self._client._lock:
+            self._client.commits.append(len(self._writes))
+            for ref, data in self._writes:
+                self._client._collections.setdefault(ref.collection, {})[ref.id] = data
+
+class FakeFirestore:
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()  # Batches are committed from worker threads
+        self.commits: List[int] = []  # Writes in each committed batch, in commit order
+        self.reads = 0  # Documents returned by queries
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def documents(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        return self._collections.get(collection, {})
+
+    def _write(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        with self._lock:
+            self._collections.setdefault(collection, {})[doc_id] = copy.deepcopy(data)
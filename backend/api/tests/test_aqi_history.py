@@ -0,0 +1,102 @@
+# tests/test_aqi_history.py
+import asyncio
+import time
+
+import numpy as np
+
+from aqi_history import HistoryStore, aggregate
+from aqi_store import ObservationStore
+
+HOUR = 3600
+
+def test_aggregate_skips_empty_buckets():
+    times = np.array([0, HOUR, 5 * HOUR, 6 * HOUR], dtype=np.int64)
+    values = np.array([10, 20, 30, 50], dtype=np.float32)
+    result = aggregate(times, values, start=0, bucket=2 * HOUR)
+    # Buckets [0, 2h) and [4h, 6h) and [6h, 8h); nothing is emitted for the empty [2h, 4h)
+    assert result == {
+        "time": [0, 4 * HOUR, 6 * HOUR],
+        "min": [10, 30, 50],
+        "mean": [15, 30, 50],
+        "max": [20, 30, 50],
+        "count": [2, 1, 1],
+    }
+
+def test_aggregate_of_nothing():
+    empty = aggregate(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), start=0, bucket=HOUR)
+    assert empty == {"time": [], "min": [], "mean": [], "max": [], "count": []}
+
+def test_query_range_edges():
+    history = HistoryStore()
+    for hour in range(10):
+        history.record("02134", "O3", hour * HOUR, hour)
+
+    # start is inclusive and end exclusive
+    result = history.query("02134", "O3", 2 * HOUR, 5 * HOUR, HOUR)
+    assert result["time"] == [2 * HOUR, 3 * HOUR, 4 * HOUR]
+    assert result["max"] == [2, 3, 4]
+    # Buckets align to multiples of the bucket size, not to start
+    result = history.query("02134", "O3", HOUR, 10 * HOUR, 4 * HOUR)
+    assert result["time"] == [0, 4 * HOUR, 8 * HOUR]
+    assert result["count"] == [3, 4, 2]
+    assert history.query("02134", "O3", 10 * HOUR, 20 * HOUR, HOUR)["count"] == []
+    assert history.query("02134", "PM2.5", 0, 20 * HOUR, HOUR)["count"] == []
+
+def test_load_merges_with_points_already_in_memory():
+    history = HistoryStore()
+    history.record("02134", "O3", 3 * HOUR, 99)
+    history.load("02134", "O3", np.array([0, HOUR, 3 * HOUR], dtype=np.int64), np.array([1, 2, 3], dtype=np.float32))
+    history.record("02134", "O3", 4 * HOUR, 4)
+    assert history.query("02134", "O3", 0, 10 * HOUR, HOUR)["max"] == [1, 2, 99, 4]
+
+def test_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "aqi.db")
+    now = int(time.time()) // HOUR * HOUR
+    old = now - 40 * 86400
+
+    async def write():
+        store = ObservationStore(path)
+        await store.open()
+        store.put_history([("02134", "O3", old, 30), ("02134", "O3", now, 40), ("02134", "O3", now + HOUR, 41)])
+        store.put_history([("02134", "O3", now + HOUR, 42), ("02134", "PM2.5", now, 12)])
+        await store.close()
+
+    async def read():
+        # Reopened with a 30 day retention: the 40 day old point is compacted away
+        store = ObservationStore(path, history_retention=30 * 86400)
+        await store.open()
+        try:
+            return await store.load_history()
+        finally:
+            await store.close()
+
+    asyncio.run(write())
+    history = HistoryStore()
+    for zip_code, parameter, times, values in asyncio.run(read()):
+        history.load(zip_code, parameter, times, values)
+    assert history.parameters("02134") == ["O3", "PM2.5"]
+    assert history.query("02134", "O3", old, now + 2 * HOUR, HOUR)["max"] == [40, 42]
+
+def test_service_reloads_fetched_history(monkeypatch, tmp_path):
+    from airnow_service import AirNowService
+    from observations import Reading, ZipObservation
+    monkeypatch.setenv("AQI_CACHE_DB", str(tmp_path / "aqi.db"))
+    today = time.strftime("%Y-%m-%d", time.gmtime())
+    observation = ZipObservation(today, 0, "UTC", "Boston", "MA", 42.35, -71.06,
+                                 [Reading("O3", 40, 1, "Good"), Reading("PM2.5", 12, 1, "Good")])
+
+    async def fetch_then_restart():
+        service = AirNowService()
+        await service.load_store()
+        service.store_observation("02134", observation)
+        await service.close()
+
+        restarted = AirNowService()
+        await restarted.load_store()
+        await restarted.history_ready()
+        await restarted.close()
+        return restarted.history
+
+    history = asyncio.run(fetch_then_restart())
+    assert history.parameters("02134") == ["O3", "PM2.5"]
+    assert history.query("02134", "PM2.5", 0, 2 ** 40, 86400)["max"] == [12]
@@ -0,0 +1,84 @@
+# tests/test_aqi_snapshot.py
+import asyncio
+import json
+
+from aqi_snapshot import AQISnapshotStore, BOSTON, NEIGHBORHOODS_WITH_AQI
+from observations import Reading, ZipObservation
+
+def observation(aqi, hour=9):
+    return ZipObservation("2024-06-01 ", hour, "EST", "Boston", "MA", 42.35, -71.06, [Reading("O3", aqi, 1, "Good")])
+
+class FakeService:
+    def __init__(self, data):
+        self.data = data
+
+    async def get_all_boston_aqi(self):
+        return dict(self.data)
+
+def payloads(store):
+    async def run():
+        await store.refresh()
+        return {name: json.loads(store.last(name).body) for name in (BOSTON, NEIGHBORHOODS_WITH_AQI)}
+    return asyncio.run(run())
+
+def delta(store, since):
+    return json.loads(asyncio.run(store.delta(since)).body)
+
+def test_hour_only_change_bumps_every_body_and_the_delta():
+    service = FakeService({"Allston": observation(40), "Back Bay": observation(45)})
+    store = AQISnapshotStore(service, interval=0)
+    first = payloads(store)
+    version = first[BOSTON]["version"]
+    assert first[NEIGHBORHOODS_WITH_AQI]["version"] == version
+
+    service.data["Allston"] = observation(40, hour=10)
+    second = payloads(store)
+    assert second[BOSTON]["version"] == second[NEIGHBORHOODS_WITH_AQI]["version"] == version + 1
+    changes = delta(store, version)
+    assert changes["version"] == version + 1
+    assert list(changes["neighborhoods"]) == ["Allston"]
+
+def test_unchanged_refresh_keeps_bodies_and_etags():
+    service = FakeService({"Allston": observation(40)})
+    store = AQISnapshotStore(service, interval=0)
+    payloads(store)
+    etags = {name: store.last(name).etag for name in (BOSTON, NEIGHBORHOODS_WITH_AQI)}
+
+    payloads(store)
+    assert {name: store.last(name).etag for name in etags} == etags
+    store.clear()
+    payloads(store)
+    assert {name: store.last(name).etag for name in etags} == etags
+
+def test_removed_neighborhood_is_reported_once():
+    service = FakeService({"Allston": observation(40), "Back Bay": observation(45)})
+    store = AQISnapshotStore(service, interval=0)
+    version = payloads(store)[BOSTON]["version"]
+
+    del service.data["Back Bay"]
+    payloads(store)
+    changes = delta(store, version)
+    assert changes["neighborhoods"] == {} and changes["removed"] == ["Back Bay"]
+    assert delta(store, changes["version"])["removed"] == []
+    assert "since" not in delta(store, store.first_version - 1)  # Not a version this store issued: full body
+
+def test_overall_score_is_a_whole_number():
+    service = FakeService({"Allston": observation(42)})
+    store = AQISnapshotStore(service, interval=0)
+    neighborhood = payloads(store)[NEIGHBORHOODS_WITH_AQI]["neighborhoods"][0]
+    score = neighborhood["environmental_data"]["overall_score"]
+    assert score == 58 and isinstance(score, int)
+
+def test_listeners_only_wake_on_a_new_version():
+    service = FakeService({"Allston": observation(40)})
+    store = AQISnapshotStore(service, interval=0)
+    changes, refreshes = [], []
+    store.add_listener(changes.append)
+    store.add_listener(refreshes.append, changes_only=False)
+
+    payloads(store)
+    payloads(store)
+    assert len(changes) == 1 and len(refreshes) == 2
+    service.data["Allston"] = observation(41)
+    payloads(store)
+    assert len(changes) == 2 and len(refreshes) == 3
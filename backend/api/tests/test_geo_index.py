@@ -0,0 +1,51 @@
+# tests/test_geo_index.py
+import asyncio
+
+from airnow_service import AirNowService
+from geo_index import NeighborhoodIndex
+from observations import Reading, ZipObservation
+
+OBSERVATION = ZipObservation("2024-06-01 ", 9, "EST", "Boston", "MA", 42.35, -71.06, [Reading("O3", 42, 1, "Good")])
+
+def test_every_indexed_polygon_resolves_to_aqi(monkeypatch):
+    monkeypatch.delenv("AIRNOW_ZIP_CODES_PATH", raising=False)
+    monkeypatch.delenv("AQI_CACHE_DB", raising=False)
+    service = AirNowService()
+    requested = []
+
+    async def get_aqi_for_zip(zip_code):
+        requested.append(zip_code)
+        return OBSERVATION
+    service.get_aqi_for_zip = get_aqi_for_zip
+
+    index = NeighborhoodIndex()
+    names = index.names()
+    assert len(names) == 26
+    for name in names:
+        assert asyncio.run(service.get_aqi_by_neighborhood(name)) is OBSERVATION, name
+    assert len(requested) == len(names)
+
+def test_central_boston_point():
+    assert NeighborhoodIndex().locate(-71.058, 42.357) == "Downtown"
+
+def test_point_admission_waits_for_the_index_and_locates_once(monkeypatch):
+    import os
+    from starlette.requests import Request
+    monkeypatch.setenv("DOTENV_PATH", os.devnull)
+    import main
+
+    index = NeighborhoodIndex()
+    calls = []
+    locate = index.locate
+    monkeypatch.setattr(index, "locate", lambda lon, lat: calls.append((lon, lat)) or locate(lon, lat))
+    monkeypatch.setattr(main, "neighborhood_index", index)
+    request = Request({"type": "http", "query_string": b"lat=42.357&lon=-71.058", "headers": []})
+
+    # Not loaded yet: admission falls back to defaults instead of parsing the GeoJSON on the loop
+    assert main.point_neighborhood(request) is None
+    assert not index.loaded and not calls
+
+    asyncio.run(main.load_neighborhood_index())
+    assert main.point_neighborhood(request) == "Downtown"
+    assert main.located_neighborhood(request, -71.058, 42.357) == "Downtown"
+    assert len(calls) == 1
@@ -0,0 +1,83 @@
+# tests/test_hourly_ingest.py
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from hourly_ingest import DirectoryHourlySource, HourlyIngestor, NearestSiteIndex, POLLUTANTS, parse_sites
+
+FIXTURES = Path(__file__).parent / "fixtures" / "hourly"
+HOUR = datetime(2024, 6, 1, 13, tzinfo=timezone.utc)
+# zip -> (lon, lat); the last one has no monitor within 40 km
+LOCATIONS = {"02119": (-71.085, 42.325), "02134": (-71.130, 42.355), "12207": (-73.750, 42.650)}
+
+def load_sites():
+    return asyncio.run(parse_sites(DirectoryHourlySource(FIXTURES).chunks(HOUR, lines_per_chunk=2)))
+
+def pollutant(name):
+    return [parameter for _, parameter in POLLUTANTS].index(name)
+
+class FakeCache:
+    def __init__(self):
+        self.failures = []
+
+    def set_failure(self, zip_code):
+        self.failures.append(zip_code)
+
+class FakeService:
+    def __init__(self):
+        self.cache = FakeCache()
+        self.observations = {}
+
+    def store_observation(self, zip_code, observation):
+        self.observations[zip_code] = observation
+
+def test_directory_source_lists_fixture_hours():
+    assert DirectoryHourlySource(FIXTURES).candidates(datetime.now(timezone.utc)) == [HOUR]
+
+def test_parse_sites_keeps_active_sites_with_readings():
+    sites = load_sites()
+    assert sites.ids == ["250250042", "250250002", "250092006", "360610135"]
+    assert sites.areas[2] == "North Shore"
+    assert sites.aqi[0].tolist() == [38, 52, -1, -1]
+    assert set(sites.observed.tolist()) == {HOUR.timestamp()}
+
+def test_nearest_site_supplies_each_pollutant():
+    sites = load_sites()
+    index = NearestSiteIndex(LOCATIONS, max_distance_km=40)
+    rows, aqi = index.assign(sites)
+
+    roxbury = index.keys.index("02119")
+    assert aqi[roxbury, pollutant("O3")] == 38
+    assert aqi[roxbury, pollutant("PM2.5")] == 52
+    assert aqi[roxbury, pollutant("PM10")] == 21
+    assert sites.ids[rows[roxbury, pollutant("NO2")]] == "250250002"
+
+    far = index.keys.index("12207")
+    assert (rows[far] == -1).all() and (aqi[far] == -1).all()
+
+def test_empty_locations_and_empty_file():
+    sites = load_sites()
+    rows, aqi = NearestSiteIndex({}).assign(sites)
+    assert rows.shape == aqi.shape == (0, len(POLLUTANTS))
+
+    empty = asyncio.run(parse_sites(_lines([])))
+    rows, aqi = NearestSiteIndex(LOCATIONS).assign(empty)
+    assert (rows == -1).all() and rows.shape == (len(LOCATIONS), len(POLLUTANTS))
+
+async def _lines(lines):
+    yield lines
+
+def test_ingestor_fills_every_zip_from_the_fixture():
+    service = FakeService()
+    ingestor = HourlyIngestor(service, DirectoryHourlySource(FIXTURES), lambda: LOCATIONS)
+    asyncio.run(ingestor.refresh())
+
+    assert ingestor.hour == HOUR
+    assert sorted(service.observations) == ["02119", "02134"]
+    assert service.cache.failures == ["12207"]
+    observation = service.observations["02119"]
+    assert (observation.AQI, observation.ParameterName) == (52, "PM2.5")
+    assert (observation.DateObserved, observation.HourObserved, observation.LocalTimeZone) == ("2024-06-01 ", 8, "EST")
+    assert np.isclose(observation.Latitude, 42.3295)
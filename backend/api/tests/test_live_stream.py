@@ -0,0 +1,43 @@
+# tests/test_live_stream.py
+import asyncio
+
+import live_stream
+from live_stream import AQIBroadcaster
+
+def first_frame(broadcaster: AQIBroadcaster, last_event_id=None) -> bytes:
+    async def run():
+        stream = broadcaster.stream(last_event_id)
+        try:
+            return await stream.__anext__()
+        finally:
+            await stream.aclose()
+    return asyncio.run(run())
+
+def make_broadcaster() -> AQIBroadcaster:
+    return AQIBroadcaster(formatter=lambda data: {"aqi": data})
+
+def test_resume_replays_missed_events():
+    broadcaster = make_broadcaster()
+    broadcaster.publish({"Allston": 40})
+    resume_from = broadcaster.last_id
+    broadcaster.publish({"Allston": 41})
+
+    frame = first_frame(broadcaster, resume_from)
+    assert frame.startswith(f"id: {broadcaster.last_id}\nevent: update".encode())
+    assert b'"Allston":{"aqi":41}' in frame
+
+def test_id_from_before_restart_gets_snapshot(monkeypatch):
+    old = make_broadcaster()
+    for aqi in range(40, 45):
+        old.publish({"Allston": aqi})
+    stale_id = old.first_id + 1  # The client saw only the first event
+
+    # The new process starts later and publishes a couple of unrelated events
+    monkeypatch.setattr(live_stream.time, "time", lambda: old.first_id + 60)
+    new = make_broadcaster()
+    new.publish({"Back Bay": 30})
+    new.publish({"Back Bay": 31})
+
+    frame = first_frame(new, stale_id)
+    assert frame.startswith(f"id: {new.last_id}\nevent: snapshot".encode())
+    assert first_frame(new, new.last_id + 5).startswith(b"id: %d\nevent: snapshot" % new.last_id)
@@ -0,0 +1,55 @@
+# tests/test_metrics.py
+import threading
+
+import metrics
+from metrics import SamplingProfiler
+
+def test_stop_and_start():
+    profiler = SamplingProfiler()
+    profiler.start(interval=0.001)
+    assert profiler.running
+    profiler.stop()
+    assert not profiler.running
+    profiler.stop()  # Nothing left to stop
+
+def test_start_while_previous_run_is_joining(monkeypatch):
+    sampling, release = threading.Event(), threading.Event()
+
+    class BlockingSys:
+        # Holds the sampler mid-sample (not waiting on its stop event) until released
+        @staticmethod
+        def _current_frames():
+            sampling.set()
+            release.wait()
+            return {}
+    monkeypatch.setattr(metrics, "sys", BlockingSys)
+
+    profiler = SamplingProfiler()
+    profiler.start(interval=0.001)
+    assert sampling.wait(2)
+    old = profiler._thread
+    join = old.join
+
+    # stop() has detached the old sampler but not joined it yet when the next start() arrives
+    def start_then_join(timeout=None):
+        profiler.start(interval=0.001)
+        release.set()
+        join(timeout=2)
+    old.join = start_then_join
+    profiler.stop()
+
+    assert not old.is_alive()
+    assert profiler.running and profiler._thread is not old
+    profiler.stop()
+    assert not profiler.running
+
+def test_concurrent_stops_join_once():
+    profiler = SamplingProfiler()
+    profiler.start(interval=0.001)
+    stoppers = [threading.Thread(target=profiler.stop) for _ in range(4)]
+    for stopper in stoppers:
+        stopper.start()
+    for stopper in stoppers:
+        stopper.join(timeout=2)
+    assert not any(stopper.is_alive() for stopper in stoppers)
+    assert not profiler.running
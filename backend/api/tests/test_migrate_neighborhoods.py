@@ -0,0 +1,77 @@
+# tests/test_migrate_neighborhoods.py
+import json
+
+from firestore_stub import FakeFirestore
+from migrate_neighborhoods import content_hash, iter_features, migrate_neighborhoods
+
+def feature(name, offset=0.0):
+    ring = [[-71.0 + offset, 42.3], [-71.1 + offset, 42.3], [-71.1 + offset, 42.4], [-71.0 + offset, 42.3]]
+    return {"type": "Feature", "properties": {"name": name}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+def write_collection(path, features, **members):
+    path.write_text(json.dumps({"type": "FeatureCollection", **members, "features": features}), encoding="utf-8")
+    return path
+
+def test_iter_features_matches_json_load_across_chunks(tmp_path):
+    features = [feature(f"Area {i}", i / 100) for i in range(40)]
+    path = write_collection(tmp_path / "areas.json", features)
+    assert list(iter_features(path, chunk_size=7)) == features
+
+def test_iter_features_only_reads_top_level_array(tmp_path):
+    features = [feature("Allston"), feature("Back Bay", 0.1)]
+    features[0]["properties"]["features"] = ["not", "these"]
+    path = write_collection(
+        tmp_path / "areas.json",
+        features,
+        crs={"type": "name", "features": [{"type": "Feature"}]},
+        bbox=[-71.19, 42.22, -70.92, 42.40],
+        count=123456789,
+    )
+    assert list(iter_features(path, chunk_size=5)) == features
+
+def test_first_run_writes_every_feature(tmp_path):
+    features = [feature(f"Area {i}", i / 100) for i in range(5)]
+    path = write_collection(tmp_path / "areas.json", features)
+    db = FakeFirestore()
+
+    assert migrate_neighborhoods(db, path, workers=2)
+    docs = db.documents("neighborhoods")
+    assert sorted(docs) == [f"area_{i}" for i in range(5)]
+    assert docs["area_3"]["metadata"]["content_hash"] == content_hash(features[3])
+
+def test_rerun_skips_unchanged_documents(tmp_path):
+    features = [feature(f"Area {i}", i / 100) for i in range(5)]
+    path = write_collection(tmp_path / "areas.json", features)
+    db = FakeFirestore()
+    assert migrate_neighborhoods(db, path, workers=2)
+    first = db.documents("neighborhoods")["area_0"]["metadata"]["migrated_at"]
+    db.commits.clear()
+
+    assert migrate_neighborhoods(db, path, workers=2)
+    assert db.commits == []
+
+    features[1] = feature("Area 1", 0.5)
+    write_collection(path, features)
+    assert migrate_neighborhoods(db, path, workers=2)
+    assert db.commits == [1]
+    assert db.documents("neighborhoods")["area_1"]["metadata"]["content_hash"] == content_hash(features[1])
+    assert db.documents("neighborhoods")["area_0"]["metadata"]["migrated_at"] == first
+
+    db.commits.clear()
+    assert migrate_neighborhoods(db, path, workers=2, force=True)
+    assert sum(db.commits) == 5
+
+def test_writes_are_split_into_batches(tmp_path):
+    path = write_collection(tmp_path / "areas.json", [feature(f"Area {i}", i / 100) for i in range(7)])
+    db = FakeFirestore()
+
+    assert migrate_neighborhoods(db, path, batch_size=3, workers=2)
+    assert sorted(db.commits) == [1, 3, 3]
+    assert len(db.documents("neighborhoods")) == 7
+
+def test_batch_size_is_capped_at_firestore_limit(tmp_path):
+    path = write_collection(tmp_path / "areas.json", [feature(f"Area {i}", i / 10000) for i in range(501)])
+    db = FakeFirestore()
+
+    assert migrate_neighborhoods(db, path, batch_size=1000, workers=2)
+    assert sorted(db.commits) == [1, 500]
@@ -0,0 +1,23 @@
+# tests/test_reencode_geometry.py
+import json
+
+from firestore_stub import FakeFirestore
+from geometry_codec import encode_document
+from reencode_geometry import reencode_geometry
+
+RING = [[-71.0, 42.3], [-71.1, 42.3], [-71.1, 42.4], [-71.0, 42.3]]
+
+def test_only_legacy_documents_are_read():
+    db = FakeFirestore()
+    neighborhoods = db.collection("neighborhoods")
+    neighborhoods.document("allston").set(
+        {"name": "Allston", "geometry_type": "Polygon", "geometry_coordinates": json.dumps([RING])}
+    )
+    neighborhoods.document("back_bay").set(
+        {"name": "Back Bay", **encode_document({"type": "Polygon", "coordinates": [RING]})}
+    )
+
+    converted, before, after = reencode_geometry(db, dry_run=True)
+    assert converted == 1
+    assert before == len(json.dumps([RING])) and 0 < after
+    assert db.reads == 1
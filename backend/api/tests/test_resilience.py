@@ -0,0 +1,112 @@
+# tests/test_resilience.py
+import asyncio
+
+import httpx
+
+from airnow_service import AirNowService
+from resilience import CircuitBreaker
+
+ROW = {
+    "DateObserved": "2024-06-01 ", "HourObserved": 9, "LocalTimeZone": "EST", "ReportingArea": "Boston",
+    "StateCode": "MA", "Latitude": 42.35, "Longitude": -71.06, "ParameterName": "O3", "AQI": 42,
+    "Category": {"Number": 1, "Name": "Good"},
+}
+
+def make_service(monkeypatch, handler) -> AirNowService:
+    monkeypatch.setenv("AIRNOW_API_KEY", "test")
+    monkeypatch.delenv("AQI_CACHE_DB", raising=False)
+    service = AirNowService()
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+def half_open(breaker: CircuitBreaker):
+    breaker.reset_timeout = 0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_probe_denied_by_rate_limiter(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=[ROW])
+
+    service = make_service(monkeypatch, handler)
+    half_open(service.breaker)
+    service.rate_limiter.tokens = 0
+    service.rate_limiter.rate = 0
+
+    assert asyncio.run(service.get_aqi_by_zip("02134")) is None
+    assert not calls
+
+    # Quota is back: the probe must still be available and close the breaker
+    service.rate_limiter.tokens = 1
+    observation = asyncio.run(service.get_aqi_by_zip("02134"))
+    assert observation is not None and observation.AQI == 42
+    assert len(calls) == 1
+    assert service.breaker.state == CircuitBreaker.CLOSED
+
+def test_open_breaker_does_not_spend_quota(monkeypatch):
+    service = make_service(monkeypatch, lambda request: httpx.Response(200, json=[ROW]))
+    for _ in range(service.breaker.failure_threshold):
+        service.breaker.record_failure()
+    service.rate_limiter.rate = 0
+    tokens = service.rate_limiter.tokens
+
+    assert asyncio.run(service.get_aqi_by_zip("02134")) is None
+    assert service.rate_limiter.tokens == tokens
+
+def test_cancelled_probe_releases_breaker(monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=[ROW])
+
+    service = make_service(monkeypatch, handler)
+    half_open(service.breaker)
+
+    async def run():
+        probe = asyncio.ensure_future(service.get_aqi_by_zip("02134"))
+        await asyncio.sleep(0.05)
+        assert not service.breaker.allow()  # The probe is in flight
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert service.breaker.state == CircuitBreaker.HALF_OPEN
+    assert service.breaker.allow()
+
+def test_lost_probe_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, probe_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow()
+
+def test_fanout_logs_why_a_zip_is_missing(monkeypatch, caplog):
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[ROW])
+
+    service = make_service(monkeypatch, handler)
+    service.boston_zip_codes = {"Allston": "02134", "Back Bay": "02116"}
+    service.fanout_deadline = 0.05
+    service.cache.set_failure("02134")
+
+    async def run():
+        try:
+            return await service.get_all_boston_aqi()
+        finally:
+            for future in list(service._inflight.values()):
+                future.cancel()
+    assert asyncio.run(run()) == {}
+
+    messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Failed")]
+    assert len(messages) == 2
+    assert "Allston (zip 02134): no observation returned; last fetch failed and is negatively cached" in messages[0]
+    assert messages[1] == "Failed to get AQI for Back Bay (zip 02116): no response within 0.05s"
+    assert all("None" not in message for message in messages)
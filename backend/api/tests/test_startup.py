@@ -0,0 +1,12 @@
+# tests/test_startup.py
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+from startup import IMPORT_BUDGET, STARTUP_BUDGET, measure
+
+def test_import_and_startup_within_budget():
+    # Fresh interpreters without credentials or .env; measure() fails if import needs either
+    medians = measure(runs=3)
+    assert medians["import"] <= IMPORT_BUDGET
+    assert medians["startup"] <= STARTUP_BUDGET
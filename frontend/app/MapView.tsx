@@ -3,11 +3,15 @@
 import React, { useRef, useEffect, useState } from 'react';
 import mapboxgl from 'mapbox-gl';
 import 'mapbox-gl/dist/mapbox-gl.css';
+import { topologyToGeoJSON } from '../lib/topojson';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
 mapboxgl.accessToken = process.env.NEXT_PUBLIC_MAPBOX_TOKEN || '';
 
+// Geometry is simplified for this zoom; stays within a couple of pixels up to the click-zoom limit (16)
+const GEOMETRY_ZOOM = 14;
+
 function expandBounds(bounds: mapboxgl.LngLatBounds, expansion = 0.005) {
   const sw = bounds.getSouthWest();
   const ne = bounds.getNorthEast();
@@ -75,6 +79,27 @@ export default function MapView() {
     fetchAQIData();
   }, []);
 
+  // Live updates: the server pushes only neighborhoods whose AQI changed
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+    const source = new EventSource(`${API_BASE_URL}/aqi/stream`);
+    source.addEventListener('snapshot', (event) => {
+      const neighborhoods = JSON.parse((event as MessageEvent).data).neighborhoods || {};
+      // A freshly started server has nothing to send yet; keep what /aqi/boston returned
+      if (Object.keys(neighborhoods).length === 0) return;
+      setAqiData(neighborhoods);
+    });
+    source.addEventListener('update', (event) => {
+      const { changed, removed } = JSON.parse((event as MessageEvent).data);
+      setAqiData((previous) => {
+        const next = { ...previous, ...changed };
+        for (const name of removed) delete next[name];
+        return next;
+      });
+    });
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
     if (!mapContainer.current) return;
 
@@ -88,10 +113,18 @@ export default function MapView() {
 
     map.on('load', async () => {
       try {
-        // Load your neighborhoods GeoJSON from /public
-        const res = await fetch('/neighborhoods.json');
-        if (!res.ok) throw new Error(`Failed to fetch neighborhoods.json (${res.status})`);
-        const neighborhoods = await res.json();
+        // Simplified TopoJSON from the backend; fall back to the full GeoJSON in /public
+        let neighborhoods: any;
+        try {
+          const res = await fetch(`${API_BASE_URL}/geometry/neighborhoods?zoom=${GEOMETRY_ZOOM}`);
+          if (!res.ok) throw new Error(`Failed to fetch neighborhood geometry (${res.status})`);
+          neighborhoods = topologyToGeoJSON(await res.json(), 'neighborhoods');
+        } catch (geometryErr) {
+          console.warn('Falling back to neighborhoods.json:', geometryErr);
+          const res = await fetch('/neighborhoods.json');
+          if (!res.ok) throw new Error(`Failed to fetch neighborhoods.json (${res.status})`);
+          neighborhoods = await res.json();
+        }
 
         // Add neighborhoods source; generateId gives each feature a stable runtime id
         map.addSource('neighborhoods', {
@@ -0,0 +1,55 @@
+// Minimal TopoJSON -> GeoJSON decoder for the backend's /geometry/neighborhoods output
+// (quantized, delta-encoded arcs; Polygon and MultiPolygon geometries only).
+
+type Position = [number, number];
+
+interface Topology {
+  type: 'Topology';
+  transform: { scale: [number, number]; translate: [number, number] };
+  objects: Record<string, { type: 'GeometryCollection'; geometries: any[] }>;
+  arcs: number[][][];
+}
+
+function decodeArcs(topology: Topology): Position[][] {
+  const [sx, sy] = topology.transform.scale;
+  const [tx, ty] = topology.transform.translate;
+  return topology.arcs.map((arc) => {
+    let x = 0;
+    let y = 0;
+    return arc.map(([dx, dy]) => {
+      x += dx;
+      y += dy;
+      return [x * sx + tx, y * sy + ty] as Position;
+    });
+  });
+}
+
+function ringCoordinates(refs: number[], arcs: Position[][]): Position[] {
+  const ring: Position[] = [];
+  refs.forEach((ref, i) => {
+    const arc = ref >= 0 ? arcs[ref] : arcs[~ref].slice().reverse();
+    // Consecutive arcs share their joining point
+    ring.push(...(i === 0 ? arc : arc.slice(1)));
+  });
+  return ring;
+}
+
+export function topologyToGeoJSON(topology: Topology, objectName: string) {
+  const arcs = decodeArcs(topology);
+  const polygon = (rings: number[][]) => rings.map((refs) => ringCoordinates(refs, arcs));
+
+  return {
+    type: 'FeatureCollection' as const,
+    features: topology.objects[objectName].geometries.map((geometry) => ({
+      type: 'Feature' as const,
+      properties: geometry.properties ?? {},
+      geometry: {
+        type: geometry.type,
+        coordinates:
+          geometry.type === 'Polygon'
+            ? polygon(geometry.arcs)
+            : geometry.arcs.map((rings: number[][]) => polygon(rings)),
+      },
+    })),
+  };
+}